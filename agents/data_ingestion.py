@@ -1,47 +1,171 @@
-from datetime import datetime, timedelta
 import asyncio
+import os
+from datetime import datetime, timedelta
+import time
 from agents.state_types import ReviewAnalysisState
-from utils.scraper_service import ScraperService
+from agents.topic_extraction import extraction_version, review_key
+from utils.checkpoints import DayResults
+from utils.ingestion_engine import IngestionEngine
+from utils.review_store import ReviewStore
+from utils.scraper_service import package_name_from_url
+from config import scraper_config, storage_config, window_config
 
 async def data_ingestion_node(state: ReviewAnalysisState) -> ReviewAnalysisState:
     """
-    Data Scraping Node to get data from the review platform
+    Data Scraping Node to get data from the review platform.
+    Only days not yet covered by the local review store are scraped;
+    the rest of the window is loaded from disk.
+    In incremental mode, days whose extraction result is already stored (and that were not scraped
+    again and still have the reviews they were extracted from) are not loaded at all: they are listed in reused_days and their result is reused, so
+    advancing the window by a day only loads and extracts the new day.
+    In spill mode the window is written to a file under the spill directory instead of being loaded,
+    and raw_reviews only holds its path and per-day offsets.
     """
     print(f"Starting data ingestion for analysis {state['analysis_id']}")
-    
+
     try:
-        scraper = ScraperService()
-        
-        target_date = datetime.strptime(state['target_date'], '%Y-%m-%d')
-        start_date = target_date - timedelta(days=30)
-        
-        raw_reviews = {}
-        current_date = start_date
-        
-        while current_date <= target_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            print(f"Scraping reviews for {date_str}")
-            
-            daily_reviews = await scraper.scrape_reviews_for_date(
-                app_url=state['app_url'],
-                date=current_date
+        day_results = None
+        if state.get('incremental'):
+            day_results = DayResults(storage_config.day_results_path, package_name_from_url(state['app_url']),
+                                     extraction_version(state.get('drilldown', False)))
+        try:
+            raw_reviews, reused_days = await ingest_window(
+                state['app_url'], state['target_date'], state.get('window_days'), day_results=day_results,
+                spill_path=spill_path(state)
             )
+        finally:
+            if day_results is not None:
+                day_results.close()
+
+        review_volume = raw_reviews.day_counts()
+        review_volume.update(reused_days)
+        if reused_days:
+            print(f"Reusing stored results for {len(reused_days)} of {len(raw_reviews.days)} day(s), loaded {len(raw_reviews)} reviews")
 
-            raw_reviews[date_str] = daily_reviews
-            current_date += timedelta(days=1)
-            
-            await asyncio.sleep(0.5)
-            
         return {
-            **state,
             "raw_reviews": raw_reviews,
+            "reused_days": sorted(reused_days),
+            "review_volume": review_volume,
             "current_step": "data_ingestion_completed",
             "processing_status": "ingestion_complete"
         }
-        
+
     except Exception as e:
         return {
-            **state,
             "errors": state.get("errors", []) + [f"Ingestion error: {str(e)}"],
             "processing_status": "ingestion_failed"
-        }
\ No newline at end of file
+        }
+
+
+def spill_path(state: ReviewAnalysisState):
+    """File the run's review window is spilled to, or None when the window is kept in memory"""
+    if not state.get('spill'):
+        return None
+    return os.path.join(storage_config.spill_dir, f"{state['analysis_id']}.jsonl")
+
+
+def window_dates(target_date: str, window_days: int = None):
+    """Every day of the analysis window ending at target_date (window_days before it plus the day itself), oldest first"""
+    window_days = window_config.window_days if window_days is None else window_days
+    end = datetime.strptime(target_date, '%Y-%m-%d')
+    return [(end - timedelta(days=window_days - i)).strftime('%Y-%m-%d') for i in range(window_days + 1)]
+
+
+async def ingest_window(app_url: str, target_date: str, window_days: int = None, on_day=None, day_results: DayResults = None,
+                        spill_path: str = None):
+    """
+    Bring the store up to date for the analysis window and load the window from it.
+    Returns (ReviewColumns or ReviewSpill of the window, {reused day: number of reviews}).
+    on_day: optional async callback(date_str, reviews) awaited once per day as soon as that day is
+    available (stored days first, then scraped days as the scrape completes them), with the reviews
+    in the same order the final window load returns them
+    day_results: when given, days with a stored extraction result that are not scraped again and whose
+    stored reviews still match the ones the result was extracted from (same review key) are not
+    loaded; they are returned as reused days instead
+    spill_path: when given, the window is streamed from the store into a ReviewSpill file at this path
+    instead of being loaded into memory
+    """
+    package_name = package_name_from_url(app_url)
+    store = ReviewStore(storage_config.review_db_path)
+
+    dates = window_dates(target_date, window_days)
+    start_str = dates[0]
+
+    missing = store.missing_range(package_name, start_str, target_date)
+    reused = {}
+    if day_results is not None:
+        # a stored result is only trusted while the day still has exactly the reviews it was extracted
+        # from; a day whose reviews were added, replaced or edited since is loaded and extracted again
+        reused = {
+            date_str: reviews for date_str, (reviews, key) in day_results.stored(start_str, target_date).items()
+            if (missing is None or not (missing[0] <= date_str <= missing[1]))
+            and stored_day_key(store, package_name, date_str) == key
+        }
+
+    async def emit_stored_days():
+        for date_str in dates:
+            if date_str not in reused and (missing is None or not (missing[0] <= date_str <= missing[1])):
+                await emit_stored_day(store, package_name, date_str, on_day)
+
+    async def scrape_missing():
+        if not missing:
+            print(f"Reviews from {start_str} to {target_date} already stored, skipping scrape")
+            return
+        print(f"Scraping reviews from {missing[0]} to {missing[1]}")
+        engine = IngestionEngine(
+            locales=scraper_config.locales,
+            max_workers=scraper_config.max_workers,
+            backend=scraper_config.backend,
+            max_pages=scraper_config.max_pages
+        )
+
+        async def scraped_day(package, date_str, reviews):
+            # persist the finished day first so it is handed on exactly as the store returns it
+            store.upsert_reviews(package, {date_str: reviews})
+            # the scrape may reach past the window to stay contiguous with the watermark
+            if on_day is not None and start_str <= date_str <= target_date:
+                await emit_stored_day(store, package, date_str, on_day)
+
+        # a spilled window is never held in memory, not even on a cold scrape: every finished day goes
+        # straight to the store and is dropped, and only the range is recorded at the end
+        ingested = await engine.ingest(
+            app_urls=[app_url],
+            start_date=datetime.strptime(missing[0], '%Y-%m-%d'),
+            end_date=datetime.strptime(missing[1], '%Y-%m-%d'),
+            on_day=scraped_day if on_day is not None or spill_path is not None else None,
+            retain=spill_path is None
+        )
+        if package_name in engine.incomplete_packages():
+            # keep what the other locales scraped, but leave the range uncovered so the next run scrapes it again
+            print(f"Scrape of {package_name} incomplete, not advancing its watermark")
+            store.upsert_reviews(package_name, ingested[package_name])
+        else:
+            store.save_reviews(package_name, ingested[package_name], missing[0], missing[1])
+
+    if on_day is not None:
+        await asyncio.gather(emit_stored_days(), scrape_missing())
+    else:
+        await scrape_missing()
+
+    load_start = time.perf_counter()
+    only_days = [date_str for date_str in dates if date_str not in reused] if reused else None
+    if spill_path is not None:
+        raw_reviews = store.spill_window(package_name, spill_path, start_str, target_date, dates=dates, only_days=only_days)
+    else:
+        raw_reviews = store.load_columns(package_name, start_str, target_date, dates=dates, only_days=only_days)
+    store.close()
+    print(f"Loaded {len(raw_reviews)} reviews from store in {(time.perf_counter() - load_start) * 1000:.1f} ms"
+          + (f", spilled to {spill_path}" if spill_path is not None else ""))
+    return raw_reviews, reused
+
+
+def stored_day_key(store: ReviewStore, package_name: str, date_str: str) -> str:
+    """review_key of a day as stored now, computed from one day's rows like extraction computes it"""
+    day = store.load_columns(package_name, date_str, date_str, dates=[date_str])
+    return review_key(next(day.iter_days())[1])
+
+
+async def emit_stored_day(store: ReviewStore, package_name: str, date_str: str, on_day):
+    day = store.load_columns(package_name, date_str, date_str, dates=[date_str])
+    for _, reviews in day.iter_days():
+        await on_day(date_str, reviews)
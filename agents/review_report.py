@@ -1,100 +1,149 @@
 from agents.state_types import ReviewAnalysisState
+import numpy as np
 import pandas as pd
 import os
+import time
 from datetime import datetime
+from config import storage_config
+from agents.topic_extraction import extraction_version
+from utils.checkpoints import DayResults
+from utils.compact_state import TopicCounts
+from utils.review_store import ReviewStore
+from utils.scraper_service import package_name_from_url
+from utils.trend_store import TrendStore
 
 async def review_report_node(state: ReviewAnalysisState) -> ReviewAnalysisState:
     """
-    Generate review report and save to database
+    Generate review report and save to database.
+    The dates x topics count matrix is built once; trend_analysis and the CSV are derived from it.
     """
     print(f"Starting review report generation for analysis {state['analysis_id']}")
-    
+
     try:
-        print(f"Consolidated topics: {state.get('consolidated_topics', {})}")
-        print(f"Daily frequencies: {state.get('daily_frequencies', {})}")
-        
-        trend_data = {}
-        
-        for topic in state['consolidated_topics'].keys():
-            topic_trend = []
-            dates = sorted(state['daily_frequencies'].keys())
-            
-            for date in dates:
-                frequency = state['daily_frequencies'][date].get(topic, 0)
-                topic_trend.append({
-                    'date': date,
-                    'frequency': frequency
-                })
-            
-            trend_data[topic] = {
-                'daily_data': topic_trend
-            }
-
-        print(f"Trend data: {trend_data}")
-
-        csv_filename = save_trend_data_to_csv(state['analysis_id'], trend_data)
+        build_start = time.perf_counter()
+        matrix = build_trend_matrix(state['daily_frequencies'], list(state['consolidated_topics'].keys()))
+        trend_data = trend_data_from_matrix(matrix)
+        print(f"Built {matrix.shape[0]} x {matrix.shape[1]} trend matrix in {(time.perf_counter() - build_start) * 1000:.1f} ms")
+
+        csv_filename = save_trend_data_to_csv(state['analysis_id'], matrix)
         print(f"Trend data saved to: {csv_filename}")
 
+        app = package_name_from_url(state['app_url'])
+        save_trend_history(app, matrix, review_volume(state))
+        save_review_topics(app, state.get('drilldown', False), matrix.index.tolist(), state['topic_mapping'])
+
         return {
-            **state,
             "trend_analysis": trend_data,
             "current_step": "trend_analysis_completed",
-            "processing_status": "completed"
+            "processing_status": "report_complete"
         }
-        
+
     except Exception as e:
         return {
-            **state,
             "errors": state.get("errors", []) + [f"Analysis error: {str(e)}"],
             "processing_status": "analysis_failed"
         }
 
 
-def save_trend_data_to_csv(analysis_id: str, trend_data: dict) -> str:
+def build_trend_matrix(daily_frequencies: TopicCounts, topics: list) -> pd.DataFrame:
+    """
+    Dates x topics frequency matrix (rows sorted by date, columns in `topics` order).
+    Topic ids are translated to column indices once, so filling it is a single pass over the non-zero counts.
+    """
+    topic_index = {topic: i for i, topic in enumerate(topics)}
+    columns = np.array([topic_index.get(name, -1) for name in daily_frequencies.topics.names], dtype=np.int64)
+    counts = np.zeros((len(daily_frequencies.dates), len(topics)), dtype=np.int64)
+    for row, day in enumerate(daily_frequencies.rows):
+        if not day:
+            continue
+        topic_ids = np.fromiter(day.keys(), dtype=np.int64, count=len(day))
+        values = np.fromiter(day.values(), dtype=np.int64, count=len(day))
+        targets = columns[topic_ids]
+        keep = targets >= 0
+        np.add.at(counts[row], targets[keep], values[keep])
+    return pd.DataFrame(counts, index=pd.Index(daily_frequencies.dates, name='date'), columns=topics)
+
+
+def trend_data_from_matrix(matrix: pd.DataFrame) -> dict:
+    """{topic: {'daily_data': [{'date': ..., 'frequency': ...}, ...]}} view of the trend matrix"""
+    dates = matrix.index.tolist()
+    return {
+        topic: {'daily_data': [{'date': date, 'frequency': frequency} for date, frequency in zip(dates, column)]}
+        for topic, column in zip(matrix.columns, matrix.to_numpy().T.tolist())
+    }
+
+
+def review_volume(state: ReviewAnalysisState) -> dict:
+    """Reviews per window day (states from before review_volume existed fall back to counting raw_reviews)"""
+    if state.get('review_volume'):
+        return state['review_volume']
+    return state['raw_reviews'].day_counts() if state.get('raw_reviews') is not None else {}
+
+
+def save_trend_history(app: str, matrix: pd.DataFrame, reviews_per_day: dict = None) -> int:
+    """
+    Upsert the window's daily counts (and reviews per day) into the historical trend store,
+    so later trend queries need neither the scraper nor the LLM
+    """
+    try:
+        store = TrendStore(storage_config.trend_store_path)
+        try:
+            days = store.upsert_days(app, matrix, reviews_per_day)
+        finally:
+            store.close()
+        print(f"Updated {days} of {len(matrix.index)} day(s) of trend history for {app}")
+        return days
+    except Exception as e:
+        print(f"Error saving trend history: {str(e)}")
+        return 0
+
+
+def save_review_topics(app: str, drilldown: bool, dates: list, topic_mapping: dict) -> int:
     """
-    Save trend data to CSV file with topics as columns and dates as rows
+    Index the window's reviews under their canonical topics in the review store, from the review ids
+    extraction stored per day and topic, so drilldown and re-slicing need neither the scraper nor the LLM
+    """
+    def canonical(assignments):
+        day = {}
+        for topic, review_ids in assignments.items():
+            day.setdefault(topic_mapping.get(topic, topic), []).extend(review_ids)
+        return day
+
+    try:
+        day_results = DayResults(storage_config.day_results_path, app, extraction_version(drilldown))
+        store = ReviewStore(storage_config.review_db_path)
+        try:
+            # streamed a day at a time, so the index is updated without holding the window's review ids
+            days = store.save_topics(app, ((date, canonical(assignments)) for date, assignments in day_results.assignments(dates)))
+        finally:
+            store.close()
+            day_results.close()
+        print(f"Updated {days} of {len(dates)} day(s) of the review topic index for {app}")
+        return days
+    except Exception as e:
+        print(f"Error saving review topics: {str(e)}")
+        return 0
+
+
+def save_trend_data_to_csv(analysis_id: str, matrix: pd.DataFrame) -> str:
+    """
+    Save the trend matrix to CSV file with topics as columns and dates as rows
     """
     try:
         data_dir = "output"
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
-        
-        csv_data = {}
-        all_dates = set()
-        
-        for topic, topic_info in trend_data.items():
-            for daily_data in topic_info['daily_data']:
-                all_dates.add(daily_data['date'])
-        
-        sorted_dates = sorted(all_dates)
-        
-        csv_data['date'] = sorted_dates
-        
-        for topic, topic_info in trend_data.items():
-            topic_frequencies = []
-            for date in sorted_dates:
-                frequency = 0
-                for daily_data in topic_info['daily_data']:
-                    if daily_data['date'] == date:
-                        frequency = daily_data['frequency']
-                        break
-                topic_frequencies.append(frequency)
-            
-            csv_data[topic] = topic_frequencies
-        
-        df = pd.DataFrame(csv_data)
-        
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"output/trend_analysis_{analysis_id}_{timestamp}.csv"
-        
-        df.to_csv(filename, index=False)
-        
+
+        matrix.to_csv(filename)
+
         print(f"CSV file created successfully: {filename}")
-        print(f"Data shape: {df.shape}")
-        print(f"Columns: {list(df.columns)}")
-        
+        print(f"Data shape: {matrix.shape}")
+
         return filename
-        
+
     except Exception as e:
         print(f"Error saving CSV file: {str(e)}")
-        return None
\ No newline at end of file
+        return None
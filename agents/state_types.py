@@ -1,16 +1,28 @@
-from typing import Dict, List, TypedDict
+from typing import Dict, List, TypedDict, Union
+from utils.compact_state import ReviewColumns, TopicCounts
+from utils.review_spill import ReviewSpill
 
 class ReviewAnalysisState(TypedDict):
     analysis_id: int
     app_url: str
     target_date: str
+    drilldown: bool
+    window_days: int
+    incremental: bool
+    spill: bool
     
-    raw_reviews: Dict[str, List[Dict]]  
-    extracted_topics: Dict[str, Dict[str, int]]
+    raw_reviews: Union[ReviewColumns, ReviewSpill]  # ReviewSpill when the window is spilled to disk
+    reused_days: List[str]  # window days with a stored extraction result whose reviews were not loaded
+    review_volume: Dict[str, int]  # reviews per window day, including reused days
+    extracted_topics: TopicCounts
+    topic_details: Dict[str, Dict[str, Dict]]
     consolidated_topics: Dict[str, int]  
     topic_mapping: Dict[str, str] 
-    daily_frequencies: Dict[str, Dict[str, int]] 
+    daily_frequencies: TopicCounts
     trend_analysis: Dict
+    # the trend matrix and its statistics (pandas DataFrames) are not part of the checkpointed state;
+    # finished runs get them as trend_matrix / trend_statistics, see agents.trend_analytics.trend_frames
+    alerts: List[Dict]
     
     processing_status: str
     errors: List[str]
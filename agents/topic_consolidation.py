@@ -1,155 +1,46 @@
+import asyncio
 from collections import defaultdict
 from agents.state_types import ReviewAnalysisState
-import json
 
 # LangChain imports
-from langchain_openai import AzureChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from config import azure_config
+from config import azure_config, instrumentation_config, storage_config
+from utils.llm_cache import cache_key, open_llm_cache
+from utils.llm_gateway import LLMGateway, LLMResponseError, parse_json_response
+from utils.llm_scheduler import estimate_tokens
+from utils.metrics import increment
+from utils.scraper_service import package_name_from_url
+from utils.topic_clustering import cluster_topics, related_topics, shard_clusters
+from utils.topic_registry import TopicRegistry
+
+# bump whenever the consolidation prompt changes so cached responses are not reused
+CONSOLIDATION_PROMPT_VERSION = "2"
+
+MAX_CONSOLIDATION_LEVELS = 3
+# existing canonical topics offered to a shard, picked by shared words
+MAX_EXISTING_TOPICS = 100
 
 async def topic_consolidation_node(state: ReviewAnalysisState) -> ReviewAnalysisState:
     """
-    Consolidating the topics from the extracted topics
+    Consolidating the topics from the extracted topics.
+    Topics already in the app's topic registry are mapped locally; only new ones go to the LLM.
     """
     print(f"Starting topic consolidation for analysis {state['analysis_id']}")
 
     try:
-        all_topics = set()
-        topic_frequencies = defaultdict(int)
-        
         # aggregate all topics across days
-        for date, topics in state['extracted_topics'].items():
-            for topic, frequency in topics.items():
-                all_topics.add(topic)
-                topic_frequencies[topic] += frequency
+        topic_frequencies = state['extracted_topics'].totals()
 
         print(f"Found {len(topic_frequencies)} significant topics to consolidate")
-        print(f"Topic frequencies: {dict(topic_frequencies)}")
-
-        topics_text = ", ".join([f"{topic}: {freq}" for topic, freq in topic_frequencies.items() if freq > 0])
-
-        consolidation_message = ChatPromptTemplate.from_template("""
-        TASK: Consolidate similar topics to avoid fragmentation
-        
-        TOPICS TO CONSOLIDATE:
-        {topics_text}
-        
-        CONSOLIDATION RULES:
-        1. Merge topics that refer to the same underlying issue
-        2. Examples of topics that should be merged:
-           - "delivery_late", "slow_delivery", "delivery_delayed" → "delivery_time_issue"
-           - "rude_delivery_partner", "delivery_guy_rude", "impolite_delivery" → "delivery_partner_behavior"
-        3. Keep distinct topics separate (don't over-consolidate)
-        4. Use clear, descriptive names for consolidated topics
-        
-        REQUIRED OUTPUT FORMAT:
-        {{
-            "consolidated_topics": {{
-                "final_topic_name": total_frequency
-            }},
-            "topic_mapping": {{
-                "original_topic": "consolidated_topic_name"
-            }}
-        }}
-        """)
-
-        if not azure_config.is_configured():
-            raise Exception("Azure OpenAI not configured. Please set AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, and AZURE_OPENAI_DEPLOYMENT_NAME environment variables.")
-        
-        llm = AzureChatOpenAI(
-            azure_deployment=azure_config.deployment_name,
-            openai_api_version=azure_config.api_version,
-            azure_endpoint=azure_config.endpoint,
-            api_key=azure_config.api_key,
-            temperature=0.1
-        )
 
-        print("Calling Azure OpenAI for topic consolidation...")
-        result = await llm.ainvoke(
-            consolidation_message.format(
-                topics_text=topics_text
-            )
-        )
+        topic_mapping, consolidated_topics = await consolidate_topics(package_name_from_url(state['app_url']), topic_frequencies)
 
-        print("Azure OpenAI call completed successfully!")
-
-        print(f"Result of topic consolidation: {result}")
-        print(f"Result content: {result.content}")
-        print(f"Result type: {type(result)}")
-        print(f"Result content type: {type(result.content)}")
-        
-        try:
-            content = result.content.strip()
-            if content.startswith('```json'):
-                content = content[7:] 
-                if content.endswith('```'):
-                    content = content[:-3] 
-            elif content.startswith('```'):
-                content = content[3:] 
-                if content.endswith('```'):
-                    content = content[:-3] 
-            
-            consolidation_result = json.loads(content.strip())
-            print(f"Parsed consolidation result: {consolidation_result}")
-        except Exception as parse_err:
-            print(f"JSON parsing error: {parse_err}")
-            print(f"Raw content: {content}")
-            print(f"Content length: {len(content)}")
-            print(f"Content starts with: {content[:100]}")
-            print(f"Content ends with: {content[-100:]}")
-            print("Continuing with empty consolidation due to parsing error")
-            consolidation_result = {
-                "consolidated_topics": {},
-                "topic_mapping": {}
-            }
-
-        consolidated_daily_frequencies = {}
-        print(f"Processing daily frequencies for {len(state['extracted_topics'])} dates")
-        
-        for date, daily_topics in state['extracted_topics'].items():
-            consolidated_daily = defaultdict(int)
-            print(f"Processing date {date} with topics: {daily_topics}")
-            
-            for original_topic, frequency in daily_topics.items():
-                consolidated_topic = consolidation_result['topic_mapping'].get(
-                    original_topic, original_topic
-                )
-                consolidated_daily[consolidated_topic] += frequency
-                print(f"  {original_topic} ({frequency}) -> {consolidated_topic}")
-            
-            consolidated_daily_frequencies[date] = dict(consolidated_daily)
-            print(f"  Consolidated for {date}: {dict(consolidated_daily)}")
-        
-        print(f"Final consolidated daily frequencies: {consolidated_daily_frequencies}")
-
-        if not consolidation_result['consolidated_topics']:
-            print("Consolidation failed, using original topics as fallback")
-            fallback_consolidated_topics = {}
-            fallback_topic_mapping = {}
-            
-            for topic, freq in topic_frequencies.items():
-                if freq > 0:  
-                    fallback_consolidated_topics[topic] = freq
-                    fallback_topic_mapping[topic] = topic
-            
-            consolidation_result['consolidated_topics'] = fallback_consolidated_topics
-            consolidation_result['topic_mapping'] = fallback_topic_mapping
-            
-            consolidated_daily_frequencies = {}
-            for date, daily_topics in state['extracted_topics'].items():
-                consolidated_daily = defaultdict(int)
-                for original_topic, frequency in daily_topics.items():
-                    consolidated_topic = fallback_topic_mapping.get(original_topic, original_topic)
-                    consolidated_daily[consolidated_topic] += frequency
-                consolidated_daily_frequencies[date] = dict(consolidated_daily)
-            
-            print(f"Fallback consolidated topics: {fallback_consolidated_topics}")
-            print(f"Fallback daily frequencies: {consolidated_daily_frequencies}")
+        consolidated_daily_frequencies = state['extracted_topics'].remap(topic_mapping)
+        print(f"Consolidated {len(topic_frequencies)} topics into {len(consolidated_topics)} across {len(consolidated_daily_frequencies.dates)} dates")
 
         return {
-            **state,
-            "consolidated_topics": consolidation_result['consolidated_topics'],
-            "topic_mapping": consolidation_result['topic_mapping'],
+            "consolidated_topics": consolidated_topics,
+            "topic_mapping": topic_mapping,
             "daily_frequencies": consolidated_daily_frequencies,
             "current_step": "topic_consolidation_completed",
             "processing_status": "consolidation_complete"
@@ -161,7 +52,197 @@ async def topic_consolidation_node(state: ReviewAnalysisState) -> ReviewAnalysis
         import traceback
         print(f"Full traceback: {traceback.format_exc()}")
         return {
-            **state,
             "errors": state.get("errors", []) + [f"Consolidation error: {str(e)}"],
             "processing_status": "consolidation_failed"
         }
+
+
+def resolve_known_topics(registry: TopicRegistry, topic_frequencies: dict):
+    """
+    Split topics into ({topic: canonical} resolved by the registry, {new topic: frequency},
+    {new topic: canonical topic with a close name, for the LLM to confirm})
+    """
+    topic_mapping = {}
+    new_topics = {}
+    suggestions = {}
+    for topic, freq in sorted(topic_frequencies.items()):
+        canonical = registry.resolve(topic)
+        if canonical is not None:
+            topic_mapping[topic] = canonical
+        elif freq > 0:
+            new_topics[topic] = freq
+            suggestion = registry.suggest(topic)
+            if suggestion is not None:
+                suggestions[topic] = suggestion
+    return topic_mapping, new_topics, suggestions
+
+
+async def consolidate_topics(app: str, topic_frequencies: dict):
+    """
+    Map every topic onto a canonical topic for `app`, consolidating the ones the registry
+    does not know with the LLM and recording the outcome in the registry.
+    Returns ({topic: canonical_topic}, {canonical_topic: total_frequency}).
+    """
+    registry = TopicRegistry(storage_config.topic_registry_path, app)
+    topic_mapping, new_topics, suggestions = resolve_known_topics(registry, topic_frequencies)
+    # remember normalized matches so they resolve exactly next time
+    registry.update({topic: canonical for topic, canonical in topic_mapping.items() if topic not in registry.mappings})
+
+    print(f"Resolved {len(topic_mapping)} topics from the registry, {len(new_topics)} new topics to consolidate"
+          + (f" ({len(suggestions)} with a close registry name)" if suggestions else ""))
+
+    if new_topics:
+        new_mapping, failed = await consolidate_new_topics(new_topics, registry.canonical_topics(), suggestions)
+        # topics whose consolidation call failed stay out of the registry so they are retried next run
+        registry.update({topic: canonical for topic, canonical in new_mapping.items() if topic not in failed})
+        topic_mapping.update(new_mapping)
+    registry.close()
+
+    for topic in topic_frequencies:
+        topic_mapping.setdefault(topic, topic)
+
+    consolidated_topics = defaultdict(int)
+    for topic, freq in topic_frequencies.items():
+        if freq > 0:
+            consolidated_topics[topic_mapping[topic]] += freq
+    return topic_mapping, dict(consolidated_topics)
+
+
+async def consolidate_new_topics(new_topics: dict, existing_topics: list, suggestions: dict = None):
+    """
+    Hierarchical consolidation of new topics.
+    Topic names are pre-clustered locally and packed into shards that are consolidated by
+    parallel LLM calls; while that takes more than one shard, the canonical names produced
+    by a level are consolidated again by the next level.
+    suggestions: {new topic: existing topic with a close name}, always offered to the topic's shard
+    so the LLM can confirm or reject the match
+    Returns ({new_topic: canonical_topic}, set of new topics whose consolidation failed).
+    """
+    suggestions = suggestions or {}
+    gateway = LLMGateway("consolidation")
+    cache = open_llm_cache()
+    existing = set(existing_topics)
+
+    mapping = {topic: topic for topic in new_topics}
+    failed = set()
+    level_topics = dict(new_topics)
+    try:
+        for level in range(MAX_CONSOLIDATION_LEVELS):
+            shards = shard_clusters(cluster_topics(sorted(level_topics)), azure_config.consolidation_shard_topics)
+            print(f"Consolidation level {level + 1}: {len(level_topics)} topics in {len(shards)} shard(s)")
+
+            results = await asyncio.gather(*[
+                consolidate_shard(gateway, cache, {topic: level_topics[topic] for topic in shard},
+                                  shard_existing_topics(shard, existing_topics, suggestions))
+                for shard in shards
+            ])
+
+            level_mapping = {}
+            failed_level = set()
+            for shard, shard_mapping in zip(shards, results):
+                if shard_mapping is None:
+                    failed_level.update(shard)
+                    shard_mapping = {}
+                for topic in shard:
+                    canonical = shard_mapping.get(topic, topic)
+                    level_mapping[topic] = canonical if isinstance(canonical, str) and canonical else topic
+
+            for topic in mapping:
+                if mapping[topic] in failed_level:
+                    failed.add(topic)
+                mapping[topic] = level_mapping.get(mapping[topic], mapping[topic])
+
+            next_topics = defaultdict(int)
+            for topic, freq in level_topics.items():
+                canonical = level_mapping[topic]
+                if canonical not in existing:
+                    next_topics[canonical] += freq
+            if len(shards) == 1 or len(next_topics) >= len(level_topics):
+                break
+            level_topics = dict(next_topics)
+    finally:
+        print(f"Consolidation scheduler stats: {gateway.scheduler.stats}")
+        gateway.close()
+        if cache is not None:
+            print(f"Consolidation cache stats: {cache.stats}")
+            cache.close()
+    return mapping, failed
+
+
+def shard_existing_topics(shard: list, existing_topics: list, suggestions: dict) -> list:
+    """Existing topics offered to a shard: the suggested matches of its topics, then the ones sharing words with it"""
+    suggested = sorted({suggestions[topic] for topic in shard if topic in suggestions})
+    related = [topic for topic in related_topics(shard, existing_topics, MAX_EXISTING_TOPICS) if topic not in suggested]
+    return (suggested + related)[:max(MAX_EXISTING_TOPICS, len(suggested))]
+
+
+async def consolidate_shard(gateway: LLMGateway, cache, shard_topics: dict, existing_topics: list):
+    """
+    One consolidation call for a shard of topics.
+    Returns the shard's {topic: consolidated_topic} mapping, or None if no usable response came back
+    even after repair and a re-ask.
+    """
+    topics_text = ", ".join([f"{topic}: {freq}" for topic, freq in shard_topics.items()])
+    existing_text = ", ".join(existing_topics) or "(none)"
+
+    consolidation_message = ChatPromptTemplate.from_template("""
+    TASK: Consolidate similar topics to avoid fragmentation
+
+    EXISTING TOPICS (reuse these names exactly when a new topic means the same thing):
+    {existing_text}
+
+    TOPICS TO CONSOLIDATE:
+    {topics_text}
+
+    CONSOLIDATION RULES:
+    1. Map a topic onto an existing topic if it refers to the same underlying issue
+    2. Merge new topics that refer to the same underlying issue
+    3. Examples of topics that should be merged:
+       - "delivery_late", "slow_delivery", "delivery_delayed" → "delivery_time_issue"
+       - "rude_delivery_partner", "delivery_guy_rude", "impolite_delivery" → "delivery_partner_behavior"
+    4. Keep distinct topics separate (don't over-consolidate)
+    5. Use clear, descriptive names for consolidated topics
+
+    REQUIRED OUTPUT FORMAT:
+    {{
+        "consolidated_topics": {{
+            "final_topic_name": total_frequency
+        }},
+        "topic_mapping": {{
+            "original_topic": "consolidated_topic_name"
+        }}
+    }}
+    """)
+
+    key = cache_key("topic_consolidation", CONSOLIDATION_PROMPT_VERSION, azure_config.deployment_name, existing_text, topics_text)
+    response_content = cache.get(key) if cache is not None else None
+    if cache is not None:
+        increment("consolidation", "cache_hits" if response_content is not None else "cache_misses")
+
+    if response_content is not None:
+        if instrumentation_config.verbose:
+            print(f"Using cached consolidation response for {len(shard_topics)} topics")
+        return parse_json_response(response_content)['topic_mapping']
+
+    if instrumentation_config.verbose:
+        print(f"Calling Azure OpenAI to consolidate {len(shard_topics)} topics...")
+    prompt = consolidation_message.format(existing_text=existing_text, topics_text=topics_text)
+    try:
+        consolidation_result, response_content = await gateway.complete_json(
+            prompt, estimate_tokens(prompt) + estimate_tokens(topics_text) * 2, validate=validate_consolidation
+        )
+    except LLMResponseError as e:
+        print(f"{e}")
+        print(f"Continuing with {len(shard_topics)} unconsolidated topics due to parsing error")
+        return None
+
+    if instrumentation_config.verbose:
+        print(f"Parsed consolidation result: {consolidation_result}")
+    if cache is not None:
+        cache.set(key, response_content)
+    return consolidation_result['topic_mapping']
+
+
+def validate_consolidation(result):
+    if not isinstance(result, dict) or not isinstance(result.get('topic_mapping'), dict):
+        raise ValueError("expected a JSON object with a topic_mapping object")
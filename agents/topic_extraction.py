@@ -1,35 +1,60 @@
-from langchain_openai import AzureChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-import json
+import asyncio
+from collections import defaultdict
 from agents.state_types import ReviewAnalysisState
-from config import azure_config
+from config import azure_config, extraction_config, instrumentation_config, storage_config, window_config
+from utils.llm_cache import cache_key, open_llm_cache
+from utils.llm_gateway import LLMGateway, parse_json_response
+from utils.llm_scheduler import chunk_by_tokens, estimate_tokens
+from utils.checkpoints import DayResults
+from utils.compact_state import TopicCounts
+from utils.metrics import increment
+from utils.review_dedup import group_reviews
+from utils.scraper_service import package_name_from_url
+from utils.topic_classifier import CLASSIFIER_VERSION, LabelStore, TopicClassifier
 
-async def topic_extraction_node(state: ReviewAnalysisState) -> ReviewAnalysisState:
-    """
-    Structured topic extraction from the extracted review data
-    """
-    print(f"Starting topic extraction for analysis {state['analysis_id']}")
-    
-    try:
-        if not azure_config.is_configured():
-            raise Exception("Azure OpenAI not configured. Please set AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, and AZURE_OPENAI_DEPLOYMENT_NAME environment variables.")
-        
-        llm = AzureChatOpenAI(
-            azure_deployment=azure_config.deployment_name,
-            openai_api_version=azure_config.api_version,
-            azure_endpoint=azure_config.endpoint,
-            api_key=azure_config.api_key,
-            temperature=0.1
-        )
-        
-        seed_topics = [
-            "delivery_issue", "food_quality", "delivery_partner_behavior", 
-            "app_functionality", "payment_issue", "customer_service",
-            "restaurant_availability", "order_accuracy", "packaging_quality",
-            "delivery_time", "app_performance", "pricing_concern"
-        ]
-        
-        extraction_prompt = ChatPromptTemplate.from_template("""
+# bump whenever the extraction prompt changes so cached responses are not reused
+EXTRACTION_PROMPT_VERSION = "4"
+
+# compact output only carries what the pipeline uses; the verbose one is kept for drilldown
+COMPACT_OUTPUT_FORMAT = """Return a JSON object mapping each topic to the numbers of the reviews that mention it, and nothing else:
+        {"topic_name": [1, 4]}"""
+
+VERBOSE_OUTPUT_FORMAT = """Return JSON format:
+        {
+            "topic_name": {
+                "reviews": [1, 4],
+                "keywords": ["keyword1", "keyword2"],
+                "sample_reviews": ["review1", "review2"]
+            }
+        }"""
+
+MAX_SAMPLE_REVIEWS = 5
+
+# keyword rules for the local pre-classifier, matched against lowercased, punctuation-free review text
+SEED_TOPIC_KEYWORDS = {
+    "delivery_issue": [r"not delivered", r"never (delivered|arrived|came)", r"(order|food) (not|never) received"],
+    "food_quality": [r"cold food", r"food (was |is )?(cold|stale|bad|tasteless)", r"stale", r"tasteless", r"undercooked", r"spoiled"],
+    "delivery_partner_behavior": [r"(delivery (partner|boy|guy|agent|executive)|rider) (was |is )?(very )?(rude|abusive)", r"rude (delivery|rider)\w*"],
+    "app_functionality": [r"not working", r"bugs?", r"can ?t (login|log in|place (an )?order)", r"otp"],
+    "payment_issue": [r"payment", r"refunds?", r"money (got |was )?deducted", r"charged twice", r"upi"],
+    "customer_service": [r"customer (care|service|support)", r"support team"],
+    "restaurant_availability": [r"restaurants? (closed|not available|unavailable)", r"no restaurants?"],
+    "order_accuracy": [r"wrong (item|items|order|food|dish)", r"missing (item|items)"],
+    "packaging_quality": [r"packag\w*", r"spilled", r"leak(ed|ing)"],
+    "delivery_time": [r"late", r"delay(ed)?", r"slow delivery", r"took forever"],
+    "app_performance": [r"crash\w*", r"app (is |was )?(very )?slow", r"hang(s|ing)?", r"lag(s|gy|ging)?", r"freez\w*"],
+    "pricing_concern": [r"prices?", r"pricing", r"expensive", r"overpriced", r"costly", r"delivery (fee|charges?)"]
+}
+
+SEED_TOPICS = [
+    "delivery_issue", "food_quality", "delivery_partner_behavior",
+    "app_functionality", "payment_issue", "customer_service",
+    "restaurant_availability", "order_accuracy", "packaging_quality",
+    "delivery_time", "app_performance", "pricing_concern"
+]
+
+EXTRACTION_PROMPT = ChatPromptTemplate.from_template("""
         You are an expert at extracting topics from food delivery app reviews.
         
         SEED TOPICS: {seed_topics}
@@ -40,81 +65,290 @@ async def topic_extraction_node(state: ReviewAnalysisState) -> ReviewAnalysisSta
         1. Use seed topics when applicable, but identify new topics as needed
         2. Be specific but not overly granular (e.g., "delivery_late" not "delivery_5_minutes_late")
         3. Use snake_case format for topic names
-        4. Count frequency of each topic
+        4. List the numbers of the reviews that mention each topic; a review can mention several topics
         
         REVIEWS: {reviews}
         
-        Return JSON format:
-        {{
-            "topic_name": {{
-                "frequency": int,
-                "keywords": ["keyword1", "keyword2"],
-                "sample_reviews": ["review1", "review2"]
-            }}
-        }}
+        {output_format}
         """)
-        
-        extracted_topics = {}
-        
-        for date, reviews in state['raw_reviews'].items():
-            if not reviews:
-                extracted_topics[date] = {}
-                continue
-                
-            reviews_text = []
-            for review in reviews:
-                reviews_text.append(f"Rating: {review.get('rating', 'N/A')} - {review.get('content', '')}")
-            
-            
-            response = await llm.ainvoke(
-                extraction_prompt.format(
-                    seed_topics=", ".join(seed_topics),
-                    reviews="\n".join(reviews_text)
-                )
-            )
-
-            print(f"Response for {date}: {response}")
-            
-            try:
-                print(f"Response content for {date}: {response.content}")
-                
-                content = response.content.strip()
-                if content.startswith('```json'):
-                    content = content[7:]  
-                    if content.endswith('```'):
-                        content = content[:-3] 
-                elif content.startswith('```'):
-                    content = content[3:]  
-                    if content.endswith('```'):
-                        content = content[:-3]
-                
-                topics_data = json.loads(content.strip())
-
-                print(f"Topics data for {date}: {topics_data}")
-                
-                daily_topics = {}
-                for topic_name, topic_data in topics_data.items():
-                    daily_topics[topic_name] = topic_data.get('frequency', 0)
-                
-                extracted_topics[date] = daily_topics
-                print(f"Extracted topics for {date}: {daily_topics}")
-                
-            except json.JSONDecodeError:
-                print(f"Failed to parse LLM response for {date}")
-                extracted_topics[date] = {}
-        
-        print(f"Final extracted topics: {extracted_topics}")
+
+async def topic_extraction_node(state: ReviewAnalysisState) -> ReviewAnalysisState:
+    """
+    Structured topic extraction from the extracted review data.
+    Days whose result is stored for the same reviews and extraction version are reused, as are the
+    days ingestion did not load because their result was stored (incremental window).
+    A spilled window is read back and extracted a few days at a time, so only those days are in memory.
+    """
+    print(f"Starting topic extraction for analysis {state['analysis_id']}")
+    
+    try:
+        drilldown = state.get('drilldown', False)
+        extractor = TopicExtractor(drilldown=drilldown)
+        day_results = DayResults(storage_config.day_results_path, package_name_from_url(state['app_url']), extraction_version(drilldown))
+        reused_days = set(state.get('reused_days') or [])
+        resumed = []
+
+        days = ((date, reviews) for date, reviews in state['raw_reviews'].iter_days() if date not in reused_days)
+        try:
+            stored = day_results.load(sorted(reused_days))
+            lost = reused_days - set(stored)
+            if lost:
+                raise Exception(f"Stored results for {len(lost)} reused day(s) are missing, e.g. {min(lost)}; rerun without incremental mode")
+            workers = window_config.spill_days if state.get('spill') else 0
+            stored.update(await extract_days(extractor, day_results, days, resumed, workers))
+        finally:
+            extractor.close()
+            day_results.close()
+        if resumed:
+            print(f"Reused {len(resumed)} already extracted day(s) from the day result store")
+
+        extracted_topics = TopicCounts(state['raw_reviews'].days)
+        topic_details = {}
+        for date in state['raw_reviews'].days:
+            daily_topics, daily_details = stored.get(date, ({}, {}))
+            extracted_topics.set_row(date, daily_topics)
+            if daily_details:
+                topic_details[date] = daily_details
+
+        print(f"Extracted {len(extracted_topics.topics)} distinct topics ({extracted_topics.nnz()} day/topic counts)")
         
         return {
-            **state,
             "extracted_topics": extracted_topics,
+            "topic_details": topic_details,
             "current_step": "topic_extraction_completed",
             "processing_status": "extraction_complete"
         }
         
     except Exception as e:
         return {
-            **state,
             "errors": state.get("errors", []) + [f"Extraction error: {str(e)}"],
             "processing_status": "extraction_failed"
-        }
\ No newline at end of file
+        }
+
+
+def extraction_version(drilldown: bool) -> str:
+    """Everything besides the reviews that a day's extraction result depends on (prompt version and settings)"""
+    return cache_key(
+        "topic_extraction_day", EXTRACTION_PROMPT_VERSION, drilldown, azure_config.deployment_name,
+        extraction_config.dedup_enabled, extraction_config.dedup_threshold, extraction_config.classifier_enabled and CLASSIFIER_VERSION,
+        azure_config.chunk_tokens
+    )
+
+
+def review_key(reviews) -> str:
+    """Identity of one day's reviews, used to decide whether a stored day result still applies"""
+    return cache_key("topic_extraction_reviews", [(r.get('review_id'), r.get('rating'), r.get('content')) for r in reviews])
+
+
+async def extract_or_reuse(extractor: "TopicExtractor", day_results: DayResults, date, reviews, reused: list):
+    """One day's (topics, details): the stored result for these reviews, or a fresh extraction that is stored"""
+    key = review_key(reviews)
+    done = day_results.get(date, key)
+    if done is not None:
+        reused.append(date)
+        return done
+    daily_topics, details, assignments = await extractor.extract_day(date, reviews)
+    # recorded per day so a failure later in the run does not lose this day's work
+    day_results.save(date, key, len(reviews), daily_topics, details, assignments)
+    return daily_topics, details
+
+
+async def extract_days(extractor: "TopicExtractor", day_results: DayResults, days, reused: list, workers: int = 0):
+    """
+    {date: (topics, details)} for the (date, reviews) pairs of `days`, see extract_or_reuse.
+    workers: 0 extracts every day at once; otherwise `days` is consumed lazily by that many workers,
+    so at most `workers` days of reviews are held at a time
+    """
+    if not workers:
+        days = list(days)
+        results = await asyncio.gather(*[extract_or_reuse(extractor, day_results, date, reviews, reused) for date, reviews in days])
+        return {date: result for (date, _), result in zip(days, results)}
+
+    results = {}
+    days = iter(days)
+
+    async def worker():
+        for date, reviews in days:
+            results[date] = await extract_or_reuse(extractor, day_results, date, reviews, reused)
+
+    await asyncio.gather(*[worker() for _ in range(max(1, workers))])
+    return results
+
+
+class TopicExtractor:
+    """
+    Per-day topic extraction: near-duplicate collapsing, the local pre-classifier, then
+    token-budgeted chunks sent through one LLM gateway and response cache.
+    Topics are assigned to individual reviews (the LLM answers with review numbers), so every
+    day's counts come with the review ids behind each topic.
+    Used by topic_extraction_node and by the streaming workflow, so both produce the same counts.
+    """
+
+    def __init__(self, drilldown: bool = False):
+        self.gateway = LLMGateway("extraction", json_mode=True)
+        self.drilldown = drilldown
+        self.output_format = VERBOSE_OUTPUT_FORMAT if drilldown else COMPACT_OUTPUT_FORMAT
+        self.cache = open_llm_cache()
+
+        self.classifier = None
+        self.label_store = None
+        if extraction_config.classifier_enabled:
+            self.label_store = LabelStore(storage_config.label_db_path)
+            self.classifier = TopicClassifier(SEED_TOPIC_KEYWORDS, max_words=extraction_config.classifier_max_words).fit(self.label_store.load())
+            print(f"Pre-classifier trained on LLM labels for {len(self.classifier.centroids)} topic(s)")
+        self.llm_labels = []
+        self.total_reviews = 0
+        self.local_reviews = 0
+
+    def close(self):
+        if self.label_store is not None:
+            self.label_store.add(self.llm_labels)
+            self.label_store.close()
+            print(f"Pre-classifier handled {self.local_reviews}/{self.total_reviews} reviews locally, recorded {len(self.llm_labels)} new LLM label(s)")
+        if self.cache is not None:
+            print(f"Extraction cache stats: {self.cache.stats}")
+            self.cache.close()
+        print(f"Extraction scheduler stats: {self.gateway.scheduler.stats}")
+        self.gateway.close()
+
+    def _record_labels(self, groups, numbers, details):
+        """Keep what the LLM said about individual reviews as training data for the pre-classifier"""
+        if self.label_store is None:
+            return
+        for topic, topic_numbers in numbers.items():
+            self.llm_labels.extend((groups[n - 1][0].get('content', ''), topic) for n in set(topic_numbers) if 1 <= n <= len(groups))
+        for topic, detail in details.items():
+            self.llm_labels.extend((sample, topic) for sample in detail["sample_reviews"] if isinstance(sample, str))
+
+    @staticmethod
+    def format_review(review):
+        return f"Rating: {review.get('rating', 'N/A')} - {review.get('content', '')}"
+
+    def _cache_key(self, reviews_text):
+        return cache_key("topic_extraction", EXTRACTION_PROMPT_VERSION, self.drilldown, azure_config.deployment_name, SEED_TOPICS, reviews_text)
+
+    @classmethod
+    def parse_topics(cls, content):
+        return cls.topics_from_json(parse_json_response(content))
+
+    @staticmethod
+    def topics_from_json(topics_data):
+        """({topic: [review number, ...]}, {topic: details}) from a parsed response; raises ValueError / TypeError if it is malformed"""
+        if not isinstance(topics_data, dict):
+            raise ValueError(f"expected a JSON object of topics, got {type(topics_data).__name__}")
+        numbers = {}
+        details = {}
+        for topic_name, topic_data in topics_data.items():
+            if isinstance(topic_data, dict):
+                details[topic_name] = {
+                    "keywords": topic_data.get('keywords', []),
+                    "sample_reviews": topic_data.get('sample_reviews', [])
+                }
+                topic_data = topic_data.get('reviews', [])
+            if not isinstance(topic_data, list):
+                raise ValueError(f"expected a list of review numbers for {topic_name}, got {type(topic_data).__name__}")
+            numbers[topic_name] = [int(number) for number in topic_data]
+        return numbers, details
+
+    @staticmethod
+    def assign_topics(numbers, groups):
+        """
+        ({topic: frequency}, {topic: [review_id, ...]}) from the review numbers of a chunk's response.
+        Number n is the chunk's n-th group of near-identical reviews, so its topics apply to every
+        review of the group; numbers outside the chunk are ignored.
+        """
+        daily_topics = {}
+        assignments = {}
+        for topic_name, topic_numbers in numbers.items():
+            review_ids = [review['review_id'] for n in sorted(set(topic_numbers)) if 1 <= n <= len(groups) for review in groups[n - 1]]
+            if review_ids:
+                daily_topics[topic_name] = len(review_ids)
+                assignments[topic_name] = review_ids
+        return daily_topics, assignments
+
+    async def _extract_chunk(self, date, reviews_text, groups):
+        key = self._cache_key(reviews_text)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if self.cache is not None:
+            increment("extraction", "cache_hits" if cached is not None else "cache_misses")
+        if cached is not None:
+            numbers, details = self.parse_topics(cached)
+            return self.assign_topics(numbers, groups) + (details,)
+
+        prompt = EXTRACTION_PROMPT.format(
+            seed_topics=", ".join(SEED_TOPICS),
+            reviews=reviews_text,
+            output_format=self.output_format
+        )
+        # a malformed response is repaired or re-asked for this chunk only; if that fails too the
+        # day fails, and a rerun re-extracts just this chunk (the day's other chunks are cached)
+        topics_data, content = await self.gateway.complete_json(prompt, estimate_tokens(reviews_text) + 500, validate=self.topics_from_json)
+        numbers, details = self.topics_from_json(topics_data)
+        daily_topics, assignments = self.assign_topics(numbers, groups)
+        if self.cache is not None:
+            self.cache.set(key, content)
+        self._record_labels(groups, numbers, details)
+        if instrumentation_config.verbose:
+            print(f"Extracted {len(daily_topics)} topics for {date} chunk")
+        return daily_topics, assignments, details
+
+    async def extract_day(self, date, reviews):
+        """
+        Returns ({topic: frequency}, {topic: {"keywords": [...], "sample_reviews": [...]}}, {topic: [review_id, ...]})
+        for one day, topics in sorted order; the details are only filled in drilldown mode
+        """
+        if not reviews:
+            return {}, {}, {}
+        self.total_reviews += len(reviews)
+        if extraction_config.dedup_enabled:
+            groups = group_reviews(reviews, extraction_config.dedup_threshold)
+            if instrumentation_config.verbose:
+                print(f"Collapsed {len(reviews)} reviews for {date} into {len(groups)} distinct reviews")
+        else:
+            groups = [[review] for review in reviews]
+
+        # map: reviews the pre-classifier is confident about are labelled locally, the rest of
+        # the day is split into token-budgeted chunks that are extracted independently
+        chunk_results = []
+        if self.classifier is not None:
+            local_assignments = defaultdict(list)
+            remaining = []
+            for group in groups:
+                topics, confident = self.classifier.classify(group[0].get('content', ''), group[0].get('rating'))
+                if not confident:
+                    remaining.append(group)
+                    continue
+                self.local_reviews += len(group)
+                for topic in topics:
+                    local_assignments[topic] += [review['review_id'] for review in group]
+            chunk_results.append(({topic: len(ids) for topic, ids in local_assignments.items()}, dict(local_assignments), {}))
+            groups = remaining
+
+        if groups:
+            chunks = chunk_by_tokens([self.format_review(group[0]) for group in groups], azure_config.chunk_tokens)
+            if len(chunks) > 1 and instrumentation_config.verbose:
+                print(f"Splitting {len(groups)} reviews for {date} into {len(chunks)} chunks")
+            calls = []
+            start = 0
+            for lines in chunks:
+                # reviews are numbered within their chunk, and the LLM answers with those numbers
+                reviews_text = "\n".join(f"[{number}] {line}" for number, line in enumerate(lines, 1))
+                calls.append(self._extract_chunk(date, reviews_text, groups[start:start + len(lines)]))
+                start += len(lines)
+            chunk_results += await asyncio.gather(*calls)
+
+        # reduce: per-topic frequencies and review ids are merged across the day's chunks, topics in sorted order
+        daily_topics = defaultdict(int)
+        daily_assignments = defaultdict(list)
+        daily_details = {}
+        for topics, assignments, details in chunk_results:
+            for topic_name, frequency in topics.items():
+                daily_topics[topic_name] += frequency
+            for topic_name, review_ids in assignments.items():
+                daily_assignments[topic_name] += review_ids
+            for topic_name, detail in details.items():
+                merged = daily_details.setdefault(topic_name, {"keywords": [], "sample_reviews": []})
+                merged["keywords"] += [k for k in detail["keywords"] if k not in merged["keywords"]]
+                merged["sample_reviews"] = (merged["sample_reviews"] + detail["sample_reviews"])[:MAX_SAMPLE_REVIEWS]
+        assignments = {topic: sorted(review_ids) for topic, review_ids in sorted(daily_assignments.items())}
+        return dict(sorted(daily_topics.items())), dict(sorted(daily_details.items())), assignments
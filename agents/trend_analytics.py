@@ -0,0 +1,219 @@
+from agents.state_types import ReviewAnalysisState
+import json
+import numpy as np
+import pandas as pd
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+from config import trend_config
+from agents.review_report import build_trend_matrix, review_volume
+
+WEEK_DAYS = 7
+
+async def trend_analytics_node(state: ReviewAnalysisState) -> ReviewAnalysisState:
+    """
+    Rolling statistics and spike alerts over the dates x topics trend matrix.
+    Every statistic is computed for all topics at once on the numpy matrix, so the cost does not
+    depend on the number of topics beyond the array operations themselves.
+    """
+    print(f"Starting trend analytics for analysis {state['analysis_id']}")
+
+    try:
+        started = time.perf_counter()
+        matrix, statistics = trend_frames(state)
+        alerts = find_alerts(matrix, statistics)
+        print(f"Computed trend statistics for {matrix.shape[0]} x {matrix.shape[1]} matrix in "
+              f"{(time.perf_counter() - started) * 1000:.1f} ms, {len(alerts)} alert(s)")
+        for alert in alerts[:5]:
+            print(f"  Spike: {alert['topic']} on {alert['date']}: {alert['frequency']} mentions "
+                  f"(baseline {alert['baseline']}, score {alert['score']})")
+
+        alerts_filename = save_alerts_to_json(state['analysis_id'], alerts)
+        print(f"Alerts saved to: {alerts_filename}")
+
+        return {
+            "alerts": alerts,
+            "current_step": "trend_analytics_completed",
+            "processing_status": "completed"
+        }
+
+    except Exception as e:
+        return {
+            "errors": state.get("errors", []) + [f"Trend analytics error: {str(e)}"],
+            "processing_status": "analytics_failed"
+        }
+
+
+def trend_frames(state: ReviewAnalysisState) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """
+    (trend matrix, {statistic name: DataFrame shaped like it}) rebuilt from daily_frequencies.
+    DataFrames are kept out of the checkpointed state, so they are built where they are needed.
+    """
+    matrix = build_trend_matrix(state['daily_frequencies'], list(state['consolidated_topics'].keys()))
+    volume = daily_review_volume(review_volume(state), matrix.index.tolist())
+    return matrix, compute_trend_statistics(matrix, volume)
+
+
+def daily_review_volume(reviews_per_day: Dict[str, int], dates: List[str]) -> np.ndarray:
+    """Number of reviews per date, in `dates` order"""
+    return np.array([reviews_per_day.get(day, 0) for day in dates], dtype=np.float64)
+
+
+def cumulative_rows(values: np.ndarray) -> np.ndarray:
+    """Cumulative sum over the rows with a leading zero row, so any row range sums by one subtraction"""
+    cumulative = np.zeros((values.shape[0] + 1, values.shape[1]), dtype=np.float64)
+    np.cumsum(values, axis=0, out=cumulative[1:])
+    return cumulative
+
+
+def window_sums(cumulative: np.ndarray, window: int, lag: int = 0) -> np.ndarray:
+    """
+    For every row t, the sum of rows [t - lag - window + 1, t - lag] (clipped at the first row),
+    computed with slices of the cumulative sums only
+    """
+    rows = cumulative.shape[0] - 1
+    first_end = 1 - lag
+    sums = np.zeros((rows, cumulative.shape[1]), dtype=np.float64)
+    valid = max(0, -first_end)
+    sums[valid:] = cumulative[first_end + valid:first_end + rows]
+    full = min(rows, max(valid, window - first_end))
+    sums[full:] -= cumulative[:rows - full]
+    return sums
+
+
+def ewma_baseline(counts: np.ndarray, alpha: float):
+    """
+    Exponentially weighted mean and std of the days before each row (NaN on the first row).
+    The recursion runs over the dates with every topic updated at once.
+    """
+    baseline = np.full_like(counts, np.nan)
+    variance = np.full_like(counts, np.nan)
+    if not counts.shape[0]:
+        return baseline, variance
+    mean, var = counts[0].copy(), np.zeros(counts.shape[1])
+    for row in range(1, counts.shape[0]):
+        baseline[row], variance[row] = mean, var
+        diff = counts[row] - mean
+        increment = alpha * diff
+        mean += increment
+        var = (1 - alpha) * (var + diff * increment)
+    return baseline, np.sqrt(variance, out=variance)
+
+
+def compute_trend_statistics(matrix: pd.DataFrame, volume: np.ndarray, config=trend_config) -> Dict[str, pd.DataFrame]:
+    """
+    Per date and topic:
+    rolling_mean: mean over the trailing window_days (fewer at the start of the history)
+    wow_delta: mentions in the last 7 days minus the 7 days before (NaN until two full weeks exist)
+    share: mentions per review that day (NaN on days without reviews)
+    baseline / score: expected count and how many standard deviations the day is above it, from the
+        preceding days only (trailing window or EWMA); the std is floored at sqrt(baseline) and 1 so
+        sparse topics need a real jump to score high
+    spike: score >= spike_threshold with at least min_count mentions and min_history_days of history
+    """
+    counts = matrix.to_numpy(dtype=np.float64)
+    rows, window = counts.shape[0], max(1, config.window_days)
+    days = np.arange(rows, dtype=np.float64)[:, None]  # days of history before each row
+    cumulative = cumulative_rows(counts)
+
+    rolling_mean = window_sums(cumulative, window)
+    rolling_mean /= np.minimum(days + 1, window)
+
+    wow_delta = np.full_like(counts, np.nan)
+    if rows >= 2 * WEEK_DAYS:
+        wow_delta[2 * WEEK_DAYS - 1:] = (window_sums(cumulative, WEEK_DAYS) - window_sums(cumulative, WEEK_DAYS, lag=WEEK_DAYS))[2 * WEEK_DAYS - 1:]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = counts / np.where(volume > 0, volume, np.nan)[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if config.spike_method == "ewma":
+            baseline, std = ewma_baseline(counts, 2.0 / (config.ewma_span + 1))
+        elif config.spike_method == "zscore":
+            # mean / std of the `window` days before each day
+            history = np.minimum(days, window)
+            baseline = window_sums(cumulative, window, lag=1)
+            baseline /= history
+            std = window_sums(cumulative_rows(counts * counts), window, lag=1)
+            std /= history
+            std -= baseline ** 2
+            np.sqrt(np.maximum(std, 0, out=std), out=std)
+        else:
+            raise ValueError(f"Unknown spike method: {config.spike_method}")
+
+        np.fmax(std, np.sqrt(baseline), out=std)
+        np.fmax(std, 1.0, out=std)
+        score = counts - baseline
+        score /= std
+    spike = (score >= config.spike_threshold) & (counts >= config.min_count) & (days >= config.min_history_days)
+
+    def frame(values, dtype=np.float32):
+        return pd.DataFrame(values.astype(dtype, copy=False), index=matrix.index, columns=matrix.columns, copy=False)
+
+    return {
+        "rolling_mean": frame(rolling_mean),
+        "wow_delta": frame(wow_delta),
+        "share": frame(share),
+        "baseline": frame(baseline),
+        "score": frame(score),
+        "spike": frame(spike, dtype=bool),
+    }
+
+
+def find_alerts(matrix: pd.DataFrame, statistics: Dict[str, pd.DataFrame], config=trend_config) -> List[Dict]:
+    """Spikes in the last alert_days of the history, strongest first, at most max_alerts"""
+    spike = statistics["spike"].to_numpy()
+    first_row = max(0, spike.shape[0] - config.alert_days) if config.alert_days > 0 else 0
+    rows, columns = np.nonzero(spike[first_row:])
+    rows += first_row
+    if not len(rows):
+        return []
+
+    scores = statistics["score"].to_numpy()[rows, columns]
+    order = np.argsort(-scores, kind="stable")[:config.max_alerts]
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    dates, topics = matrix.index.to_numpy(), matrix.columns.to_numpy()
+    counts = matrix.to_numpy()
+    baseline = statistics["baseline"].to_numpy()
+    share = statistics["share"].to_numpy()
+    wow_delta = statistics["wow_delta"].to_numpy()
+
+    def number(value, digits):
+        return None if np.isnan(value) else round(float(value), digits)
+
+    return [
+        {
+            "date": str(dates[row]),
+            "topic": str(topics[column]),
+            "frequency": int(counts[row, column]),
+            "baseline": number(baseline[row, column], 2),
+            "score": number(score, 2),
+            "share": number(share[row, column], 4),
+            "wow_delta": number(wow_delta[row, column], 1),
+            "method": config.spike_method,
+        }
+        for row, column, score in zip(rows, columns, scores)
+    ]
+
+
+def save_alerts_to_json(analysis_id: str, alerts: List[Dict]) -> str:
+    """
+    Save the alerts next to the trend CSV
+    """
+    try:
+        data_dir = "output"
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"output/trend_alerts_{analysis_id}_{timestamp}.json"
+
+        with open(filename, "w") as f:
+            json.dump(alerts, f, indent=2)
+
+        return filename
+
+    except Exception as e:
+        print(f"Error saving alerts file: {str(e)}")
+        return None
@@ -0,0 +1,249 @@
+# api.py
+# Review analysis job service:
+#   uvicorn api:app --port 8000
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from batch import init_worker
+from config import azure_config, service_config, storage_config, window_config
+from utils.job_store import JobStore
+from utils.review_store import BREAKDOWNS, ReviewStore
+from utils.scraper_service import package_name_from_url
+from utils.trend_store import GRANULARITIES, TrendStore
+from workflow import new_analysis_state, run_review_analysis, run_streaming_workflow
+
+class JobRequest(BaseModel):
+    app_url: str
+    target_date: date
+    drilldown: bool = False
+    streaming: bool = False
+    # default to window_config
+    window_days: Optional[int] = None
+    incremental: Optional[bool] = None
+    spill: Optional[bool] = None
+    # run again even if a completed result for this app and date is stored
+    force: bool = False
+
+
+def job_status(job: dict) -> dict:
+    """Job as returned by the API: everything but the (potentially large) result"""
+    return {key: value for key, value in job.items() if key not in ("result", "csv_path")}
+
+
+def run_job(job: dict):
+    """
+    Run one job's workflow in a job pool process, on that process's own event loop, so the
+    analysis never holds up the service's requests. The job_id is the analysis_id, so a job
+    interrupted by a restart resumes from its last checkpoint. Returns (status, result, csv_path, errors).
+    """
+    state = new_analysis_state(job["job_id"], job["app_url"], job["target_date"], job["drilldown"],
+                               job["window_days"], job["incremental"], job["spill"])
+    workflow = run_streaming_workflow if job["streaming"] else run_review_analysis
+    result = asyncio.run(workflow(state))
+
+    csv_path = None
+    matrix = result.get("trend_matrix")
+    if matrix is not None:
+        if not os.path.exists(service_config.output_dir):
+            os.makedirs(service_config.output_dir)
+        csv_path = os.path.join(service_config.output_dir, f"{job['job_id']}.csv")
+        matrix.to_csv(csv_path)
+
+    status = "completed" if result.get("processing_status") == "completed" else "failed"
+    summary = {
+        "processing_status": result.get("processing_status"),
+        "reviews": sum((result.get("review_volume") or {}).values()),
+        "consolidated_topics": result.get("consolidated_topics") or {},
+        "topic_mapping": result.get("topic_mapping") or {},
+        "topic_details": result.get("topic_details") or {},
+        "alerts": result.get("alerts") or [],
+    }
+    return status, summary, csv_path, result.get("errors", [])
+
+
+def new_job_pool(workers: int) -> ProcessPoolExecutor:
+    """Job processes share one LLM rate budget and split the configured concurrency, like batch.py's workers"""
+    budget_path = azure_config.shared_budget_path or os.path.join(storage_config.data_dir, "llm_budget.db")
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                               initargs=(budget_path, max(1, azure_config.max_concurrency // workers)))
+
+
+async def job_worker(app: FastAPI, store: JobStore, queue: asyncio.Queue):
+    loop = asyncio.get_running_loop()
+    while True:
+        job = store.claim(await queue.get())
+        if job is None:
+            continue
+        print(f"Running job {job['job_id']} ({job['app']} {job['target_date']})")
+        pool = app.state.pool
+        try:
+            status, result, csv_path, errors = await loop.run_in_executor(pool, run_job, job)
+        except BrokenProcessPool as e:
+            # a job process died (e.g. out of memory); later jobs get a fresh pool
+            if app.state.pool is pool:
+                app.state.pool = new_job_pool(max(1, service_config.workers))
+            status, result, csv_path, errors = "failed", None, None, [f"Worker error: {str(e)}"]
+        except Exception as e:
+            status, result, csv_path, errors = "failed", None, None, [f"Workflow error: {str(e)}"]
+        store.finish(job["job_id"], status, result=result, csv_path=csv_path, errors=errors)
+        print(f"Job {job['job_id']} {status}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    store = JobStore(storage_config.job_db_path)
+    queue = asyncio.Queue()
+    for job_id in store.pending():
+        queue.put_nowait(job_id)
+    app.state.pool = new_job_pool(max(1, service_config.workers))
+    workers = [asyncio.create_task(job_worker(app, store, queue)) for _ in range(max(1, service_config.workers))]
+    app.state.store = store
+    app.state.queue = queue
+    app.state.trends = TrendStore(storage_config.trend_store_path)
+    app.state.reviews = ReviewStore(storage_config.review_db_path)
+    print(f"Job service started with {len(workers)} worker(s), {queue.qsize()} job(s) pending")
+    try:
+        yield
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # analyses already running finish in their process; their jobs are still 'running' and are
+        # queued again on the next start, where they resume from (or complete at) their checkpoint
+        app.state.pool.shutdown(wait=True, cancel_futures=True)
+        store.close()
+        app.state.trends.close()
+        app.state.reviews.close()
+
+
+app = FastAPI(title="Review Analysis Service", lifespan=lifespan)
+
+
+def get_job(job_id: str) -> dict:
+    job = app.state.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Queue an analysis. An identical (app, date, drilldown, window_days, incremental, spill) job that is
+    queued or running is returned instead of starting another; a completed one is returned with its
+    stored result unless force is set.
+    """
+    job, created = app.state.store.submit(
+        package_name_from_url(request.app_url), request.app_url, request.target_date.isoformat(),
+        window_days=window_config.window_days if request.window_days is None else request.window_days,
+        incremental=window_config.incremental if request.incremental is None else request.incremental,
+        spill=window_config.spill if request.spill is None else request.spill,
+        drilldown=request.drilldown, streaming=request.streaming, force=request.force
+    )
+    if created:
+        await app.state.queue.put(job["job_id"])
+    return {**job_status(job), "deduplicated": not created}
+
+
+@app.get("/jobs/{job_id}")
+async def read_job(job_id: str):
+    return job_status(get_job(job_id))
+
+
+@app.get("/jobs/{job_id}/result")
+async def read_job_result(job_id: str, include_details: bool = True):
+    job = get_job(job_id)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}")
+    result = dict(job["result"])
+    if not include_details:
+        result.pop("topic_details", None)
+    return {**job_status(job), "result": result}
+
+
+@app.get("/jobs/{job_id}/csv")
+async def read_job_csv(job_id: str):
+    job = get_job(job_id)
+    if job["status"] != "completed" or not job["csv_path"] or not os.path.exists(job["csv_path"]):
+        raise HTTPException(status_code=409, detail=f"No trend CSV for job {job_id} ({job['status']})")
+    return FileResponse(job["csv_path"], media_type="text/csv", filename=f"trend_analysis_{job['app']}_{job['target_date']}.csv")
+
+
+@app.get("/trends")
+async def list_trend_history():
+    """Apps with stored trend history and the days they cover"""
+    return {"apps": app.state.trends.apps()}
+
+
+@app.get("/trends/{app_id}")
+async def read_trend_history(app_id: str, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                             granularity: str = "week", topics: Optional[List[str]] = Query(None)):
+    """
+    Historical topic counts for an app (package name) from the trend store, without running anything.
+    Defaults to the year up to the last stored day; granularity is day, week or month.
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=422, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    store = app.state.trends
+    coverage = store.coverage(app_id)
+    if coverage is None:
+        raise HTTPException(status_code=404, detail=f"No trend history for {app_id}")
+    end = (end_date or date.fromisoformat(coverage[1])).isoformat()
+    start = (start_date or date.fromisoformat(end) - timedelta(days=364)).isoformat()
+    matrix = store.load(app_id, start, end, granularity, topics)
+    volume = store.review_volume(app_id, start, end, granularity)
+    return {
+        "app": app_id,
+        "granularity": granularity,
+        "start_date": start,
+        "end_date": end,
+        "periods": matrix.index.tolist(),
+        "reviews": [int(volume.get(period, 0)) for period in matrix.index],
+        "topics": {topic: column.tolist() for topic, column in zip(matrix.columns, matrix.to_numpy().T)},
+    }
+
+
+def review_range(app_id: str, start_date: Optional[date], end_date: Optional[date]):
+    """(start, end) ISO dates, defaulting to the analysis window up to the app's last scraped day"""
+    watermark = app.state.reviews.get_watermark(app_id)
+    if watermark is None:
+        raise HTTPException(status_code=404, detail=f"No reviews stored for {app_id}")
+    end = (end_date or date.fromisoformat(watermark[1])).isoformat()
+    start = (start_date or date.fromisoformat(end) - timedelta(days=window_config.window_days)).isoformat()
+    return start, end
+
+
+@app.get("/reviews/{app_id}")
+async def read_reviews(app_id: str, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                       topics: Optional[List[str]] = Query(None), ratings: Optional[List[int]] = Query(None),
+                       limit: int = Query(50, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    """
+    Stored reviews of an app (package name) behind a topic, date range and / or rating, newest first, from
+    the review topic index written by analyses; nothing is scraped or sent to the LLM.
+    """
+    start, end = review_range(app_id, start_date, end_date)
+    reviews = app.state.reviews.find_reviews(app_id, start, end, topics, ratings, limit=limit, offset=offset)
+    return {"app": app_id, "start_date": start, "end_date": end, "offset": offset, "reviews": reviews}
+
+
+@app.get("/reviews/{app_id}/breakdown")
+async def read_topic_breakdown(app_id: str, by: str = "rating", start_date: Optional[date] = None, end_date: Optional[date] = None,
+                               topics: Optional[List[str]] = Query(None), ratings: Optional[List[int]] = Query(None)):
+    """Reviews per topic and value of `by` (date, rating, country or lang) from the review topic index"""
+    if by not in BREAKDOWNS:
+        raise HTTPException(status_code=422, detail=f"by must be one of {', '.join(BREAKDOWNS)}")
+    start, end = review_range(app_id, start_date, end_date)
+    return {
+        "app": app_id,
+        "by": by,
+        "start_date": start,
+        "end_date": end,
+        "topics": app.state.reviews.topic_breakdown(app_id, start, end, by, topics, ratings),
+    }
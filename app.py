@@ -1,120 +1,108 @@
 import streamlit as st
-import asyncio
+import time
 from datetime import datetime
-from workflow import create_review_analysis_workflow
-from agents.state_types import ReviewAnalysisState
-from config import azure_config
-import os
+from config import service_config
 import pandas as pd
+import requests
 import io
 
-workflow = create_review_analysis_workflow()
+POLL_SECONDS = 2
 
 st.set_page_config(page_title="Review Analysis Agent", layout="wide")
 
 st.title("📊 Review Analysis Agent")
 st.write("Test your end-to-end workflow for app review analysis.")
 
-st.sidebar.header("🔧 Azure OpenAI Configuration")
-
-api_key = st.sidebar.text_input(
-    "Azure OpenAI API Key", 
-    value=os.getenv("AZURE_OPENAI_API_KEY", ""),
-    type="password",
-    help="Your Azure OpenAI API key"
-)
-
-endpoint = st.sidebar.text_input(
-    "Azure OpenAI Endpoint", 
-    value=os.getenv("AZURE_OPENAI_ENDPOINT", ""),
-    help="Your Azure OpenAI endpoint URL (e.g., https://your-resource.openai.azure.com/)"
-)
-
-deployment_name = st.sidebar.text_input(
-    "Deployment Name", 
-    value=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4"),
-    help="Your Azure OpenAI deployment name"
-)
-
-api_version = st.sidebar.text_input(
-    "API Version", 
-    value=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
-    help="Azure OpenAI API version"
-)
-
-if api_key:
-    os.environ["AZURE_OPENAI_API_KEY"] = api_key
-if endpoint:
-    os.environ["AZURE_OPENAI_ENDPOINT"] = endpoint
-if deployment_name:
-    os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"] = deployment_name
-if api_version:
-    os.environ["AZURE_OPENAI_API_VERSION"] = api_version
-
-azure_config.api_key = api_key
-azure_config.endpoint = endpoint
-azure_config.deployment_name = deployment_name
-azure_config.api_version = api_version
-
-if azure_config.is_configured():
-    st.sidebar.success("✅ Azure OpenAI configured")
-else:
-    st.sidebar.error("❌ Azure OpenAI not configured")
-    st.sidebar.info("Please configure Azure OpenAI settings in the sidebar")
+st.sidebar.header("🔧 Analysis Service")
+
+api_url = st.sidebar.text_input(
+    "Service URL",
+    value=service_config.api_url,
+    help="Base URL of the analysis job service (uvicorn api:app); Azure OpenAI is configured there"
+).rstrip("/")
+
+try:
+    requests.get(f"{api_url}/docs", timeout=5).raise_for_status()
+    st.sidebar.success("✅ Analysis service reachable")
+except requests.RequestException:
+    st.sidebar.error("❌ Analysis service not reachable")
+    st.sidebar.info("Start it with `uvicorn api:app --port 8000` or fix the service URL")
 
 with st.form("review_form"):
-    analysis_id = st.number_input("Analysis ID", min_value=1, value=1)
     app_url = st.text_input("App URL or Package Name", value="com.whatsapp")
     target_date = st.date_input("Target Date", value=datetime.today())
+    drilldown = st.checkbox("Drilldown (keywords and sample reviews per topic)", value=False)
+    streaming = st.checkbox("Streaming mode (extract each day as soon as it is ingested)", value=False)
+    force = st.checkbox("Re-run even if a stored result exists", value=False)
     submitted = st.form_submit_button("Run Analysis 🚀")
 
 if submitted:
-    if not azure_config.is_configured():
-        st.error("❌ Azure OpenAI is not configured. Please set up your Azure OpenAI credentials in the sidebar.")
-    else:
-        state: ReviewAnalysisState = {
-            "analysis_id": analysis_id,
+    try:
+        response = requests.post(f"{api_url}/jobs", json={
             "app_url": app_url,
             "target_date": target_date.strftime("%Y-%m-%d"),
-            "raw_reviews": {},
-            "extracted_topics": {},
-            "consolidated_topics": {},
-            "topic_mapping": {},
-            "daily_frequencies": {},
-            "trend_analysis": {},
-            "processing_status": "started",
-            "errors": [],
-            "current_step": "init"
-        }
-
-        with st.spinner("Running workflow..."):
-            result = asyncio.run(workflow.ainvoke(state))
-
+            "drilldown": drilldown,
+            "streaming": streaming,
+            "force": force
+        }, timeout=30)
+        response.raise_for_status()
+        st.session_state["job_id"] = response.json()["job_id"]
+        if response.json()["deduplicated"]:
+            st.info(f"Reusing job {st.session_state['job_id']} ({response.json()['status']}) for this app and date")
+    except requests.RequestException as e:
+        st.error(f"❌ Could not submit the analysis: {str(e)}")
+
+job_id = st.session_state.get("job_id")
+if job_id:
+    with st.spinner(f"Waiting for job {job_id}..."):
+        while True:
+            job = requests.get(f"{api_url}/jobs/{job_id}", timeout=30).json()
+            if job["status"] not in ("queued", "running"):
+                break
+            time.sleep(POLL_SECONDS)
+
+    st.subheader("Processing Status")
+    st.json(job["status"])
+
+    if job.get("errors"):
+        st.error(job["errors"])
+
+    if job["status"] == "completed":
         st.success("✅ Workflow completed!")
-        
-        st.subheader("Processing Status")
-        st.json(result.get("processing_status", ""))
-
-        if result.get("errors"):
-            st.error(result["errors"])
+        result = requests.get(f"{api_url}/jobs/{job_id}/result", timeout=30).json()["result"]
 
         st.subheader("Trend Analysis")
-        trend_data = result.get("trend_analysis", {})
-        if trend_data:
-            dates = [entry['date'] for entry in next(iter(trend_data.values()))['daily_data']]
-            topics = list(trend_data.keys())
-            table = {'date': dates}
-            for topic in topics:
-                table[topic] = [entry['frequency'] for entry in trend_data[topic]['daily_data']]
-            df = pd.DataFrame(table)
+        csv_response = requests.get(f"{api_url}/jobs/{job_id}/csv", timeout=30)
+        if csv_response.ok:
+            df = pd.read_csv(io.StringIO(csv_response.text))
             st.subheader("Trend Analysis CSV")
             st.dataframe(df)
 
-            csv_buffer = io.StringIO()
-            df.to_csv(csv_buffer, index=False)
             st.download_button(
                 label="Download Trend Analysis CSV",
-                data=csv_buffer.getvalue(),
-                file_name=f"trend_analysis_{analysis_id}_{datetime.today().strftime('%Y%m%d')}.csv",
+                data=csv_response.text,
+                file_name=f"trend_analysis_{job['app']}_{job['target_date']}.csv",
                 mime="text/csv"
             )
+
+        st.subheader("Spike Alerts")
+        if result.get("alerts"):
+            st.dataframe(pd.DataFrame(result["alerts"]))
+
+            alert = st.selectbox(
+                "Reviews behind a spike",
+                result["alerts"],
+                format_func=lambda a: f"{a['topic']} on {a['date']} ({a['frequency']} mentions)"
+            )
+            params = {"topics": [alert["topic"]], "start_date": alert["date"], "end_date": alert["date"]}
+            reviews = requests.get(f"{api_url}/reviews/{job['app']}", params={**params, "limit": 200}, timeout=30)
+            breakdown = requests.get(f"{api_url}/reviews/{job['app']}/breakdown", params={**params, "by": "rating"}, timeout=30)
+            if reviews.ok and breakdown.ok:
+                st.write("Reviews by rating:", breakdown.json()["topics"].get(alert["topic"], {}))
+                st.dataframe(pd.DataFrame(reviews.json()["reviews"], columns=["at", "rating", "content", "topics"]))
+        else:
+            st.info("No topic spikes in the most recent days")
+
+        if result.get("topic_details"):
+            st.subheader("Topic Drilldown")
+            st.json(result["topic_details"])
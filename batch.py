@@ -0,0 +1,151 @@
+# batch.py
+# Headless multi-app runner for nightly analyses:
+#   python batch.py com.whatsapp in.swiggy.android --date 2025-08-20
+#   python batch.py --apps-file apps.txt --workers 8
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from config import azure_config, batch_config, storage_config, window_config
+from utils.scraper_service import package_name_from_url
+from workflow import new_analysis_state, run_review_analysis
+
+def init_worker(budget_path: str, max_concurrency: int):
+    """Runs once in every worker process: share the LLM rate budget and split the concurrency cap"""
+    azure_config.shared_budget_path = budget_path
+    azure_config.max_concurrency = max_concurrency
+
+
+def analyze_app(app_url: str, target_date: str, output_dir: str, drilldown: bool = False,
+                window_days: int = None, incremental: bool = None, spill: bool = None) -> dict:
+    """
+    Run the checkpointed workflow for one app in the current process and write its outputs.
+    The analysis_id is derived from the app and date, so rerunning a failed batch resumes each
+    unfinished app from its last checkpoint.
+    Returns the app's summary entry.
+    """
+    package_name = package_name_from_url(app_url)
+    analysis_id = f"batch-{target_date}-{package_name}"
+    summary = {"app": package_name, "analysis_id": analysis_id, "status": "failed", "errors": []}
+    started = time.perf_counter()
+
+    try:
+        result = asyncio.run(run_review_analysis(new_analysis_state(analysis_id, app_url, target_date, drilldown, window_days, incremental, spill)))
+    except Exception as e:
+        summary["errors"].append(f"Workflow error: {str(e)}")
+        summary["seconds"] = round(time.perf_counter() - started, 2)
+        return summary
+
+    summary["status"] = result.get("processing_status", "")
+    summary["errors"] = result.get("errors", [])
+    summary["reviews"] = sum((result.get("review_volume") or {}).values())
+    consolidated = result.get("consolidated_topics") or {}
+    summary["topics"] = len(consolidated)
+    summary["top_topics"] = dict(sorted(consolidated.items(), key=lambda item: (-item[1], item[0]))[:5])
+    summary["alerts"] = result.get("alerts") or []
+
+    matrix = result.get("trend_matrix")
+    if matrix is not None:
+        summary["csv"] = os.path.join(output_dir, f"{package_name}.csv")
+        matrix.to_csv(summary["csv"])
+    if result.get("topic_details"):
+        summary["drilldown"] = os.path.join(output_dir, f"{package_name}_drilldown.json")
+        with open(summary["drilldown"], "w") as f:
+            json.dump(result["topic_details"], f, indent=2)
+
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def run_batch(app_urls: list, target_date: str, workers: int = 0, output_dir: str = None, drilldown: bool = False,
+              window_days: int = None, incremental: bool = None, spill: bool = None) -> dict:
+    """
+    Analyze every app for target_date across a pool of worker processes.
+    All workers draw from one RPM / TPM budget (a shared SQLite token bucket), and the configured
+    LLM concurrency is split between them, so the pool as a whole stays within the deployment's quota.
+    Writes <package>.csv per app plus summary.json to output_dir/<target_date>/ and returns the summary.
+    """
+    app_urls = list(dict.fromkeys(app_urls))
+    workers = min(workers or os.cpu_count() or 1, len(app_urls)) or 1
+    output_dir = os.path.join(output_dir or batch_config.output_dir, target_date)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    budget_path = azure_config.shared_budget_path or os.path.join(storage_config.data_dir, "llm_budget.db")
+    worker_concurrency = max(1, azure_config.max_concurrency // workers)
+    print(f"Analyzing {len(app_urls)} apps for {target_date} with {workers} worker(s), "
+          f"LLM concurrency {worker_concurrency} per worker, shared budget in {budget_path}")
+
+    started = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(budget_path, worker_concurrency)) as pool:
+        futures = {pool.submit(analyze_app, app_url, target_date, output_dir, drilldown, window_days, incremental, spill): app_url for app_url in app_urls}
+        for future in as_completed(futures):
+            app_url = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                # the worker process itself died (e.g. out of memory)
+                summary = {"app": package_name_from_url(app_url), "status": "failed", "errors": [f"Worker error: {str(e)}"]}
+            results[app_url] = summary
+            print(f"[{len(results)}/{len(app_urls)}] {summary['app']}: {summary['status']} ({summary.get('seconds', 0)}s)")
+
+    apps = [results[app_url] for app_url in app_urls]
+    batch_summary = {
+        "target_date": target_date,
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 2),
+        "completed": sum(1 for app in apps if app["status"] == "completed"),
+        "failed": sum(1 for app in apps if app["status"] != "completed"),
+        "apps": apps
+    }
+    summary_path = os.path.join(output_dir, "summary.json")
+    with open(summary_path, "w") as f:
+        json.dump(batch_summary, f, indent=2)
+    print(f"Batch finished in {batch_summary['seconds']}s: {batch_summary['completed']} completed, "
+          f"{batch_summary['failed']} failed. Summary: {summary_path}")
+    return batch_summary
+
+
+def read_apps_file(path: str) -> list:
+    """One app URL or package name per line; blank lines and # comments are skipped"""
+    with open(path) as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the review analysis for many apps in parallel worker processes.")
+    parser.add_argument("apps", nargs="*", help="App URLs or package names")
+    parser.add_argument("--apps-file", help="File with one app URL or package name per line")
+    parser.add_argument("--date", default=(datetime.today() - timedelta(days=1)).strftime("%Y-%m-%d"),
+                        help="Target date (YYYY-MM-DD), defaults to yesterday")
+    parser.add_argument("--workers", type=int, default=batch_config.workers, help="Worker processes (0: one per CPU core)")
+    parser.add_argument("--output-dir", default=batch_config.output_dir, help="Directory for per-app outputs and the summary")
+    parser.add_argument("--drilldown", action="store_true", help="Also extract keywords and sample reviews per topic")
+    parser.add_argument("--window-days", type=int, default=window_config.window_days, help="Days before the target date in the window")
+    parser.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=window_config.incremental,
+                        help="Reuse stored day results and only load / extract the days without one")
+    parser.add_argument("--spill", action=argparse.BooleanOptionalAction, default=window_config.spill,
+                        help="Keep each app's review window in a file on disk instead of in memory")
+    args = parser.parse_args(argv)
+
+    app_urls = list(args.apps)
+    if args.apps_file:
+        app_urls += read_apps_file(args.apps_file)
+    if not app_urls:
+        parser.error("no apps given")
+    if not azure_config.is_configured():
+        print("Azure OpenAI not configured. Please set AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, and AZURE_OPENAI_DEPLOYMENT_NAME environment variables.")
+        return 2
+
+    summary = run_batch(app_urls, args.date, workers=args.workers, output_dir=args.output_dir, drilldown=args.drilldown,
+                        window_days=args.window_days, incremental=args.incremental, spill=args.spill)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+# benchmark.py
+# Offline performance benchmark: synthetic reviews, a stand-in scraper and chat model, no network.
+#   python benchmark.py                                   # 1k / 10k / 100k reviews
+#   python benchmark.py --sizes 1000,10000 --baseline output/benchmarks/baseline.json
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from agents.data_ingestion import data_ingestion_node
+from agents.review_report import review_report_node
+from agents.topic_consolidation import topic_consolidation_node
+from agents.topic_extraction import topic_extraction_node
+from agents.trend_analytics import trend_analytics_node
+from config import azure_config, instrumentation_config, scraper_config, storage_config, window_config
+from utils.fake_llm import FakeChatModel
+from utils.fake_scraper import FakeReviewsBackend
+from utils.metrics import RunMetrics, track_run
+from workflow import create_review_analysis_workflow, new_analysis_state
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+TARGET_DATE = "2025-08-20"
+
+NODES = [
+    ("ingest_data", data_ingestion_node),
+    ("extract_topics", topic_extraction_node),
+    ("consolidate_topics", topic_consolidation_node),
+    ("generate_report", review_report_node),
+    ("analyze_trends", trend_analytics_node),
+]
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile (q in 0..100); 0.0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def latency_summary(latencies: list) -> dict:
+    return {
+        "p50": round(percentile(latencies, 50), 4),
+        "p95": round(percentile(latencies, 95), 4),
+        "p99": round(percentile(latencies, 99), 4),
+        "max": round(max(latencies), 4) if latencies else 0.0,
+    }
+
+
+async def measure(run, trace_memory: bool):
+    """Await run(); returns (result, seconds, peak traced MB or None)"""
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = await run()
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+class Benchmark:
+    """
+    Runs every node on its own (fed by the previous node's output) and the whole graph for one
+    review volume. Each pass starts from an empty data directory with the LLM cache off, so
+    every pass scrapes, extracts and consolidates cold.
+    """
+
+    def __init__(self, args, work_dir: str):
+        self.args = args
+        self.work_dir = work_dir
+        self.passes = 0
+        self.devnull = open(os.devnull, "w")
+
+    def _fresh_pass(self, size: int):
+        self.passes += 1
+        storage_config.set_data_dir(os.path.join(self.work_dir, f"pass{self.passes}"))
+        return f"com.benchmark.r{size}.p{self.passes}", f"benchmark-{size}-{self.passes}"
+
+    def _quiet(self):
+        return redirect_stdout(sys.stdout if self.args.verbose else self.devnull)
+
+    async def run_nodes(self, size: int, trace_memory: bool) -> dict:
+        app, analysis_id = self._fresh_pass(size)
+        state = new_analysis_state(analysis_id, app, TARGET_DATE)
+        timings = {}
+        for name, node in NODES:
+            with self._quiet():
+                update, seconds, peak = await measure(lambda: node(state), trace_memory)
+            state.update(update)
+            timings[name] = {"seconds": seconds, "peak_mb": peak, "status": update.get("processing_status")}
+            if update.get("processing_status", "").endswith("_failed"):
+                raise RuntimeError(f"{name} failed at {size} reviews: {update.get('errors')}")
+        return timings
+
+    async def run_graph(self, size: int, trace_memory: bool) -> dict:
+        app, analysis_id = self._fresh_pass(size)
+        graph = create_review_analysis_workflow()
+        with self._quiet():
+            result, seconds, peak = await measure(lambda: graph.ainvoke(new_analysis_state(analysis_id, app, TARGET_DATE)), trace_memory)
+        if result.get("processing_status") != "completed":
+            raise RuntimeError(f"Graph failed at {size} reviews: {result.get('errors')}")
+        return {"seconds": seconds, "peak_mb": peak, "reviews": len(result["raw_reviews"])}
+
+    async def run_size(self, size: int) -> dict:
+        args = self.args
+        reviews_per_day = math.ceil(size / (window_config.window_days + 1))
+        scraper_config.backend = FakeReviewsBackend(
+            reviews_per_day=reviews_per_day, days=window_config.window_days + 1,
+            end_date=datetime.strptime(TARGET_DATE, "%Y-%m-%d") + timedelta(hours=23, minutes=59),
+            latency=args.scraper_latency, seed=args.seed, duplicate_rate=args.duplicate_rate
+        )
+        model = FakeChatModel(
+            latency=args.llm_latency, max_prompt_tokens=args.max_prompt_tokens,
+            requests_per_minute=args.llm_rpm, rate_limit_rate=args.rate_limit_rate,
+            malformed_rate=args.malformed_rate, seed=args.seed
+        )
+        azure_config.chat_model = model
+        result = {"reviews": reviews_per_day * (window_config.window_days + 1), "nodes": {}, "graph": {}}
+
+        if not args.skip_nodes:
+            model.reset()
+            metrics = RunMetrics("benchmark-nodes", f"reviews-{size}", TARGET_DATE)
+            runs = []
+            with track_run(metrics):
+                for _ in range(args.repeats):
+                    runs.append(await self.run_nodes(size, trace_memory=False))
+            result["nodes_llm"] = self._llm_summary(model, metrics, len(runs))
+            memory = await self.run_nodes(size, trace_memory=True) if args.memory else {}
+            for name, _ in NODES:
+                seconds = sorted(run[name]["seconds"] for run in runs)[len(runs) // 2]
+                result["nodes"][name] = {
+                    "seconds": round(seconds, 4),
+                    "reviews_per_second": round(result["reviews"] / seconds, 1) if seconds else None,
+                    "peak_mb": round(memory[name]["peak_mb"], 2) if memory else None,
+                }
+
+        if not args.skip_graph:
+            model.reset()
+            metrics = RunMetrics("benchmark-graph", f"reviews-{size}", TARGET_DATE)
+            runs = []
+            with track_run(metrics):
+                for _ in range(args.repeats):
+                    runs.append(await self.run_graph(size, trace_memory=False))
+            result["graph_llm"] = self._llm_summary(model, metrics, len(runs))
+            memory = await self.run_graph(size, trace_memory=True) if args.memory else None
+            seconds = sorted(run["seconds"] for run in runs)[len(runs) // 2]
+            result["graph"] = {
+                "seconds": round(seconds, 4),
+                "reviews_per_second": round(result["reviews"] / seconds, 1) if seconds else None,
+                "peak_mb": round(memory["peak_mb"], 2) if memory else None,
+            }
+        return result
+
+    @staticmethod
+    def _llm_summary(model: FakeChatModel, metrics: RunMetrics, runs: int) -> dict:
+        """LLM traffic per timed pass with call latency percentiles; taken before the memory pass"""
+        stages = metrics.report()["llm"].values()
+        return {
+            "calls_per_run": round(sum(stage["calls"] for stage in stages) / runs, 1),
+            "tokens_per_run": round(sum(stage["prompt_tokens"] + stage["completion_tokens"] for stage in stages) / runs),
+            "retries_per_run": round(sum(stage["retries"] for stage in stages) / runs, 1),
+            "repairs_per_run": round(sum(stage["repairs"] for stage in stages) / runs, 1),
+            "rate_limited": model.stats["rate_limited"],
+            "queue_wait_seconds_per_run": round(sum(stage["queue_wait_seconds"] for stage in stages) / runs, 4),
+            "latency": latency_summary(model.latencies),
+        }
+
+
+def compare_to_baseline(results: list, baseline: dict, tolerance: float) -> list:
+    """Regressions: stages whose time or peak memory grew by more than `tolerance` over the baseline"""
+    regressions = []
+    previous = {entry["size"]: entry for entry in baseline.get("results", [])}
+    for entry in results:
+        base = previous.get(entry["size"])
+        if base is None:
+            continue
+        stages = [(f"node {name}", entry["nodes"].get(name), base["nodes"].get(name)) for name, _ in NODES]
+        stages.append(("graph", entry.get("graph"), base.get("graph")))
+        for label, current, old in stages:
+            if not current or not old:
+                continue
+            for key in ("seconds", "peak_mb"):
+                if current.get(key) is not None and old.get(key) and current[key] > old[key] * (1 + tolerance):
+                    regressions.append(f"{entry['size']} reviews, {label}: {key} {old[key]} -> {current[key]}")
+    return regressions
+
+
+def print_results(results: list):
+    print(f"{'size':>8} {'stage':<20} {'seconds':>9} {'reviews/s':>11} {'peak MB':>9}")
+    for entry in results:
+        rows = list(entry["nodes"].items()) + ([("graph", entry["graph"])] if entry["graph"] else [])
+        for stage, row in rows:
+            peak = f"{row['peak_mb']:.1f}" if row["peak_mb"] is not None else "-"
+            print(f"{entry['size']:>8} {stage:<20} {row['seconds']:>9.3f} {row['reviews_per_second'] or 0:>11.0f} {peak:>9}")
+        for mode in ("nodes_llm", "graph_llm"):
+            if mode in entry:
+                llm = entry[mode]
+                print(f"{entry['size']:>8} {mode:<20} {llm['calls_per_run']} calls/run, {llm['retries_per_run']} retries/run, "
+                      f"latency p50 {llm['latency']['p50']}s p95 {llm['latency']['p95']}s p99 {llm['latency']['p99']}s")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the review analysis pipeline.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma separated review volumes per analysis window")
+    parser.add_argument("--window-days", type=int, default=window_config.window_days, help="Days before the target date in the window")
+    parser.add_argument("--spill", action="store_true", help="Spill the review window to disk (memory-bounded mode)")
+    parser.add_argument("--repeats", type=int, default=1, help="Timed passes per size (the median is reported)")
+    parser.add_argument("--duplicate-rate", type=float, default=0.2, help="Share of verbatim duplicate reviews")
+    parser.add_argument("--scraper-latency", type=float, default=0.02, help="Seconds per scraped page")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Base seconds per LLM call")
+    parser.add_argument("--llm-rpm", type=int, default=0, help="Simulated server-side requests-per-minute quota (0: none)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.01, help="Probability of a random 429 per LLM call")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Probability of a truncated JSON response per LLM call")
+    parser.add_argument("--max-prompt-tokens", type=int, default=128000, help="Simulated context window")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="Skip the tracemalloc peak-memory pass")
+    parser.add_argument("--skip-nodes", action="store_true", help="Only benchmark the whole graph")
+    parser.add_argument("--skip-graph", action="store_true", help="Only benchmark the nodes one by one")
+    parser.add_argument("--output", help="Results JSON (default output/benchmarks/benchmark_<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against; regressions exit with status 1")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown / memory growth over the baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own log output")
+    args = parser.parse_args(argv)
+
+    # no LLM cache, run reports or textfiles: every pass is cold and leaves nothing behind
+    storage_config.llm_cache_enabled = False
+    instrumentation_config.report_dir = ""
+    instrumentation_config.textfile_dir = ""
+    window_config.window_days = args.window_days
+    window_config.incremental = False
+    window_config.spill = args.spill
+    work_dir = tempfile.mkdtemp(prefix="review_benchmark_")
+
+    results = []
+    try:
+        benchmark = Benchmark(args, work_dir)
+        for size in [int(size) for size in args.sizes.split(",") if size.strip()]:
+            print(f"Benchmarking {size} reviews...")
+            results.append({"size": size, **asyncio.run(benchmark.run_size(size))})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "verbose")},
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
+        "results": results,
+    }
+    output = args.output or os.path.join("output", "benchmarks", f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    if os.path.dirname(output) and not os.path.exists(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_results(results)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions over {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,10 +9,24 @@ class AzureOpenAIConfig:
         self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "")
         self.api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
         self.deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")
+        # client-side quota for the deployment (0 disables a budget)
+        self.max_concurrency = int(os.getenv("AZURE_OPENAI_MAX_CONCURRENCY", "4"))
+        self.requests_per_minute = int(os.getenv("AZURE_OPENAI_RPM", "0"))
+        self.tokens_per_minute = int(os.getenv("AZURE_OPENAI_TPM", "0"))
+        # seconds before a single LLM HTTP request times out (retried by the scheduler)
+        self.request_timeout = float(os.getenv("AZURE_OPENAI_TIMEOUT", "120"))
+        # SQLite file holding the RPM / TPM buckets shared by every process that points at it (empty: per-process budgets)
+        self.shared_budget_path = os.getenv("AZURE_OPENAI_SHARED_BUDGET_PATH", "")
+        # upper bound on review tokens sent in one extraction prompt; larger days are split into chunks
+        self.chunk_tokens = int(os.getenv("AZURE_OPENAI_CHUNK_TOKENS", "6000"))
+        # upper bound on topics sent in one consolidation prompt; more topics are sharded across calls
+        self.consolidation_shard_topics = int(os.getenv("AZURE_OPENAI_CONSOLIDATION_SHARD_TOPICS", "150"))
+        # replacement for AzureChatOpenAI, e.g. utils.fake_llm.FakeChatModel() for offline runs
+        self.chat_model = None
         
     def is_configured(self) -> bool:
         """Check if Azure OpenAI is properly configured"""
-        return bool(self.api_key and self.endpoint and self.deployment_name)
+        return self.chat_model is not None or bool(self.api_key and self.endpoint and self.deployment_name)
     
     def get_config_dict(self) -> dict:
         """Get configuration as dictionary for LangChain"""
@@ -24,3 +38,161 @@ class AzureOpenAIConfig:
         }
 
 azure_config = AzureOpenAIConfig()
+
+
+class ScraperConfig:
+    """Configuration class for review scraping"""
+
+    def __init__(self):
+        # comma separated country:lang pairs, e.g. "in:en,us:en,gb:en"
+        self.locales = self.parse_locales(os.getenv("SCRAPER_LOCALES", "in:en"))
+        self.max_workers = int(os.getenv("SCRAPER_MAX_WORKERS", "8"))
+        # pages of 200 reviews walked per locale and scrape; a scrape that hits the cap is stored but not
+        # recorded as covering its range, so raise it for apps with more reviews than that in one window
+        self.max_pages = int(os.getenv("SCRAPER_MAX_PAGES", "500"))
+        # replacement for google_play_scraper.reviews, e.g. utils.fake_scraper.FakeReviewsBackend() for offline runs
+        self.backend = None
+
+    @staticmethod
+    def parse_locales(value: str) -> list:
+        locales = []
+        for pair in value.split(","):
+            pair = pair.strip()
+            if not pair:
+                continue
+            country, _, lang = pair.partition(":")
+            locales.append((country.strip(), (lang or "en").strip()))
+        return locales
+
+scraper_config = ScraperConfig()
+
+
+class StorageConfig:
+    """Configuration class for local on-disk storage"""
+
+    def __init__(self):
+        self.set_data_dir(os.getenv("REVIEW_DATA_DIR", "data"))
+        # LLM response cache (0 disables the TTL / size limits)
+        self.llm_cache_enabled = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+        self.llm_cache_ttl_hours = float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))
+        self.llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+        self.llm_cache_max_mb = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+    def set_data_dir(self, data_dir: str):
+        """Place every on-disk store under data_dir (stores whose path is set by its own env var stay put)"""
+        self.data_dir = data_dir
+        self.review_db_path = os.getenv("REVIEW_DB_PATH", os.path.join(self.data_dir, "reviews.db"))
+        self.topic_registry_path = os.getenv("TOPIC_REGISTRY_PATH", os.path.join(self.data_dir, "topic_registry.db"))
+        # LangGraph checkpoints, for resuming runs by analysis_id
+        self.checkpoint_path = os.getenv("CHECKPOINT_DB_PATH", os.path.join(self.data_dir, "checkpoints.db"))
+        # per-day extraction results by app / date / extraction version, reused by resumed and later runs
+        self.day_results_path = os.getenv("DAY_RESULTS_PATH", os.path.join(self.data_dir, "day_results.db"))
+        self.label_db_path = os.getenv("LABEL_DB_PATH", os.path.join(self.data_dir, "topic_labels.db"))
+        self.job_db_path = os.getenv("JOB_DB_PATH", os.path.join(self.data_dir, "jobs.db"))
+        self.llm_cache_path = os.getenv("LLM_CACHE_PATH", os.path.join(self.data_dir, "llm_cache.db"))
+        # daily topic counts of every analyzed day plus weekly / monthly rollups, for historical trends
+        self.trend_store_path = os.getenv("TREND_STORE_PATH", os.path.join(self.data_dir, "trend_history.db"))
+        # spilled review windows of runs in progress (see WindowConfig.spill), removed when a run completes
+        self.spill_dir = os.getenv("REVIEW_SPILL_DIR", os.path.join(self.data_dir, "spill"))
+
+storage_config = StorageConfig()
+
+
+class ExtractionConfig:
+    """Configuration class for the local stages that run before LLM topic extraction"""
+
+    def __init__(self):
+        # collapse identical / near-identical reviews into one weighted representative
+        self.dedup_enabled = os.getenv("EXTRACTION_DEDUP_ENABLED", "1") == "1"
+        self.dedup_threshold = float(os.getenv("EXTRACTION_DEDUP_THRESHOLD", "0.8"))
+        # label confident reviews locally with keyword rules confirmed by a TF-IDF model trained on LLM labels;
+        # off by default, and with no labels recorded yet everything still goes to the LLM
+        self.classifier_enabled = os.getenv("EXTRACTION_CLASSIFIER_ENABLED", "0") == "1"
+        self.classifier_max_words = int(os.getenv("EXTRACTION_CLASSIFIER_MAX_WORDS", "25"))
+
+extraction_config = ExtractionConfig()
+
+
+class WindowConfig:
+    """Configuration class for the analysis window"""
+
+    def __init__(self):
+        # days analyzed before target_date (the window also includes target_date itself), e.g. 7, 30, 90, 365
+        self.window_days = int(os.getenv("ANALYSIS_WINDOW_DAYS", "30"))
+        # only load and extract days without a stored result; the rest of the window comes from the day result store
+        self.incremental = os.getenv("ANALYSIS_INCREMENTAL", "0") == "1"
+        # keep the window's reviews in a file on disk instead of in the workflow state, for very large apps
+        self.spill = os.getenv("ANALYSIS_SPILL", "0") == "1"
+        # days of a spilled window read back and extracted at a time
+        self.spill_days = int(os.getenv("ANALYSIS_SPILL_DAYS", "4"))
+
+window_config = WindowConfig()
+
+
+class StreamingConfig:
+    """Configuration class for the streaming workflow"""
+
+    def __init__(self):
+        # days buffered between ingestion and extraction before the scraper is held back
+        self.queue_days = int(os.getenv("STREAMING_QUEUE_DAYS", "4"))
+        self.extraction_workers = int(os.getenv("STREAMING_EXTRACTION_WORKERS", "4"))
+
+streaming_config = StreamingConfig()
+
+
+class TrendAnalyticsConfig:
+    """Configuration class for the trend analytics stage (rolling statistics and spike alerts)"""
+
+    def __init__(self):
+        # trailing days used for rolling means and as the spike baseline
+        self.window_days = int(os.getenv("TREND_WINDOW_DAYS", "7"))
+        # "zscore" (trailing window mean / std) or "ewma" (exponentially weighted mean / std)
+        self.spike_method = os.getenv("TREND_SPIKE_METHOD", "zscore")
+        self.ewma_span = float(os.getenv("TREND_EWMA_SPAN", "7"))
+        self.spike_threshold = float(os.getenv("TREND_SPIKE_THRESHOLD", "3.0"))
+        # a day needs at least this many mentions and days of history before it can be flagged
+        self.min_count = int(os.getenv("TREND_MIN_COUNT", "5"))
+        self.min_history_days = int(os.getenv("TREND_MIN_HISTORY_DAYS", "7"))
+        # only spikes in the most recent days become alerts (0: the whole history)
+        self.alert_days = int(os.getenv("TREND_ALERT_DAYS", "7"))
+        self.max_alerts = int(os.getenv("TREND_MAX_ALERTS", "50"))
+
+trend_config = TrendAnalyticsConfig()
+
+
+class InstrumentationConfig:
+    """Configuration class for run reports, Prometheus metrics and log verbosity"""
+
+    def __init__(self):
+        # print full LLM responses, parsed payloads and per-day / per-chunk / per-shard progress (large on big runs)
+        self.verbose = os.getenv("LOG_VERBOSE", "0") == "1"
+        # JSON report per run (empty disables)
+        self.report_dir = os.getenv("METRICS_REPORT_DIR", os.path.join("output", "metrics"))
+        # Prometheus textfile per app, e.g. the node_exporter textfile collector directory (empty disables)
+        self.textfile_dir = os.getenv("METRICS_TEXTFILE_DIR", os.path.join("output", "metrics"))
+
+instrumentation_config = InstrumentationConfig()
+
+
+class BatchConfig:
+    """Configuration class for the headless multi-app batch runner"""
+
+    def __init__(self):
+        # worker processes (0: one per CPU core, capped at the number of apps)
+        self.workers = int(os.getenv("BATCH_WORKERS", "0"))
+        self.output_dir = os.getenv("BATCH_OUTPUT_DIR", os.path.join("output", "batch"))
+
+batch_config = BatchConfig()
+
+
+class ServiceConfig:
+    """Configuration class for the analysis job service (api.py) and its clients"""
+
+    def __init__(self):
+        # job processes, i.e. analyses run concurrently by the service
+        self.workers = int(os.getenv("SERVICE_WORKERS", "2"))
+        self.output_dir = os.getenv("SERVICE_OUTPUT_DIR", os.path.join("output", "jobs"))
+        # where the Streamlit app finds the service
+        self.api_url = os.getenv("REVIEW_API_URL", "http://localhost:8000")
+
+service_config = ServiceConfig()
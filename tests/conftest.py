@@ -0,0 +1,23 @@
+import os
+import sys
+
+# the modules are top-level scripts and packages next to this directory, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+import pytest
+from config import azure_config, extraction_config, scraper_config, storage_config
+from utils.fake_llm import FakeChatModel
+from utils.fake_scraper import FakeReviewsBackend
+
+
+@pytest.fixture
+def offline(tmp_path, monkeypatch):
+    """Stores under tmp_path, a fake LLM and a small fake review feed ending 2025-08-20"""
+    data_dir = storage_config.data_dir
+    storage_config.set_data_dir(str(tmp_path))
+    monkeypatch.setattr(azure_config, "chat_model", FakeChatModel(latency=0.0, jitter=0.0))
+    monkeypatch.setattr(extraction_config, "classifier_enabled", False)
+    monkeypatch.setattr(scraper_config, "backend", FakeReviewsBackend(reviews_per_day=3, days=10, end_date=datetime(2025, 8, 20, 23)))
+    yield
+    storage_config.set_data_dir(data_dir)
@@ -0,0 +1,33 @@
+from utils.compact_state import TopicCounts
+
+
+def counts():
+    matrix = TopicCounts(["2025-08-02", "2025-08-01"])
+    matrix.set_row("2025-08-01", {"late_delivery": 2, "app_crash": 1})
+    matrix.set_row("2025-08-02", {"delivery_late": 3})
+    matrix.add("2025-08-03", "app_crash", 4)
+    return matrix
+
+
+def test_rows_and_totals():
+    matrix = counts()
+    assert matrix.dates == ["2025-08-01", "2025-08-02", "2025-08-03"]
+    assert matrix.totals() == {"late_delivery": 2, "app_crash": 5, "delivery_late": 3}
+    assert matrix.row("2025-08-02") == {"delivery_late": 3}
+    assert matrix.row("2025-09-01") == {}
+    assert matrix.nnz() == 4
+
+
+def test_remap_merges_topics_per_day():
+    remapped = counts().remap({"late_delivery": "delivery_time", "delivery_late": "delivery_time"})
+    assert remapped.to_dict() == {
+        "2025-08-01": {"delivery_time": 2, "app_crash": 1},
+        "2025-08-02": {"delivery_time": 3},
+        "2025-08-03": {"app_crash": 4},
+    }
+    assert remapped.totals() == {"delivery_time": 5, "app_crash": 5}
+
+
+def test_remap_onto_one_topic_sums_a_day():
+    remapped = counts().remap({"late_delivery": "issue", "app_crash": "issue"})
+    assert remapped.row("2025-08-01") == {"issue": 3}
@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime
+from agents.data_ingestion import ingest_window
+from agents.topic_extraction import review_key
+from config import scraper_config, storage_config
+from utils.checkpoints import DayResults
+from utils.fake_scraper import FakeReviewsBackend
+from utils.review_store import ReviewStore
+
+APP = "com.example.app"
+
+
+def stored_window():
+    """Day results for every day of a freshly ingested window, keyed like extraction keys them"""
+    window, _ = asyncio.run(ingest_window(APP, "2025-08-20", 3))
+    day_results = DayResults(storage_config.day_results_path, APP, "v")
+    for date_str, reviews in window.iter_days():
+        day_results.save(date_str, review_key(reviews), len(reviews), {"topic": len(reviews)}, {})
+    return day_results
+
+
+def stored_review(date_str, review_id="late", content="app crashes"):
+    return {"review_id": review_id, "user": "u", "rating": 1, "content": content, "at": date_str,
+            "reply": None, "country": "in", "lang": "en"}
+
+
+def test_day_with_a_new_review_is_not_reused(offline):
+    day_results = stored_window()
+    store = ReviewStore(storage_config.review_db_path)
+    store.upsert_reviews(APP, {"2025-08-18": [stored_review("2025-08-18")]})
+    store.close()
+
+    window, reused = asyncio.run(ingest_window(APP, "2025-08-20", 3, day_results=day_results))
+    day_results.close()
+    # the last day is always scraped again; the day that gained a review is loaded instead of reused
+    assert sorted(reused) == ["2025-08-17", "2025-08-19"]
+    assert window.day_counts()["2025-08-18"] == 4
+
+
+def test_day_with_an_edited_review_is_not_reused(offline):
+    day_results = stored_window()
+    store = ReviewStore(storage_config.review_db_path)
+    edited = store.load_reviews(APP, "2025-08-18", "2025-08-18")["2025-08-18"][0]
+    # same review id and day, new text: the day's review count does not change
+    store.upsert_reviews(APP, {"2025-08-18": [stored_review("2025-08-18", edited["review_id"], "edited: now it crashes")]})
+    store.close()
+
+    window, reused = asyncio.run(ingest_window(APP, "2025-08-20", 3, day_results=day_results))
+    day_results.close()
+    assert sorted(reused) == ["2025-08-17", "2025-08-19"]
+    assert window.day_counts()["2025-08-18"] == 3
+    assert "edited: now it crashes" in [review["content"] for _, day in window.iter_days() for review in day]
+
+
+def test_scrape_stopped_at_the_page_cap_does_not_cover_its_range(offline, monkeypatch):
+    monkeypatch.setattr(scraper_config, "backend", FakeReviewsBackend(reviews_per_day=400, days=10, end_date=datetime(2025, 8, 20, 23)))
+    monkeypatch.setattr(scraper_config, "max_pages", 3)
+    asyncio.run(ingest_window(APP, "2025-08-20", 3))
+
+    store = ReviewStore(storage_config.review_db_path)
+    # what was scraped is kept, but the range is scraped again next time
+    assert store.get_watermark(APP) is None
+    assert store.missing_range(APP, "2025-08-17", "2025-08-20") == ("2025-08-17", "2025-08-20")
+    assert len(store.load_columns(APP, "2025-08-17", "2025-08-20")) == 600
+
+    monkeypatch.setattr(scraper_config, "max_pages", 500)
+    asyncio.run(ingest_window(APP, "2025-08-20", 3))
+    assert store.get_watermark(APP) == ("2025-08-17", "2025-08-20")
+    counts = store.load_columns(APP, "2025-08-17", "2025-08-20").day_counts()
+    assert sorted(counts) == ["2025-08-17", "2025-08-18", "2025-08-19", "2025-08-20"] and min(counts.values()) > 300
+    store.close()
+
+
+def test_spilled_cold_scrape_goes_straight_to_the_store(offline, tmp_path):
+    window, _ = asyncio.run(ingest_window(APP, "2025-08-20", 3, spill_path=str(tmp_path / "window.jsonl")))
+    store = ReviewStore(storage_config.review_db_path)
+    assert store.get_watermark(APP) == ("2025-08-17", "2025-08-20")
+    assert window.day_counts() == store.load_columns(APP, "2025-08-17", "2025-08-20").day_counts()
+    assert len(window) == 12
+    store.close()
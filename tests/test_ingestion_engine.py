@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from utils.fake_scraper import FakeReviewsBackend
+from utils.ingestion_engine import IngestionEngine
+
+END = datetime(2025, 3, 10, 12)
+
+
+class FailingLocaleBackend(FakeReviewsBackend):
+    """Fake feed whose pages fail for one country"""
+
+    def __init__(self, failing_country, **kwargs):
+        super().__init__(reviews_per_day=5, days=10, end_date=END, **kwargs)
+        self.failing_country = failing_country
+
+    def __call__(self, package_name, lang="en", country="us", **kwargs):
+        if country == self.failing_country:
+            raise RuntimeError("HTTP 503")
+        return super().__call__(package_name, lang=lang, country=country, **kwargs)
+
+
+def ingest(backend, locales, on_day=None, max_pages=500):
+    engine = IngestionEngine(locales=locales, max_workers=2, backend=backend, max_pages=max_pages)
+    result = asyncio.run(engine.ingest(["com.example"], END - timedelta(days=3), END, on_day=on_day))
+    return engine, result
+
+
+def test_failed_shard_keeps_other_shards():
+    engine, result = ingest(FailingLocaleBackend("us"), [("in", "en"), ("us", "en")])
+    reviews = [review for day in result["com.example"].values() for review in day]
+    assert reviews and {review["country"] for review in reviews} == {"in"}
+    assert [(package, country) for package, country, _, _ in engine.failed_shards] == [("com.example", "us")]
+    assert engine.failed_packages() == {"com.example"}
+
+
+def test_failed_shard_does_not_hold_back_streamed_days():
+    days = []
+
+    async def on_day(package, date_str, reviews):
+        days.append(date_str)
+
+    engine, result = ingest(FailingLocaleBackend("us"), [("in", "en"), ("us", "en")], on_day=on_day)
+    assert sorted(days) == sorted(result["com.example"])
+
+
+def test_every_shard_failing_raises():
+    with pytest.raises(RuntimeError):
+        ingest(FailingLocaleBackend("in"), [("in", "en")])
+
+
+def test_no_failures():
+    engine, result = ingest(FakeReviewsBackend(reviews_per_day=5, days=10, end_date=END), [("in", "en"), ("us", "en")])
+    assert engine.failed_shards == [] and engine.failed_packages() == set()
+    assert engine.truncated_shards == [] and engine.incomplete_packages() == set()
+    assert len(result["com.example"]) == 4
+
+
+def test_page_cap_marks_the_package_incomplete():
+    # 400 reviews a day at 200 per page: two pages only reach back to the newest day
+    engine, result = ingest(FakeReviewsBackend(reviews_per_day=400, days=10, end_date=END), [("in", "en")], max_pages=2)
+    assert engine.truncated_shards == [("com.example", "in", "en")]
+    assert engine.incomplete_packages() == {"com.example"} and engine.failed_packages() == set()
+    assert len(result["com.example"]["2025-03-07"]) == 0
+
+
+def test_days_are_not_retained_once_handed_on():
+    days = {}
+
+    async def on_day(package, date_str, reviews):
+        days[date_str] = len(reviews)
+
+    engine = IngestionEngine(locales=[("in", "en"), ("us", "en")], max_workers=2,
+                             backend=FakeReviewsBackend(reviews_per_day=5, days=10, end_date=END))
+    result = asyncio.run(engine.ingest(["com.example"], END - timedelta(days=3), END, on_day=on_day, retain=False))
+    # both locales' reviews of every day were handed on, none of them kept for the result
+    assert sorted(days) == sorted(result["com.example"]) and min(days.values()) > 0
+    assert all(not day for day in result["com.example"].values())
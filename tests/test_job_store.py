@@ -0,0 +1,56 @@
+import sqlite3
+import pytest
+from utils.job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+def submit(store, window_days=30, incremental=False, spill=False, **kwargs):
+    return store.submit("com.a", "com.a", "2025-08-20", window_days, incremental, spill, **kwargs)
+
+
+def test_identical_job_is_deduplicated(store):
+    job, created = submit(store)
+    again, created_again = submit(store)
+    assert created and not created_again
+    assert again["job_id"] == job["job_id"]
+
+
+def test_window_settings_are_part_of_the_key(store):
+    job, _ = submit(store)
+    store.finish(store.claim(job["job_id"])["job_id"], "completed", result={})
+    for variant in ({"window_days": 7}, {"incremental": True}, {"spill": True}):
+        other, created = submit(store, **variant)
+        assert created, variant
+        assert other["job_id"] != job["job_id"]
+    cached, created = submit(store)
+    assert not created and cached["status"] == "completed"
+
+
+def test_jobs_table_from_before_the_window_columns_is_migrated(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE jobs (
+        job_id TEXT PRIMARY KEY, app TEXT NOT NULL, app_url TEXT NOT NULL, target_date TEXT NOT NULL,
+        drilldown INTEGER NOT NULL, streaming INTEGER NOT NULL, status TEXT NOT NULL, created REAL NOT NULL,
+        started REAL, finished REAL, result TEXT, csv_path TEXT, errors TEXT NOT NULL DEFAULT '[]'
+    );
+    CREATE INDEX idx_jobs_key ON jobs (app, target_date, drilldown, status);
+    INSERT INTO jobs (job_id, app, app_url, target_date, drilldown, streaming, status, created, result)
+    VALUES ('old', 'com.a', 'com.a', '2025-08-20', 0, 0, 'completed', 0, '{}');
+    """)
+    conn.close()
+
+    store = JobStore(path)
+    old = store.get("old")
+    assert old["window_days"] is None and old["incremental"] is None
+    # a job recorded without its window settings is never served for a request that has them
+    job, created = submit(store)
+    assert created and job["job_id"] != "old"
+    store.close()
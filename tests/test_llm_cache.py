@@ -0,0 +1,53 @@
+import pytest
+from utils import llm_cache
+from utils.llm_cache import LLMCache, cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_cache_key_covers_every_part():
+    assert cache_key("extraction", "1", "text") == cache_key("extraction", "1", "text")
+    assert cache_key("extraction", "1", "text") != cache_key("extraction", "2", "text")
+
+
+def test_expired_entries_are_misses_and_evicted(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "cache.db"), ttl_seconds=60)
+    cache.set("a", "response")
+    clock[0] += 30
+    assert cache.get("a") == "response"
+    clock[0] += 31
+    assert cache.get("a") is None
+    cache.set("b", "other")
+    assert cache.conn.execute("SELECT key FROM responses").fetchall() == [("b",)]
+    assert cache.stats == {"hits": 1, "misses": 1, "writes": 2, "evictions": 1}
+    cache.close()
+
+
+def test_least_recently_read_entries_are_evicted_first(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "cache.db"), max_entries=2)
+    cache.set("a", "1")
+    clock[0] += 1
+    cache.set("b", "2")
+    clock[0] += 1
+    # reading a makes b the least recently used entry
+    assert cache.get("a") == "1"
+    clock[0] += 1
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    cache.close()
+
+
+def test_size_limit_evicts_until_the_cache_fits(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "cache.db"), max_bytes=10)
+    for key in "abc":
+        cache.set(key, "x" * 4)
+        clock[0] += 1
+    assert cache.get("a") is None
+    assert cache.get("b") == "xxxx" and cache.get("c") == "xxxx"
+    cache.close()
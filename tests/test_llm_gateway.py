@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+from config import azure_config
+from utils import llm_gateway
+from utils.llm_gateway import chat_model, chat_model_session, parse_json_response
+
+
+@pytest.fixture
+def azure(monkeypatch):
+    monkeypatch.setattr(azure_config, "chat_model", None)
+    monkeypatch.setattr(azure_config, "endpoint", "https://example.openai.azure.com")
+    monkeypatch.setattr(azure_config, "api_key", "key")
+    monkeypatch.setattr(azure_config, "deployment_name", "gpt")
+
+
+def test_session_reuses_and_closes_the_client(azure):
+    async def run():
+        async with chat_model_session():
+            model = chat_model()
+            assert chat_model() is model
+            (_, client), = llm_gateway._models[asyncio.get_running_loop()].values()
+            async with chat_model_session():
+                # a nested or overlapping run keeps the pool open for the outer one
+                assert chat_model() is model
+            assert not client.is_closed
+        assert client.is_closed
+        assert asyncio.get_running_loop() not in llm_gateway._models
+
+    asyncio.run(run())
+
+
+def test_parse_json_response_repairs_fences_and_trailing_commas():
+    assert parse_json_response('```json\n{"a": [1, 2,],}\n```') == {"a": [1, 2]}
+    assert parse_json_response('Sure: {"a": 1} done') == {"a": 1}
@@ -0,0 +1,153 @@
+import asyncio
+import sqlite3
+import time
+import pytest
+from utils.llm_scheduler import LLMScheduler, SharedRateLimiter
+
+
+def test_shared_budget_is_shared_between_limiters(tmp_path):
+    path = str(tmp_path / "budget.db")
+    first = SharedRateLimiter(path, "requests_per_minute", 60)
+    second = SharedRateLimiter(path, "requests_per_minute", 60)
+
+    async def run():
+        assert await first.acquire(60) == 0.0
+        started = time.monotonic()
+        # the other process's limiter sees the empty bucket and waits for it to refill
+        await second.acquire(1)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.9
+    first.close()
+    second.close()
+
+
+def test_locked_budget_does_not_block_the_event_loop(tmp_path):
+    path = str(tmp_path / "budget.db")
+    limiter = SharedRateLimiter(path, "requests_per_minute", 600)
+    other_process = sqlite3.connect(path, isolation_level=None)
+    other_process.execute("BEGIN IMMEDIATE")
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.ensure_future(ticker())
+        acquiring = asyncio.ensure_future(limiter.acquire(1))
+        await asyncio.sleep(0.5)
+        assert not acquiring.done()
+        other_process.execute("COMMIT")
+        await asyncio.wait_for(acquiring, 2)
+        ticking.cancel()
+        return ticks
+
+    # the loop kept running other coroutines while the budget file was locked
+    assert asyncio.run(run()) >= 20
+    other_process.close()
+    limiter.close()
+
+
+def test_scheduler_close_releases_the_shared_budget(tmp_path):
+    scheduler = LLMScheduler(requests_per_minute=60, budget_path=str(tmp_path / "budget.db"))
+    scheduler.close()
+    LLMScheduler(requests_per_minute=60).close()
+
+
+class Throttled(Exception):
+    """Looks like an OpenAI 429 with a Retry-After header"""
+
+    def __init__(self, retry_after: str):
+        super().__init__("429")
+        self.status_code = 429
+        self.response = type("Response", (), {"status_code": 429, "headers": {"retry-after": retry_after}})()
+
+
+def test_map_keeps_item_order_under_the_concurrency_cap():
+    scheduler = LLMScheduler(max_concurrency=2)
+    in_flight, peak = [0], [0]
+
+    async def call(item):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        # later items finish first
+        await asyncio.sleep(0.01 * (5 - item))
+        in_flight[0] -= 1
+        return item * 10
+
+    assert asyncio.run(scheduler.map(list(range(5)), call)) == [0, 10, 20, 30, 40]
+    assert peak[0] == 2
+    assert scheduler.stats["calls"] == 5
+
+
+def test_retry_after_header_sets_the_backoff():
+    # a base delay of a minute would time the test out if Retry-After were ignored
+    scheduler = LLMScheduler(max_concurrency=4, base_delay=60.0)
+    attempts = []
+
+    async def call():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise Throttled("0.2")
+        return "ok"
+
+    assert asyncio.run(asyncio.wait_for(scheduler.submit(call), 5)) == "ok"
+    # Retry-After plus up to half of it in jitter
+    assert 0.2 <= attempts[1] - attempts[0] < 0.5
+    assert scheduler.stats["retries"] == 1
+    # a throttled call halves the concurrency
+    assert scheduler.limit == 2
+
+
+def test_non_retryable_errors_are_raised_without_retry():
+    scheduler = LLMScheduler(max_retries=3, base_delay=0.0)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.submit(call))
+    assert len(calls) == 1 and scheduler.stats["retries"] == 0
+
+
+def test_retries_give_up_after_max_retries():
+    scheduler = LLMScheduler(max_retries=2, base_delay=0.01)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise Throttled("0")
+
+    with pytest.raises(Throttled):
+        asyncio.run(scheduler.submit(call))
+    assert len(calls) == 3
+
+
+def test_cancelled_calls_give_their_slot_back():
+    scheduler = LLMScheduler(max_concurrency=2, requests_per_minute=60)
+
+    async def hang():
+        await asyncio.sleep(60)
+
+    async def run():
+        # one call hangs in flight, the rest wait for the request budget, then all are cancelled
+        tasks = [asyncio.ensure_future(scheduler.submit(hang)) for _ in range(2)] + \
+                [asyncio.ensure_future(scheduler.submit(hang)) for _ in range(2)]
+        await asyncio.sleep(0.1)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert scheduler.in_flight == 0
+
+        async def answer():
+            return "ok"
+
+        return await asyncio.wait_for(scheduler.submit(answer), 5)
+
+    assert asyncio.run(run()) == "ok"
@@ -0,0 +1,30 @@
+from utils.review_dedup import collapse_reviews, group_reviews
+
+
+def review(review_id, content, rating=1):
+    return {"review_id": review_id, "rating": rating, "content": content}
+
+
+def test_exact_and_near_duplicates_are_grouped_in_order():
+    text = "the delivery was two hours late and the food arrived completely cold again"
+    reviews = [
+        review("1", text),
+        review("2", "Worst app ever"),
+        review("3", text.upper() + "!!"),
+        review("4", text + " today"),
+        review("5", "worst app ever."),
+    ]
+    groups = group_reviews(reviews)
+    assert [[r["review_id"] for r in group] for group in groups] == [["1", "3", "4"], ["2", "5"]]
+    assert [weight for _, weight in collapse_reviews(reviews)] == [3, 2]
+
+
+def test_reviews_with_different_ratings_are_not_merged():
+    groups = group_reviews([review("1", "okay app", rating=1), review("2", "okay app", rating=5)])
+    assert len(groups) == 2
+
+
+def test_distinct_reviews_stay_apart():
+    reviews = [review("1", "payment failed twice"), review("2", "great customer support"), review("3", "")]
+    assert sum(len(group) for group in group_reviews(reviews)) == 3
+    assert len(group_reviews(reviews)) == 3
@@ -0,0 +1,68 @@
+import pytest
+from utils.review_store import ReviewStore
+
+APP = "com.example"
+
+
+def review(review_id, date_str, rating=5, content="good app"):
+    return {"review_id": review_id, "user": "u", "rating": rating, "content": content, "at": date_str,
+            "reply": None, "country": "in", "lang": "en"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReviewStore(str(tmp_path / "reviews.db"))
+    yield store
+    store.close()
+
+
+def test_never_scraped(store):
+    assert store.get_watermark(APP) is None
+    assert store.missing_range(APP, "2025-01-01", "2025-01-31") == ("2025-01-01", "2025-01-31")
+
+
+def test_covered_range_refetches_only_last_day(store):
+    store.save_reviews(APP, {}, "2025-01-01", "2025-01-31")
+    assert store.missing_range(APP, "2025-01-05", "2025-01-20") is None
+    assert store.missing_range(APP, "2025-01-05", "2025-01-31") == ("2025-01-31", "2025-01-31")
+    assert store.missing_range(APP, "2025-01-20", "2025-02-10") == ("2025-01-31", "2025-02-10")
+
+
+def test_window_after_watermark_scrapes_the_gap(store):
+    store.save_reviews(APP, {}, "2025-01-01", "2025-01-31")
+    missing = store.missing_range(APP, "2025-03-01", "2025-03-31")
+    assert missing == ("2025-01-31", "2025-03-31")
+    store.save_reviews(APP, {}, *missing)
+    assert store.get_watermark(APP) == ("2025-01-01", "2025-03-31")
+    assert store.missing_range(APP, "2025-02-01", "2025-02-20") is None
+
+
+def test_window_before_watermark_scrapes_up_to_it(store):
+    store.save_reviews(APP, {}, "2025-03-01", "2025-03-31")
+    assert store.missing_range(APP, "2025-01-01", "2025-01-31") == ("2025-01-01", "2025-03-01")
+    assert store.missing_range(APP, "2025-02-15", "2025-04-10") == ("2025-02-15", "2025-04-10")
+
+
+def test_disjoint_save_does_not_cover_the_gap(store):
+    store.save_reviews(APP, {}, "2025-01-01", "2025-01-31")
+    store.save_reviews(APP, {}, "2025-03-01", "2025-03-31")
+    assert store.get_watermark(APP) == ("2025-03-01", "2025-03-31")
+    assert store.missing_range(APP, "2025-02-01", "2025-02-20") == ("2025-02-01", "2025-03-01")
+
+
+def test_adjacent_save_extends_watermark(store):
+    store.save_reviews(APP, {}, "2025-01-01", "2025-01-31")
+    store.save_reviews(APP, {}, "2025-02-01", "2025-02-10")
+    assert store.get_watermark(APP) == ("2025-01-01", "2025-02-10")
+
+
+def test_save_and_load_reviews(store):
+    store.save_reviews(APP, {"2025-01-01": [review("a", "2025-01-01"), review("b", "2025-01-01", rating=1)],
+                             "2025-01-02": [review("c", "2025-01-02")]}, "2025-01-01", "2025-01-02")
+    # a later scrape upserts the same review instead of duplicating it
+    store.upsert_reviews(APP, {"2025-01-02": [review("c", "2025-01-02", content="edited")]})
+    loaded = store.load_reviews(APP, "2025-01-01", "2025-01-03", dates=["2025-01-01", "2025-01-02", "2025-01-03"])
+    assert {day: [r["review_id"] for r in reviews] for day, reviews in loaded.items()} == \
+        {"2025-01-01": ["a", "b"], "2025-01-02": ["c"], "2025-01-03": []}
+    assert loaded["2025-01-02"][0]["content"] == "edited"
+    assert store.load_columns(APP, "2025-01-01", "2025-01-02").day_counts() == {"2025-01-01": 2, "2025-01-02": 1}
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+from utils.compact_state import ReviewColumns, TopicCounts
+from utils.review_spill import ReviewSpill
+from utils.state_serde import StateSerializer
+
+
+def test_state_types_round_trip_without_pickle(tmp_path):
+    columns = ReviewColumns.from_daily({
+        "2025-01-01": [{"review_id": "a", "rating": 1, "content": "late again"}],
+        "2025-01-02": [{"review_id": "b", "rating": None, "content": "ünïcode ✓"}, {"review_id": "c", "rating": 5, "content": ""}],
+    })
+    counts = TopicCounts(["2025-01-01", "2025-01-02"])
+    counts.add("2025-01-01", "delivery_time", 3)
+    counts.add("2025-01-02", "payment_issue", 2)
+    spill = ReviewSpill(str(tmp_path / "window.jsonl"), ["2025-01-01", "2025-01-02"])
+    spill.append_day("2025-01-02", [("b", 2, "refund pending")])
+    state = {"raw_reviews": columns, "nested": [(counts, spill)], "errors": [], "step": "x"}
+
+    serde = StateSerializer()
+    kind, data = serde.dumps_typed(state)
+    assert kind == "msgpack"
+    restored = serde.loads_typed((kind, data))
+
+    assert [review for _, day in restored["raw_reviews"].iter_days() for review in day] == \
+        [review for _, day in columns.iter_days() for review in day]
+    restored_counts, restored_spill = restored["nested"][0]
+    assert restored_counts.row("2025-01-01") == {"delivery_time": 3}
+    assert restored_counts.totals() == counts.totals()
+    # reattaching to the spill file does not truncate it
+    assert restored_spill.read_day("2025-01-02")[0]["content"] == "refund pending"
+    assert restored_spill.day_counts() == {"2025-01-01": 0, "2025-01-02": 1}
+    assert restored["errors"] == [] and restored["step"] == "x"
+
+
+def test_unsupported_objects_are_not_pickled():
+    with pytest.raises(Exception):
+        StateSerializer().dumps_typed({"trend_matrix": pd.DataFrame({"a": [1]})})
@@ -0,0 +1,59 @@
+import pytest
+from agents.topic_extraction import SEED_TOPIC_KEYWORDS
+from utils.topic_classifier import TopicClassifier
+
+TRAINING = [
+    ("order arrived 40 minutes late", "delivery_time"),
+    ("delivery was late again", "delivery_time"),
+    ("very late delivery every time", "delivery_time"),
+    ("food came an hour late", "delivery_time"),
+    ("driver was late and food was cold", "delivery_time"),
+    ("payment failed but money got deducted", "payment_issue"),
+    ("payment stuck and no refund", "payment_issue"),
+    ("upi payment keeps failing", "payment_issue"),
+    ("refund still not processed", "payment_issue"),
+    ("charged twice for the payment", "payment_issue"),
+]
+
+
+@pytest.fixture
+def classifier():
+    return TopicClassifier(SEED_TOPIC_KEYWORDS).fit(TRAINING)
+
+
+@pytest.mark.parametrize("text", [
+    "Never late, delivery always on time!",
+    "payment was smooth, love it",
+    "no bugs at all, great app",
+    "got my otp instantly, great",
+])
+def test_praise_and_negation_go_to_the_llm(text, classifier):
+    assert classifier.classify(text)[1] is False
+    assert TopicClassifier(SEED_TOPIC_KEYWORDS).classify(text)[1] is False
+
+
+def test_untrained_classifier_is_never_confident():
+    topics, confident = TopicClassifier(SEED_TOPIC_KEYWORDS).classify("order was late again")
+    assert topics == ["delivery_time"] and not confident
+
+
+def test_rule_confirmed_by_model(classifier):
+    assert classifier.classify("order was late again", rating=1) == (["delivery_time"], True)
+    assert classifier.classify("payment failed and refund pending", rating=2) == (["payment_issue"], True)
+
+
+def test_high_rating_goes_to_the_llm(classifier):
+    assert classifier.classify("order was late again", rating=5)[1] is False
+
+
+def test_model_must_agree_with_rule(classifier):
+    # the rule sees delivery_time, but nothing in the text resembles what the LLM labelled as that
+    assert classifier.classify("the late night menu is limited", rating=2)[1] is False
+
+
+def test_no_rule_no_label(classifier):
+    assert classifier.classify("the app asked me to update", rating=2) == ([], False)
+
+
+def test_long_reviews_go_to_the_llm(classifier):
+    assert classifier.classify("late " * 30, rating=1) == ([], False)
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from agents.topic_consolidation import consolidate_topics
+from config import azure_config, storage_config
+from utils.fake_llm import FakeChatModel
+from utils.topic_registry import TopicRegistry
+
+APP = "com.example"
+
+
+@pytest.fixture
+def fake_llm(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_config, "topic_registry_path", str(tmp_path / "registry.db"))
+    monkeypatch.setattr(storage_config, "llm_cache_enabled", False)
+    model = FakeChatModel(latency=0, latency_per_1k_tokens=0, jitter=0)
+    monkeypatch.setattr(azure_config, "chat_model", model)
+    return model
+
+
+def test_close_name_is_offered_but_not_merged_without_the_llm(fake_llm):
+    registry = TopicRegistry(storage_config.topic_registry_path, APP)
+    registry.update({"app_crash": "app_crash", "delivery_late": "delivery_time"})
+    registry.close()
+
+    prompts = []
+    answer = fake_llm.ainvoke
+
+    async def recording_ainvoke(prompt, **kwargs):
+        prompts.append(prompt.to_string() if hasattr(prompt, "to_string") else str(prompt))
+        return await answer(prompt, **kwargs)
+
+    fake_llm.ainvoke = recording_ainvoke
+    # the fake LLM keeps every topic as it is, i.e. it rejects the close match
+    mapping, consolidated = asyncio.run(consolidate_topics(APP, {"app_cash": 3, "late_delivery": 2}))
+
+    assert mapping == {"app_cash": "app_cash", "late_delivery": "delivery_time"}
+    assert consolidated == {"app_cash": 3, "delivery_time": 2}
+    assert len(prompts) == 1 and "app_crash" in prompts[0].split("TOPICS TO CONSOLIDATE")[0]
+    registry = TopicRegistry(storage_config.topic_registry_path, APP)
+    assert registry.resolve("app_cash") == "app_cash"
+    registry.close()
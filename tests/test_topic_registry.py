@@ -0,0 +1,44 @@
+import pytest
+from utils.topic_registry import TopicRegistry, normalize_topic
+
+APP = "com.example"
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = TopicRegistry(str(tmp_path / "registry.db"), APP)
+    registry.update({"app_crash": "app_crash", "delivery_late": "delivery_time", "late_order": "delivery_time"})
+    yield registry
+    registry.close()
+
+
+def test_normalize_topic_ignores_case_and_word_order():
+    assert normalize_topic("Late Delivery") == normalize_topic("delivery_late") == "delivery_late"
+
+
+def test_resolve_exact_and_normalized(registry):
+    assert registry.resolve("delivery_late") == "delivery_time"
+    assert registry.resolve("Late-Delivery") == "delivery_time"
+    assert registry.resolve("order late") == "delivery_time"
+    assert registry.resolve("delivery_time") == "delivery_time"
+
+
+def test_resolve_does_not_fuzzy_match(registry):
+    assert registry.resolve("app_cash") is None
+    assert registry.resolve("delivery_lates") is None
+
+
+def test_suggest_only_offers_close_names_with_as_many_words(registry):
+    assert registry.suggest("app_crashes") == "app_crash"
+    assert registry.suggest("app_crash_issue") is None
+    assert registry.suggest("payment_issue") is None
+
+
+def test_mappings_persist_per_app(tmp_path, registry):
+    reopened = TopicRegistry(registry.db_path, APP)
+    other = TopicRegistry(registry.db_path, "com.other")
+    assert reopened.resolve("delivery_late") == "delivery_time"
+    assert reopened.canonical_topics() == ["app_crash", "delivery_time"]
+    assert other.resolve("delivery_late") is None
+    reopened.close()
+    other.close()
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+from agents.trend_analytics import compute_trend_statistics, find_alerts
+
+
+def config(**overrides):
+    settings = dict(window_days=7, spike_method="zscore", ewma_span=7, spike_threshold=3.0, min_count=5,
+                    min_history_days=7, alert_days=7, max_alerts=50)
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+def history(days=20):
+    dates = pd.date_range("2025-08-01", periods=days).strftime("%Y-%m-%d")
+    crash = np.full(days, 2)
+    crash[-1] = 20
+    login = np.full(days, 3)
+    return pd.DataFrame({"crash": crash, "login": login}, index=dates), np.full(days, 10)
+
+
+def test_statistics():
+    matrix, volume = history()
+    statistics = compute_trend_statistics(matrix, volume, config())
+    assert statistics["rolling_mean"]["login"].tolist() == [3.0] * 20
+    assert statistics["rolling_mean"]["crash"].iloc[-1] == pytest.approx((6 * 2 + 20) / 7)
+    # two full weeks are needed for a week-over-week delta
+    assert statistics["wow_delta"]["crash"].iloc[:13].isna().all()
+    assert statistics["wow_delta"]["crash"].iloc[-1] == 18
+    assert statistics["share"]["crash"].iloc[-1] == pytest.approx(2.0)
+    assert statistics["baseline"]["crash"].iloc[-1] == pytest.approx(2.0)
+    # the std is floored at sqrt(baseline)
+    assert statistics["score"]["crash"].iloc[-1] == pytest.approx(18 / np.sqrt(2), rel=1e-5)
+    assert statistics["spike"]["crash"].tolist() == [False] * 19 + [True]
+    assert not statistics["spike"]["login"].any()
+
+
+@pytest.mark.parametrize("method", ["zscore", "ewma"])
+def test_find_alerts_reports_the_spike(method):
+    matrix, volume = history()
+    settings = config(spike_method=method)
+    alerts = find_alerts(matrix, compute_trend_statistics(matrix, volume, settings), settings)
+    assert [(alert["date"], alert["topic"], alert["frequency"], alert["method"]) for alert in alerts] == \
+        [("2025-08-20", "crash", 20, method)]
+    assert alerts[0]["baseline"] == 2.0 and alerts[0]["wow_delta"] == 18.0
+
+
+def test_spikes_need_history_volume_and_recency():
+    matrix, volume = history()
+    # too little history before the spike
+    assert not find_alerts(matrix.iloc[-5:], compute_trend_statistics(matrix.iloc[-5:], volume[-5:], config()), config())
+    # below min_count
+    assert not find_alerts(matrix, compute_trend_statistics(matrix, volume, config(min_count=25)), config(min_count=25))
+    # older than alert_days: the spike is 8 days before the end of the history
+    longer = pd.concat([matrix, pd.DataFrame({"crash": [2] * 8, "login": [3] * 8},
+                                             index=pd.date_range("2025-08-21", periods=8).strftime("%Y-%m-%d"))])
+    statistics = compute_trend_statistics(longer, np.full(len(longer), 10), config())
+    assert statistics["spike"]["crash"].iloc[19]
+    assert not find_alerts(longer, statistics, config())
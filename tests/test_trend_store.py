@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from utils.trend_store import TrendStore
+
+APP = "com.example"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TrendStore(str(tmp_path / "trends.db"))
+    yield store
+    store.close()
+
+
+def matrix(rows):
+    return pd.DataFrame(rows).T.fillna(0).astype(int)
+
+
+def test_restoring_days_updates_rollups_by_the_difference(store):
+    # 2025-08-03 is a Sunday, 2025-08-04 a Monday
+    first = matrix({"2025-07-31": {"crash": 2}, "2025-08-03": {"crash": 1, "login": 4}, "2025-08-04": {"login": 1}})
+    assert store.upsert_days(APP, first, {"2025-07-31": 5, "2025-08-03": 6, "2025-08-04": 2}) == 3
+    assert store.load(APP, "2025-07-28", "2025-08-10", "week").to_dict() == {
+        "login": {"2025-07-28": 4, "2025-08-04": 1}, "crash": {"2025-07-28": 3, "2025-08-04": 0}
+    }
+
+    # a later run re-extracts 2025-08-03: crash gone, login changed; the other days are left alone
+    again = matrix({"2025-08-03": {"login": 2}})
+    assert store.upsert_days(APP, again, {"2025-08-03": 6}) == 1
+    assert store.load(APP, "2025-07-28", "2025-08-10", "week").to_dict() == {
+        "crash": {"2025-07-28": 2, "2025-08-04": 0}, "login": {"2025-07-28": 2, "2025-08-04": 1}
+    }
+    assert store.load(APP, "2025-07-01", "2025-08-31", "month").to_dict() == {
+        "login": {"2025-07": 0, "2025-08": 3}, "crash": {"2025-07": 2, "2025-08": 0}
+    }
+    assert store.review_volume(APP, "2025-07-28", "2025-08-10", "week").to_dict() == {"2025-07-28": 11, "2025-08-04": 2}
+
+
+def test_unchanged_days_are_not_rewritten(store):
+    days = matrix({"2025-08-01": {"crash": 2}, "2025-08-02": {"crash": 1}})
+    store.upsert_days(APP, days, {"2025-08-01": 3, "2025-08-02": 3})
+    assert store.upsert_days(APP, days, {"2025-08-01": 3, "2025-08-02": 3}) == 0
+    # a change in review volume alone still counts as a changed day
+    assert store.upsert_days(APP, days, {"2025-08-01": 4, "2025-08-02": 3}) == 1
+    assert store.coverage(APP) == ("2025-08-01", "2025-08-02", 2)
@@ -0,0 +1,45 @@
+import asyncio
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+import workflow
+from agents.topic_extraction import TopicExtractor
+from config import instrumentation_config, storage_config
+from utils.state_serde import StateSerializer
+
+
+def test_stream_analysis_closes_the_extractor_when_a_stage_fails(offline, monkeypatch):
+    closed = []
+    monkeypatch.setattr(TopicExtractor, "close", lambda self: closed.append(self))
+
+    async def failing_extraction(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(workflow, "extract_or_reuse", failing_extraction)
+    state = workflow.new_analysis_state("stream-fail", "com.example.app", "2025-08-20", window_days=3)
+    result = asyncio.run(workflow.stream_analysis(state))
+
+    assert result["processing_status"] == "extraction_failed"
+    assert result["errors"] == ["Extraction error: boom"]
+    assert len(closed) == 1
+
+
+def test_checkpoint_is_only_resumed_with_the_same_window_settings(offline, monkeypatch):
+    monkeypatch.setattr(instrumentation_config, "report_dir", "")
+    monkeypatch.setattr(instrumentation_config, "textfile_dir", "")
+
+    async def failing_consolidation(state):
+        return {"errors": ["Consolidation error: boom"], "processing_status": "consolidation_failed"}
+
+    monkeypatch.setattr(workflow, "topic_consolidation_node", failing_consolidation)
+    state = workflow.new_analysis_state("resume", "com.example.app", "2025-08-20", window_days=3, incremental=False, spill=False)
+    assert asyncio.run(workflow.run_review_analysis(state))["processing_status"] == "consolidation_failed"
+
+    async def resume_point(**settings):
+        async with AsyncSqliteSaver.from_conn_string(storage_config.checkpoint_path) as checkpointer:
+            checkpointer.serde = StateSerializer()
+            graph = workflow.create_review_analysis_workflow(checkpointer=checkpointer)
+            retry = workflow.new_analysis_state("resume", "com.example.app", "2025-08-20", window_days=3, **settings)
+            return await workflow.find_resume_point(graph, {"configurable": {"thread_id": "resume"}}, retry, checkpointer)
+
+    assert asyncio.run(resume_point(incremental=False, spill=False)) is not None
+    assert asyncio.run(resume_point(incremental=True, spill=False)) is None
+    assert asyncio.run(resume_point(incremental=False, spill=True)) is None
@@ -0,0 +1,100 @@
+# checkpoints.py
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS day_results (
+    app TEXT NOT NULL,
+    version TEXT NOT NULL,
+    date TEXT NOT NULL,
+    review_key TEXT NOT NULL,
+    reviews INTEGER NOT NULL,
+    topics TEXT NOT NULL,
+    details TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (app, version, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS day_assignments (
+    app TEXT NOT NULL,
+    version TEXT NOT NULL,
+    date TEXT NOT NULL,
+    assignments TEXT NOT NULL,
+    PRIMARY KEY (app, version, date)
+) WITHOUT ROWID;
+"""
+
+class DayResults:
+    """
+    Per-day extraction results of one app, keyed by date and extraction version (prompt version and
+    settings), written as soon as each day finishes. A resumed run, a later run over an overlapping
+    window or an incremental window reuses them instead of extracting the day again; a stored day is
+    only reused for a given set of reviews while its review key (a hash of that day's reviews) still matches.
+    Alongside each day's counts, the review ids behind every topic are kept in day_assignments.
+    """
+
+    def __init__(self, db_path: str, app: str, version: str):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.db_path = db_path
+        self.app = app
+        self.version = version
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, date: str, review_key: str) -> Optional[Tuple[Dict[str, int], Dict[str, Dict]]]:
+        row = self.conn.execute(
+            "SELECT topics, details FROM day_results WHERE app = ? AND version = ? AND date = ? AND review_key = ?",
+            (self.app, self.version, date, review_key),
+        ).fetchone()
+        return (json.loads(row[0]), json.loads(row[1])) if row else None
+
+    def stored(self, start_date: str, end_date: str) -> Dict[str, Tuple[int, str]]:
+        """{date: (number of reviews, review key)} of the stored days in [start_date, end_date]"""
+        return {
+            date: (reviews, key) for date, reviews, key in self.conn.execute(
+                "SELECT date, reviews, review_key FROM day_results WHERE app = ? AND version = ? AND date BETWEEN ? AND ?",
+                (self.app, self.version, start_date, end_date),
+            )
+        }
+
+    def load(self, dates: List[str]) -> Dict[str, Tuple[Dict[str, int], Dict[str, Dict]]]:
+        """Stored results of `dates` as {date: (topics, details)}, whatever reviews they were extracted from"""
+        results = {}
+        for start in range(0, len(dates), 500):
+            batch = dates[start:start + 500]
+            for date, topics, details in self.conn.execute(
+                f"SELECT date, topics, details FROM day_results WHERE app = ? AND version = ? AND date IN ({','.join('?' * len(batch))})",
+                [self.app, self.version] + batch,
+            ):
+                results[date] = (json.loads(topics), json.loads(details))
+        return results
+
+    def assignments(self, dates: List[str]) -> Iterator[Tuple[str, Dict[str, List[str]]]]:
+        """Stored review ids per topic of the stored days among `dates`, as (date, {topic: [review_id, ...]}) one day at a time"""
+        for start in range(0, len(dates), 500):
+            batch = dates[start:start + 500]
+            for date, assignments in self.conn.execute(
+                f"SELECT date, assignments FROM day_assignments WHERE app = ? AND version = ? AND date IN ({','.join('?' * len(batch))}) ORDER BY date",
+                [self.app, self.version] + batch,
+            ):
+                yield date, json.loads(assignments)
+
+    def save(self, date: str, review_key: str, reviews: int, topics: Dict[str, int], details: Dict[str, Dict],
+             assignments: Dict[str, List[str]] = None):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO day_results (app, version, date, review_key, reviews, topics, details, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.app, self.version, date, review_key, reviews, json.dumps(topics), json.dumps(details), time.time()),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO day_assignments (app, version, date, assignments) VALUES (?, ?, ?, ?)",
+                (self.app, self.version, date, json.dumps(assignments or {})),
+            )
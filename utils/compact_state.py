@@ -0,0 +1,210 @@
+# compact_state.py
+from array import array
+from datetime import date as date_cls
+from typing import Dict, Iterator, List, Optional, Tuple
+
+class ReviewColumns:
+    """
+    Columnar review window: review ids, dates as proleptic ordinals (int32), ratings (int8)
+    and all review text in one string buffer addressed by offsets.
+    Reviews must be appended in date order, so each day is one contiguous row range.
+    `days` lists every day in the window, including days without reviews.
+    """
+
+    def __init__(self, days: List[str] = None):
+        self.days: List[str] = list(days or [])
+        self.review_ids: List[str] = []
+        self.dates = array("i")
+        self.ratings = array("b")
+        self.offsets = array("q", [0])
+        self.text = ""
+        self._parts: List[str] = []
+        self._ordinals: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.review_ids)
+
+    def _ordinal(self, date_str: str) -> int:
+        ordinal = self._ordinals.get(date_str)
+        if ordinal is None:
+            ordinal = self._ordinals[date_str] = date_cls.fromisoformat(date_str).toordinal()
+            if date_str not in self.days:
+                self.days.append(date_str)
+        return ordinal
+
+    def append(self, review_id: str, date_str: str, rating: Optional[int], content: Optional[str]):
+        content = content or ""
+        self.review_ids.append(review_id)
+        self.dates.append(self._ordinal(date_str))
+        self.ratings.append(rating if rating is not None else 0)
+        self._parts.append(content)
+        self.offsets.append(self.offsets[-1] + len(content))
+
+    def freeze(self) -> "ReviewColumns":
+        """Join appended text into the shared buffer; call once after the last append"""
+        if self._parts:
+            self.text += "".join(self._parts)
+            self._parts = []
+        self.days.sort()
+        return self
+
+    @classmethod
+    def from_daily(cls, daily_reviews: Dict[str, List[Dict]]) -> "ReviewColumns":
+        columns = cls(sorted(daily_reviews))
+        for date_str in columns.days:
+            for review in daily_reviews[date_str]:
+                columns.append(review.get("review_id"), date_str, review.get("rating"), review.get("content"))
+        return columns.freeze()
+
+    def content(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def review(self, i: int) -> Dict:
+        """Materialize row `i` as a review dict (review_id, date, rating, content)"""
+        return {
+            "review_id": self.review_ids[i],
+            "date": date_cls.fromordinal(self.dates[i]).isoformat(),
+            "rating": self.ratings[i] or None,
+            "content": self.content(i),
+        }
+
+    def day_ranges(self) -> Dict[str, Tuple[int, int]]:
+        """{day: (start_row, end_row)} for every day in the window; empty days get an empty range"""
+        ranges = {}
+        start = 0
+        for day in self.days:
+            ordinal = date_cls.fromisoformat(day).toordinal()
+            end = start
+            while end < len(self.dates) and self.dates[end] == ordinal:
+                end += 1
+            ranges[day] = (start, end)
+            start = end
+        return ranges
+
+    def day_counts(self) -> Dict[str, int]:
+        """{day: number of reviews} for every day in the window"""
+        return {day: end - start for day, (start, end) in self.day_ranges().items()}
+
+    def iter_days(self) -> Iterator[Tuple[str, List[Dict]]]:
+        """Yield (day, [review dict, ...]) one day at a time so only a day is materialized at once"""
+        for day, (start, end) in self.day_ranges().items():
+            yield day, [self.review(i) for i in range(start, end)]
+
+    def to_checkpoint(self) -> Dict:
+        """Plain data for the checkpoint serializer (see utils.state_serde)"""
+        return {
+            "days": self.days,
+            "review_ids": self.review_ids,
+            "dates": self.dates.tobytes(),
+            "ratings": self.ratings.tobytes(),
+            "offsets": self.offsets.tobytes(),
+            "text": self.text + "".join(self._parts),
+        }
+
+    @classmethod
+    def from_checkpoint(cls, data: Dict) -> "ReviewColumns":
+        columns = cls(data["days"])
+        columns.review_ids = list(data["review_ids"])
+        columns.dates = array("i", data["dates"])
+        columns.ratings = array("b", data["ratings"])
+        columns.offsets = array("q", data["offsets"])
+        columns.text = data["text"]
+        return columns
+
+class TopicTable:
+    """Single name table for topics; everything else refers to topics by integer id"""
+
+    def __init__(self, names: List[str] = None):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for name in names or []:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        topic_id = self.ids.get(name)
+        if topic_id is None:
+            topic_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return topic_id
+
+class TopicCounts:
+    """
+    Sparse days x topics count matrix: one {topic_id: count} row per day, topic ids
+    resolved through a shared TopicTable.
+    """
+
+    def __init__(self, dates: List[str] = None, topics: TopicTable = None):
+        self.dates: List[str] = sorted(dates or [])
+        self.topics = topics if topics is not None else TopicTable()
+        self.rows: List[Dict[int, int]] = [{} for _ in self.dates]
+        self.date_index: Dict[str, int] = {d: i for i, d in enumerate(self.dates)}
+
+    def _row(self, date: str) -> Dict[int, int]:
+        if date not in self.date_index:
+            self.dates.append(date)
+            self.rows.append({})
+            if len(self.dates) > 1 and self.dates[-2] > date:
+                order = sorted(range(len(self.dates)), key=self.dates.__getitem__)
+                self.dates = [self.dates[i] for i in order]
+                self.rows = [self.rows[i] for i in order]
+            self.date_index = {d: i for i, d in enumerate(self.dates)}
+        return self.rows[self.date_index[date]]
+
+    def add(self, date: str, topic: str, count: int):
+        row = self._row(date)
+        topic_id = self.topics.intern(topic)
+        row[topic_id] = row.get(topic_id, 0) + count
+
+    def set_row(self, date: str, counts: Dict[str, int]):
+        row = self._row(date)
+        row.clear()
+        for topic, count in counts.items():
+            topic_id = self.topics.intern(topic)
+            row[topic_id] = row.get(topic_id, 0) + count
+
+    def row(self, date: str) -> Dict[str, int]:
+        """{topic name: count} for one day"""
+        names = self.topics.names
+        return {names[t]: c for t, c in self.rows[self.date_index[date]].items()} if date in self.date_index else {}
+
+    def totals(self) -> Dict[str, int]:
+        """{topic name: count} summed over every day"""
+        totals: Dict[int, int] = {}
+        for row in self.rows:
+            for topic_id, count in row.items():
+                totals[topic_id] = totals.get(topic_id, 0) + count
+        return {self.topics.names[t]: c for t, c in totals.items()}
+
+    def remap(self, mapping: Dict[str, str]) -> "TopicCounts":
+        """New matrix with every topic renamed through `mapping` (unmapped topics keep their name)"""
+        remapped = TopicCounts(self.dates)
+        new_ids = [remapped.topics.intern(mapping.get(name, name)) for name in self.topics.names]
+        for source, target in zip(self.rows, remapped.rows):
+            for topic_id, count in source.items():
+                new_id = new_ids[topic_id]
+                target[new_id] = target.get(new_id, 0) + count
+        return remapped
+
+    def nnz(self) -> int:
+        return sum(len(row) for row in self.rows)
+
+    def to_dict(self) -> Dict[str, Dict[str, int]]:
+        return {date: self.row(date) for date in self.dates}
+
+    def to_checkpoint(self) -> Dict:
+        """Plain data for the checkpoint serializer (see utils.state_serde)"""
+        return {
+            "dates": self.dates,
+            "topics": self.topics.names,
+            "rows": [[list(row), list(row.values())] for row in self.rows],
+        }
+
+    @classmethod
+    def from_checkpoint(cls, data: Dict) -> "TopicCounts":
+        counts = cls(data["dates"], TopicTable(data["topics"]))
+        for row, (topic_ids, values) in zip(counts.rows, data["rows"]):
+            row.update(zip(topic_ids, values))
+        return counts
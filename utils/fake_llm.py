@@ -0,0 +1,149 @@
+# fake_llm.py
+import asyncio
+import json
+import random
+import re
+import time
+from collections import deque
+from typing import Dict, List
+from langchain_core.messages import AIMessage
+from utils.fake_scraper import REVIEW_TOPICS
+from utils.llm_scheduler import estimate_tokens
+
+REVIEW_LINE = re.compile(r"^\s*\[(\d+)\] Rating: \S+ - (.*)$")
+
+class FakeRateLimitError(Exception):
+    """Simulated HTTP 429, shaped like the OpenAI client's error (status_code + retry-after header)"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+        self.status_code = 429
+        self.response = type("FakeResponse", (), {"status_code": 429, "headers": {"retry-after": f"{retry_after:.1f}"}})()
+
+class FakeContextLengthError(Exception):
+    """Simulated HTTP 400 for a prompt over the model's context window (not retryable)"""
+
+    def __init__(self, tokens: int, limit: int):
+        super().__init__(f"This model's maximum context length is {limit} tokens, the prompt has {tokens}")
+        self.status_code = 400
+
+class FakeChatModel:
+    """
+    Offline stand-in for AzureChatOpenAI (set azure_config.chat_model to use it).
+    Answers the extraction and consolidation prompts deterministically by keyword-matching the
+    reviews against REVIEW_TOPICS, and simulates the service side: latency that grows with prompt
+    size, a context window, a server-side requests-per-minute quota, random 429s and truncated
+    (malformed) JSON responses, which it fixes when sent the gateway's repair prompt.
+    Every call is recorded in `latencies` / `stats`.
+    """
+
+    def __init__(self, latency: float = 0.2, latency_per_1k_tokens: float = 0.02, jitter: float = 0.25,
+                 max_prompt_tokens: int = 128000, requests_per_minute: int = 0, rate_limit_rate: float = 0.0,
+                 malformed_rate: float = 0.0, topic_keywords: Dict[str, List[str]] = None, seed: int = 0):
+        """
+        latency: base seconds per call, plus latency_per_1k_tokens per 1000 prompt tokens, +/- jitter (fraction)
+        max_prompt_tokens: prompts over this (estimated) size fail like a context length error
+        requests_per_minute: server-side quota over a sliding minute, 429 with retry-after above it (0: unlimited)
+        rate_limit_rate: probability that any call fails with a 429 regardless of the quota
+        malformed_rate: probability that a response is cut off before the end of its JSON
+        """
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.jitter = jitter
+        self.max_prompt_tokens = max_prompt_tokens
+        self.requests_per_minute = requests_per_minute
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.topic_keywords = topic_keywords or {topic: spec["keywords"] for topic, spec in REVIEW_TOPICS.items()}
+        self.rng = random.Random(seed)
+        self.recent_requests = deque()
+        # truncated response -> the response it was cut from, so repair prompts can be answered
+        self.truncated: Dict[str, str] = {}
+        self.latencies: List[float] = []
+        self.stats = {"calls": 0, "rate_limited": 0, "rejected": 0, "malformed": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def reset(self):
+        self.recent_requests.clear()
+        self.truncated.clear()
+        self.latencies = []
+        self.stats = {key: 0 for key in self.stats}
+
+    def topic_for(self, text: str) -> str:
+        text = text.lower()
+        for topic, keywords in self.topic_keywords.items():
+            if any(keyword in text for keyword in keywords):
+                return topic
+        return "general_feedback"
+
+    def _throttle(self):
+        now = time.monotonic()
+        while self.recent_requests and now - self.recent_requests[0] >= 60:
+            self.recent_requests.popleft()
+        if self.requests_per_minute and len(self.recent_requests) >= self.requests_per_minute:
+            self.stats["rate_limited"] += 1
+            raise FakeRateLimitError(60 - (now - self.recent_requests[0]))
+        if self.rate_limit_rate and self.rng.random() < self.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            raise FakeRateLimitError(1.0)
+        self.recent_requests.append(now)
+
+    def _extraction_response(self, text: str) -> str:
+        numbers, samples = {}, {}
+        for line in text.split("REVIEWS:", 1)[1].splitlines():
+            match = REVIEW_LINE.match(line)
+            if not match:
+                continue
+            topic = self.topic_for(match.group(2))
+            numbers.setdefault(topic, []).append(int(match.group(1)))
+            samples.setdefault(topic, []).append(match.group(2))
+        if "sample_reviews" not in text:
+            return json.dumps(numbers)
+        return json.dumps({
+            topic: {"reviews": reviews, "keywords": self.topic_keywords.get(topic, [])[:3], "sample_reviews": samples[topic][:2]}
+            for topic, reviews in numbers.items()
+        })
+
+    @staticmethod
+    def _consolidation_response(text: str) -> str:
+        block = text.split("TOPICS TO CONSOLIDATE:", 1)[1].split("CONSOLIDATION RULES", 1)[0]
+        frequencies = {}
+        for entry in block.split(","):
+            topic, _, frequency = entry.strip().rpartition(":")
+            if topic:
+                frequencies[topic.strip()] = int(frequency) if frequency.strip().isdigit() else 0
+        return json.dumps({"consolidated_topics": frequencies, "topic_mapping": {topic: topic for topic in frequencies}})
+
+    async def ainvoke(self, prompt, **kwargs) -> AIMessage:
+        started = time.perf_counter()
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        prompt_tokens = estimate_tokens(text)
+        self.stats["calls"] += 1
+        try:
+            if prompt_tokens > self.max_prompt_tokens:
+                self.stats["rejected"] += 1
+                raise FakeContextLengthError(prompt_tokens, self.max_prompt_tokens)
+            self._throttle()
+
+            delay = self.latency + self.latency_per_1k_tokens * prompt_tokens / 1000
+            await asyncio.sleep(delay * (1 + self.rng.uniform(-self.jitter, self.jitter)))
+
+            if "was meant to be a single JSON object" in text:
+                content = next((original for broken, original in self.truncated.items() if broken in text), "{}")
+            elif "TOPICS TO CONSOLIDATE:" in text:
+                content = self._consolidation_response(text)
+            else:
+                content = self._extraction_response(text)
+            if self.malformed_rate and len(content) > 2 and self.rng.random() < self.malformed_rate:
+                self.stats["malformed"] += 1
+                broken = content[:max(1, len(content) * 2 // 3)]
+                self.truncated[broken] = content
+                content = broken
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+        completion_tokens = estimate_tokens(content)
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["completion_tokens"] += completion_tokens
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens
+        })
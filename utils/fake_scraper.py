@@ -0,0 +1,145 @@
+# fake_scraper.py
+import random
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+FakeContinuationToken = namedtuple("FakeContinuationToken", ["token"])
+
+# duplicates repeat one of this many most recent reviews
+DUPLICATE_LOOKBACK = 200
+
+# synthetic review vocabulary: per topic, the words that identify it and (rating, template) pairs
+# whose {slots} are filled from REVIEW_SLOTS, so reviews of one topic are similar but not identical
+REVIEW_TOPICS = {
+    "delivery_time": {
+        "keywords": ["late", "delay", "took forever"],
+        "templates": [(1, "Order arrived {minutes} minutes late and the {dish} was cold"),
+                      (2, "Delivery was delayed again, waited {minutes} minutes for my {dish}"),
+                      (2, "Took forever to deliver the {dish}")],
+    },
+    "payment_issue": {
+        "keywords": ["payment", "refund", "deducted"],
+        "templates": [(1, "Payment failed {times} times but money got deducted"),
+                      (2, "Still waiting for my refund of Rs {amount}")],
+    },
+    "app_performance": {
+        "keywords": ["crash", "slow", "freez"],
+        "templates": [(1, "App keeps crashing when I open the {screen}"),
+                      (2, "App is very slow on the {screen} screen")],
+    },
+    "delivery_partner_behavior": {
+        "keywords": ["rude"],
+        "templates": [(1, "Delivery partner was rude on the call"),
+                      (2, "Rider was rude and asked for Rs {amount} extra")],
+    },
+    "pricing_concern": {
+        "keywords": ["price", "expensive", "fee"],
+        "templates": [(3, "Prices are much higher than in the restaurant"),
+                      (3, "Delivery fee of Rs {amount} is too expensive")],
+    },
+    "order_accuracy": {
+        "keywords": ["wrong", "missing"],
+        "templates": [(1, "Wrong items delivered, my {dish} was missing"),
+                      (2, "Got the wrong order instead of {dish}")],
+    },
+    "customer_service": {
+        "keywords": ["customer care", "support"],
+        "templates": [(1, "Customer care did not help with my {dish} order"),
+                      (2, "Support chat closed without solving anything")],
+    },
+    "positive_feedback": {
+        "keywords": ["great", "good", "love"],
+        "templates": [(5, "Great app, quick delivery of my {dish}"),
+                      (4, "good app"),
+                      (5, "Love the offers on {dish}")],
+    },
+}
+
+REVIEW_SLOTS = {
+    "minutes": ["20", "30", "45", "60", "90"],
+    "dish": ["pizza", "biryani", "burger", "noodles", "dosa", "salad"],
+    "times": ["two", "three"],
+    "amount": ["49", "99", "150", "250"],
+    "screen": ["cart", "menu", "checkout", "home"],
+}
+
+class FakeReviewsBackend:
+    """
+    Offline stand-in for google_play_scraper.reviews.
+    Generates a deterministic, newest-first synthetic review feed per (package, country, lang)
+    and serves it page by page through continuation tokens.
+    """
+
+    def __init__(self, reviews_per_day: int = 20, days: int = 60, end_date: datetime = None, latency: float = 0.0, seed: int = 0,
+                 duplicate_rate: float = 0.0, topic_weights: dict = None):
+        """
+        latency: seconds every page fetch sleeps
+        duplicate_rate: share of reviews that repeat the text of a recent review verbatim (copy-paste / spam)
+        topic_weights: {REVIEW_TOPICS name: relative weight}; every topic equally likely by default
+        """
+        self.reviews_per_day = reviews_per_day
+        self.days = days
+        self.end_date = end_date or datetime.now()
+        self.latency = latency
+        self.seed = seed
+        self.duplicate_rate = duplicate_rate
+        weights = topic_weights or {topic: 1.0 for topic in REVIEW_TOPICS}
+        self.topics = [topic for topic in REVIEW_TOPICS if weights.get(topic)]
+        self.weights = [weights[topic] for topic in self.topics]
+        self.calls = 0
+        self._feeds = {}
+
+    def _page(self, package_name: str, country: str, lang: str, offset: int, count: int):
+        """
+        Reviews [offset, offset + count) of the feed. The feed is generated as it is paged through, keeping
+        only the recent texts duplicates are drawn from, so a large feed costs no more memory than a page;
+        a page that does not continue the previous one restarts the (deterministic) generator.
+        """
+        key = (package_name, country, lang)
+        feed = self._feeds.get(key)
+        if feed is None or feed["next"] > offset:
+            feed = self._feeds[key] = {
+                "rng": random.Random(f"{self.seed}|{package_name}|{country}|{lang}"),
+                "next": 0,
+                "recent": deque(maxlen=DUPLICATE_LOOKBACK),
+            }
+        rng, recent = feed["rng"], feed["recent"]
+        step = timedelta(days=1) / self.reviews_per_day
+        page = []
+        while feed["next"] < min(offset + count, self.reviews_per_day * self.days):
+            i = feed["next"]
+            if recent and rng.random() < self.duplicate_rate:
+                score, content = recent[rng.randrange(len(recent))]
+            else:
+                score, content = self._review(rng)
+            recent.append((score, content))
+            feed["next"] += 1
+            if i >= offset:
+                page.append({
+                    "reviewId": f"{package_name}-{country}-{lang}-{i}",
+                    "userName": f"user{rng.randint(1, 10_000)}",
+                    "score": score,
+                    "content": content,
+                    "at": self.end_date - step * i,
+                    "replyContent": None,
+                })
+            else:
+                rng.randint(1, 10_000)
+        return page
+
+    def _review(self, rng: random.Random):
+        topic = rng.choices(self.topics, weights=self.weights)[0]
+        score, template = rng.choice(REVIEW_TOPICS[topic]["templates"])
+        return score, template.format(**{slot: rng.choice(values) for slot, values in REVIEW_SLOTS.items()})
+
+    def __call__(self, package_name, lang="en", country="us", sort=None, count=100, continuation_token=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        offset = continuation_token.token if continuation_token is not None else 0
+        if offset is None:
+            return [], continuation_token
+        page = self._page(package_name, country, lang, offset, count)
+        next_offset = offset + count if offset + count < self.reviews_per_day * self.days else None
+        return page, FakeContinuationToken(next_offset)
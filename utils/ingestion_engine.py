@@ -0,0 +1,143 @@
+# ingestion_engine.py
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Tuple
+from utils.scraper_service import MAX_PAGES, ScraperService, package_name_from_url
+
+def review_key(review: dict) -> str:
+    """Identity used for dedupe; falls back to user/date/content when the id is missing"""
+    if review.get("review_id"):
+        return review["review_id"]
+    return f"{review.get('user')}|{review.get('at')}|{review.get('content')}"
+
+class IngestionEngine:
+    """
+    Fans scraping out over every (package, country, lang) shard concurrently.
+    Blocking scraper calls run on a bounded thread pool so the event loop stays free,
+    and shards for the same package are merged and deduped by review id.
+    """
+
+    def __init__(self, locales: List[Tuple[str, str]] = None, max_workers: int = 8, backend=None, max_pages: int = MAX_PAGES):
+        """
+        locales: list of (country, lang) pairs, e.g. [("in", "en"), ("us", "en")]
+        max_workers: upper bound on concurrent scraper calls
+        backend: optional replacement for google_play_scraper.reviews (see utils.fake_scraper)
+        max_pages: page cap of every shard's scrape (see ScraperService.truncated)
+        """
+        self.locales = locales or [("in", "en")]
+        self.max_workers = max_workers
+        self.backend = backend
+        self.max_pages = max_pages
+        # (package, country, lang, error) of the shards that failed in the last ingest
+        self.failed_shards: List[Tuple[str, str, str, Exception]] = []
+        # (package, country, lang) of the shards that stopped at max_pages in the last ingest
+        self.truncated_shards: List[Tuple[str, str, str]] = []
+
+    async def ingest(self, app_urls: List[str], start_date: datetime, end_date: datetime, on_day=None,
+                     retain: bool = True) -> Dict[str, Dict[str, List[Dict]]]:
+        """
+        on_day: optional async callback(package_name, date_str, reviews), awaited once a day has been
+        completed by every locale shard of the package, with the same merged, deduped reviews
+        the returned dict holds for that day
+        retain: with on_day, False keeps no day once on_day has handled it (the returned days are then
+        empty), so memory is bounded by the days still being scraped rather than by the range
+        Returns {package_name: {"YYYY-MM-DD": [review, ...]}}
+        A failing shard does not discard the others: it is logged and listed in failed_shards as
+        (package, country, lang, error), and the result holds what the remaining shards scraped.
+        Raises the first error when every shard failed.
+        """
+        shards = [
+            (package_name_from_url(app_url), country, lang)
+            for app_url in app_urls
+            for country, lang in self.locales
+        ]
+        print(f"Ingesting {len(shards)} shard(s) with up to {self.max_workers} concurrent scraper calls")
+        self.failed_shards = []
+        self.truncated_shards = []
+
+        # package -> indexes of the shards still scraping or finished without error
+        live_shards = defaultdict(set)
+        for index, (package, _, _) in enumerate(shards):
+            live_shards[package].add(index)
+        # (package, day) -> {shard index: reviews} until every live shard of the package has finished the day
+        completed_days = defaultdict(dict)
+
+        async def emit_completed(package):
+            for key in sorted(completed_days):
+                parts = completed_days[key]
+                if key[0] != package or not live_shards[package] <= parts.keys():
+                    continue
+                del completed_days[key]
+                seen = set()
+                merged_day = []
+                for _, shard_reviews in sorted(parts.items()):
+                    for review in shard_reviews:
+                        review_id = review_key(review)
+                        if review_id not in seen:
+                            seen.add(review_id)
+                            merged_day.append(review)
+                await on_day(package, key[1], merged_day)
+
+        def day_callback(index, package):
+            async def callback(date_str, reviews):
+                completed_days[(package, date_str)][index] = reviews
+                await emit_completed(package)
+            return callback
+
+        async def scrape_shard(index, package, country, lang, executor):
+            scraper = ScraperService(lang=lang, country=country, backend=self.backend, executor=executor, max_pages=self.max_pages)
+            try:
+                daily_reviews = await scraper.scrape_reviews_for_range(
+                    package, start_date, end_date, on_day=day_callback(index, package) if on_day is not None else None,
+                    retain=retain or on_day is None
+                )
+            except Exception as e:
+                print(f"Scraping {package} ({country}/{lang}) failed: {str(e)}")
+                self.failed_shards.append((package, country, lang, e))
+                # days the other shards already finished no longer wait for this one
+                live_shards[package].discard(index)
+                if on_day is not None:
+                    await emit_completed(package)
+                raise
+            if scraper.truncated:
+                self.truncated_shards.append((package, country, lang))
+            return daily_reviews
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = await asyncio.gather(*[
+                scrape_shard(index, package, country, lang, executor)
+                for index, (package, country, lang) in enumerate(shards)
+            ], return_exceptions=True)
+
+        if shards and len(self.failed_shards) == len(shards):
+            raise self.failed_shards[0][3]
+
+        merged: Dict[str, Dict[str, List[Dict]]] = {package: {} for package, _, _ in shards}
+        seen: Dict[str, set] = {}
+        for (package, _, _), daily_reviews in zip(shards, results):
+            if isinstance(daily_reviews, BaseException):
+                continue
+            app_reviews = merged.setdefault(package, {})
+            app_seen = seen.setdefault(package, set())
+            for date_str, day in daily_reviews.items():
+                bucket = app_reviews.setdefault(date_str, [])
+                for review in day:
+                    key = review_key(review)
+                    if key in app_seen:
+                        continue
+                    app_seen.add(key)
+                    bucket.append(review)
+
+        for package, app_reviews in merged.items():
+            merged[package] = dict(sorted(app_reviews.items()))
+        return merged
+
+    def failed_packages(self) -> set:
+        """Packages with at least one failed shard in the last ingest"""
+        return {package for package, _, _, _ in self.failed_shards}
+
+    def incomplete_packages(self) -> set:
+        """Packages with a failed or truncated shard in the last ingest; their range must not count as scraped"""
+        return self.failed_packages() | {package for package, _, _ in self.truncated_shards}
@@ -0,0 +1,135 @@
+# job_store.py
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    app TEXT NOT NULL,
+    app_url TEXT NOT NULL,
+    target_date TEXT NOT NULL,
+    drilldown INTEGER NOT NULL,
+    streaming INTEGER NOT NULL,
+    window_days INTEGER,
+    incremental INTEGER,
+    spill INTEGER,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    result TEXT,
+    csv_path TEXT,
+    errors TEXT NOT NULL DEFAULT '[]'
+);
+"""
+
+# created after the migration below, so a jobs table from before the window columns gets them first
+INDEXES = """
+DROP INDEX IF EXISTS idx_jobs_key;
+CREATE INDEX IF NOT EXISTS idx_jobs_request ON jobs (app, target_date, drilldown, window_days, incremental, spill, status);
+"""
+
+# columns added after the first release; jobs recorded before them have NULL there and are never reused
+ADDED_COLUMNS = {"window_days": "INTEGER", "incremental": "INTEGER", "spill": "INTEGER"}
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobStore:
+    """
+    SQLite-backed analysis job queue.
+    A job is identified by (app, target_date, drilldown, window_days, incremental, spill): submitting
+    it again while an identical job is queued or running returns that job, and once one has completed
+    its stored result is returned instead of running the analysis again.
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        with self.conn:
+            for column, column_type in ADDED_COLUMNS.items():
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self.conn.executescript(INDEXES)
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _job(row) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["drilldown"] = bool(job["drilldown"])
+        job["streaming"] = bool(job["streaming"])
+        for flag in ("incremental", "spill"):
+            job[flag] = bool(job[flag]) if job[flag] is not None else None
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["errors"] = json.loads(job["errors"])
+        return job
+
+    def submit(self, app: str, app_url: str, target_date: str, window_days: int, incremental: bool, spill: bool,
+               drilldown: bool = False, streaming: bool = False, force: bool = False) -> Tuple[Dict, bool]:
+        """
+        Queue an analysis unless an identical one is in flight or (without force) already completed.
+        window_days / incremental / spill are part of the job's identity, so pass the resolved values, not None.
+        Returns (job, created).
+        """
+        key = (app, target_date, int(drilldown), window_days, int(incremental), int(spill))
+        with self.conn:
+            statuses = ACTIVE_STATUSES if force else ACTIVE_STATUSES + ("completed",)
+            row = self.conn.execute(
+                f"SELECT * FROM jobs WHERE app = ? AND target_date = ? AND drilldown = ? AND window_days = ? "
+                f"AND incremental = ? AND spill = ? "
+                f"AND status IN ({','.join('?' * len(statuses))}) ORDER BY created DESC LIMIT 1",
+                key + statuses,
+            ).fetchone()
+            if row is not None:
+                return self._job(row), False
+
+            job_id = uuid.uuid4().hex
+            self.conn.execute(
+                "INSERT INTO jobs (job_id, app, app_url, target_date, drilldown, streaming, window_days, incremental, spill, "
+                "status, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, app, app_url, target_date, int(drilldown), int(streaming), window_days, int(incremental),
+                 int(spill), time.time()),
+            )
+        return self.get(job_id), True
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self._job(self.conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone())
+
+    def claim(self, job_id: str) -> Optional[Dict]:
+        """Mark a queued job as running; None if it is not queued (e.g. another worker took it)"""
+        with self.conn:
+            claimed = self.conn.execute(
+                "UPDATE jobs SET status = 'running', started = ? WHERE job_id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            ).rowcount
+        return self.get(job_id) if claimed else None
+
+    def finish(self, job_id: str, status: str, result: Dict = None, csv_path: str = None, errors: List[str] = None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, finished = ?, result = ?, csv_path = ?, errors = ? WHERE job_id = ?",
+                (status, time.time(), json.dumps(result) if result is not None else None, csv_path,
+                 json.dumps(errors or []), job_id),
+            )
+
+    def pending(self) -> List[str]:
+        """
+        Ids of jobs that still have to run, oldest first.
+        Jobs left 'running' by a stopped service are queued again; their workflow resumes from its checkpoint.
+        """
+        with self.conn:
+            self.conn.execute("UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running'")
+        return [row[0] for row in self.conn.execute("SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created")]
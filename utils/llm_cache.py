@@ -0,0 +1,101 @@
+# llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Optional
+from config import storage_config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed);
+"""
+
+def cache_key(*parts) -> str:
+    """Content address for an LLM call: sha256 over the JSON encoding of every input that shapes the prompt"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """
+    SQLite-backed cache of LLM responses keyed by cache_key(...).
+    Entries older than `ttl_seconds` are treated as misses, and once the cache grows past
+    `max_entries` or `max_bytes` the least recently read entries are evicted.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 0, max_entries: int = 0, max_bytes: int = 0):
+        """
+        ttl_seconds / max_entries / max_bytes: 0 disables that limit
+        """
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached response for `key`, or None on a miss or an expired entry"""
+        row = self.conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+            self.stats["misses"] += 1
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self.stats["hits"] += 1
+        return row[0]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+        self.stats["writes"] += 1
+        self._evict()
+
+    def _evict(self):
+        with self.conn:
+            if self.ttl_seconds:
+                cursor = self.conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+                self.stats["evictions"] += cursor.rowcount
+            count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            if not ((self.max_entries and count > self.max_entries) or (self.max_bytes and total > self.max_bytes)):
+                return
+            evicted = 0
+            for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+                if not ((self.max_entries and count > self.max_entries) or (self.max_bytes and total > self.max_bytes)):
+                    break
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                count -= 1
+                total -= size
+                evicted += 1
+            self.stats["evictions"] += evicted
+
+
+def open_llm_cache() -> Optional[LLMCache]:
+    """LLMCache configured from storage_config, or None when caching is disabled"""
+    if not storage_config.llm_cache_enabled:
+        return None
+    return LLMCache(
+        storage_config.llm_cache_path,
+        ttl_seconds=storage_config.llm_cache_ttl_hours * 3600,
+        max_entries=storage_config.llm_cache_max_entries,
+        max_bytes=int(storage_config.llm_cache_max_mb * 1024 * 1024)
+    )
@@ -0,0 +1,178 @@
+# llm_gateway.py
+import asyncio
+import json
+import re
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+import httpx
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_openai import AzureChatOpenAI
+from config import azure_config
+from utils.llm_scheduler import LLMScheduler, estimate_tokens
+from utils.metrics import increment, record_llm_response
+
+REPAIR_PROMPT = ChatPromptTemplate.from_template("""
+    The text below was meant to be a single JSON object but it is not valid ({error}).
+    Return the corrected JSON object only, keeping every key and value it contains.
+
+    {content}
+    """)
+
+# one (chat model, httpx client) per (event loop, settings): HTTP connections are kept alive across the
+# calls of a chat model session and never shared with another loop (httpx connections are bound to theirs).
+# A CLI, batch or job service run is one asyncio.run, so in practice that is one connection pool of
+# up to 2 * max_concurrency connections per run and settings, closed when the run's session ends.
+_models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, Tuple[Any, httpx.AsyncClient]]]" = weakref.WeakKeyDictionary()
+# open chat_model_session()s per event loop
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, int]" = weakref.WeakKeyDictionary()
+
+class LLMResponseError(Exception):
+    """The model's response could not be turned into the expected JSON, even after repair and a re-ask"""
+
+def parse_json_response(content: str) -> Any:
+    """
+    JSON from an LLM response: markdown fences are stripped, text around the outermost object is
+    ignored and trailing commas are dropped. Raises ValueError if it still does not parse.
+    """
+    content = content.strip()
+    if content.startswith('```json'):
+        content = content[7:]
+    elif content.startswith('```'):
+        content = content[3:]
+    if content.endswith('```'):
+        content = content[:-3]
+    content = content.strip()
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        start, end = content.find("{"), content.rfind("}")
+        if start < 0 or end <= start:
+            raise
+        return json.loads(re.sub(r",\s*([}\]])", r"\1", content[start:end + 1]))
+
+
+def chat_model(json_mode: bool = False, temperature: float = 0.1):
+    """
+    Shared chat model for the running event loop: azure_config.chat_model when set, otherwise one
+    AzureChatOpenAI per settings with a keep-alive connection pool, closed by close_chat_models.
+    Retries are left to LLMScheduler.
+    """
+    if azure_config.chat_model is not None:
+        return azure_config.chat_model
+    key = (azure_config.endpoint, azure_config.deployment_name, azure_config.api_version, azure_config.api_key, json_mode, temperature)
+    models = _models.setdefault(asyncio.get_running_loop(), {})
+    if key not in models:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max(1, azure_config.max_concurrency) * 2,
+                                max_keepalive_connections=max(1, azure_config.max_concurrency),
+                                keepalive_expiry=60),
+            timeout=httpx.Timeout(azure_config.request_timeout, connect=10)
+        )
+        models[key] = AzureChatOpenAI(
+            azure_deployment=azure_config.deployment_name,
+            openai_api_version=azure_config.api_version,
+            azure_endpoint=azure_config.endpoint,
+            api_key=azure_config.api_key,
+            temperature=temperature,
+            max_retries=0,
+            http_async_client=client,
+            model_kwargs={"response_format": {"type": "json_object"}} if json_mode else {}
+        ), client
+    return models[key][0]
+
+
+async def close_chat_models():
+    """Close the HTTP connection pools of the running event loop's chat models; later calls create new ones"""
+    models = _models.pop(asyncio.get_running_loop(), {})
+    await asyncio.gather(*[client.aclose() for _, client in models.values()], return_exceptions=True)
+
+
+@asynccontextmanager
+async def chat_model_session():
+    """
+    Scope of one run's chat models: the models created while it is open are reused by every LLM call on
+    the loop and closed once the last session open on the loop ends (runs on one loop may overlap)
+    """
+    loop = asyncio.get_running_loop()
+    _sessions[loop] = _sessions.get(loop, 0) + 1
+    try:
+        yield
+    finally:
+        _sessions[loop] -= 1
+        if not _sessions[loop]:
+            del _sessions[loop]
+            await close_chat_models()
+
+
+class LLMGateway:
+    """
+    Single way the agents talk to the LLM: a shared chat model, calls scheduled under the rate
+    budgets (with jittered backoff on 429s / timeouts), metrics per stage, and JSON responses
+    that are repaired rather than dropped. A malformed response first gets a small repair call
+    that only sends the broken text back; if that fails too the original prompt is asked again.
+    """
+
+    def __init__(self, stage: str, json_mode: bool = False, temperature: float = 0.1, max_reasks: int = 1):
+        if not azure_config.is_configured():
+            raise Exception("Azure OpenAI not configured. Please set AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, and AZURE_OPENAI_DEPLOYMENT_NAME environment variables.")
+        self.stage = stage
+        self.llm = chat_model(json_mode=json_mode, temperature=temperature)
+        self.scheduler = LLMScheduler(
+            max_concurrency=azure_config.max_concurrency,
+            requests_per_minute=azure_config.requests_per_minute,
+            tokens_per_minute=azure_config.tokens_per_minute,
+            budget_path=azure_config.shared_budget_path or None,
+            name=stage
+        )
+        self.max_reasks = max_reasks
+
+    def close(self):
+        self.scheduler.close()
+
+    async def complete(self, prompt: str, tokens: int = None) -> str:
+        """Response text for `prompt`, sent through the scheduler"""
+        async def call():
+            started = time.perf_counter()
+            response = await self.llm.ainvoke(prompt)
+            record_llm_response(self.stage, time.perf_counter() - started, response)
+            return response.content
+
+        return await self.scheduler.submit(call, tokens or estimate_tokens(prompt) + 500)
+
+    async def complete_json(self, prompt: str, tokens: int = None, validate: Callable[[Any], None] = None) -> Tuple[Any, str]:
+        """
+        Parsed JSON response for `prompt`, plus its text as valid JSON (what callers should cache).
+        validate: optional check that raises ValueError / KeyError / TypeError when the JSON does
+        not have the expected shape; such a response is repaired like a syntax error.
+        Raises LLMResponseError when neither repair nor a re-ask produce a usable response.
+        """
+        error = None
+        for attempt in range(self.max_reasks + 1):
+            if attempt:
+                increment(self.stage, "reasks")
+                print(f"Re-asking {self.stage} prompt after unusable response ({error})")
+            content = await self.complete(prompt, tokens)
+            parsed, error = self._parse(content, validate)
+            if error is None:
+                return parsed, json.dumps(parsed)
+
+            increment(self.stage, "repairs")
+            repair_prompt = REPAIR_PROMPT.format(error=error, content=content)
+            repaired = await self.complete(repair_prompt, estimate_tokens(repair_prompt) * 2)
+            parsed, repair_error = self._parse(repaired, validate)
+            if repair_error is None:
+                print(f"Repaired malformed {self.stage} response ({error})")
+                return parsed, json.dumps(parsed)
+        raise LLMResponseError(f"Unusable {self.stage} response after {self.max_reasks + 1} attempt(s): {error}")
+
+    @staticmethod
+    def _parse(content: str, validate) -> Tuple[Optional[Any], Optional[str]]:
+        try:
+            parsed = parse_json_response(content)
+            if validate is not None:
+                validate(parsed)
+            return parsed, None
+        except (ValueError, KeyError, TypeError) as e:
+            return None, f"{type(e).__name__}: {str(e)[:200]}"
@@ -0,0 +1,259 @@
+# llm_scheduler.py
+import asyncio
+import os
+import random
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+from utils.metrics import increment
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for TPM budgeting"""
+    return max(1, len(text) // 4)
+
+def chunk_by_tokens(lines: List[str], max_tokens: int) -> List[List[str]]:
+    """
+    Greedily pack lines, in order, into chunks of at most `max_tokens` estimated tokens.
+    A single line over the budget is truncated so it still fits in a chunk of its own.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if tokens > max_tokens:
+            line = line[:max_tokens * 4]
+            tokens = max_tokens
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def is_retryable_error(error: Exception) -> bool:
+    """429s, timeouts and transient connection errors are retried; everything else is raised"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status in (408, 429, 500, 502, 503, 504):
+        return True
+    name = type(error).__name__
+    return name in ("RateLimitError", "APITimeoutError", "APIConnectionError", "TimeoutError")
+
+def retry_after_seconds(error: Exception):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class RateLimiter:
+    """Token bucket refilled continuously at `per_minute` units per minute"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def close(self):
+        pass
+
+    async def acquire(self, amount: int = 1) -> float:
+        """Wait until `amount` units are available and take them; returns seconds waited"""
+        if not self.capacity:
+            return 0.0
+        # a single request larger than the whole budget may go through once the bucket is full
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return waited
+                delay = (amount - self.available) * 60.0 / self.capacity
+                await asyncio.sleep(delay)
+                waited += delay
+
+class SharedRateLimiter:
+    """
+    Token bucket like RateLimiter, kept in a SQLite file so that every process pointing at the
+    same file draws from one budget (e.g. the workers of a batch run sharing a deployment's quota).
+    The bucket is updated on a worker thread with a short busy timeout; while another process holds
+    the write lock, acquire backs off on the event loop instead of blocking it.
+    """
+
+    def __init__(self, db_path: str, name: str, per_minute: int, busy_timeout: float = 0.05, max_busy_delay: float = 0.5):
+        """
+        busy_timeout: seconds one attempt waits for another process's write lock
+        max_busy_delay: upper bound of the jittered backoff between attempts while the file stays locked
+        """
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.name = name
+        self.capacity = per_minute
+        self.max_busy_delay = max_busy_delay
+        self.lock = asyncio.Lock()
+        # autocommit mode so _take can hold an explicit write lock across read-modify-write;
+        # used from worker threads, one at a time (self.lock)
+        self.conn = sqlite3.connect(db_path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_budget (name TEXT PRIMARY KEY, available REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def _take(self, amount: int) -> Optional[float]:
+        """
+        Take `amount` units if the shared bucket has them; returns 0, the seconds until it will,
+        or None when another process held the file's write lock for longer than the busy timeout
+        """
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e) or "busy" in str(e):
+                return None
+            raise
+        try:
+            now = time.time()
+            row = self.conn.execute("SELECT available, updated FROM rate_budget WHERE name = ?", (self.name,)).fetchone()
+            available = self.capacity if row is None else min(self.capacity, row[0] + max(0.0, now - row[1]) * self.capacity / 60.0)
+            delay = 0.0
+            if available >= amount:
+                available -= amount
+            else:
+                delay = (amount - available) * 60.0 / self.capacity
+            self.conn.execute("INSERT OR REPLACE INTO rate_budget (name, available, updated) VALUES (?, ?, ?)", (self.name, available, now))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return delay
+
+    async def acquire(self, amount: int = 1) -> float:
+        """Wait until `amount` units are available in the shared bucket and take them; returns seconds waited"""
+        if not self.capacity:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        busy_attempts = 0
+        async with self.lock:
+            while True:
+                delay = await asyncio.to_thread(self._take, amount)
+                if delay is None:
+                    busy_attempts += 1
+                    delay = random.uniform(0, min(self.max_busy_delay, 0.01 * 2 ** busy_attempts))
+                elif not delay:
+                    return waited
+                await asyncio.sleep(delay)
+                waited += delay
+
+class LLMScheduler:
+    """
+    Runs LLM calls concurrently under a concurrency cap plus requests-per-minute and
+    tokens-per-minute budgets. On 429s and timeouts it backs off with jitter and halves
+    the effective concurrency, growing it back one slot at a time after successes.
+    """
+
+    def __init__(self, max_concurrency: int = 4, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0, timeout: float = None,
+                 budget_path: str = None, name: str = "llm"):
+        """
+        requests_per_minute / tokens_per_minute: 0 disables that budget
+        timeout: optional per-call timeout in seconds (a timeout counts as a retryable failure)
+        budget_path: optional SQLite file holding the RPM / TPM buckets, shared with other processes using it
+        name: stage the calls are reported under in the run metrics
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = asyncio.Condition()
+        if budget_path:
+            self.request_limiter = SharedRateLimiter(budget_path, "requests_per_minute", requests_per_minute)
+            self.token_limiter = SharedRateLimiter(budget_path, "tokens_per_minute", tokens_per_minute)
+        else:
+            self.request_limiter = RateLimiter(requests_per_minute)
+            self.token_limiter = RateLimiter(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.name = name
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "queue_wait": 0.0}
+
+    def close(self):
+        """Release the rate budgets (the shared budget's SQLite connections)"""
+        self.request_limiter.close()
+        self.token_limiter.close()
+
+    async def _acquire_slot(self):
+        async with self.condition:
+            while self.in_flight >= self.limit:
+                await self.condition.wait()
+            self.in_flight += 1
+
+    async def _release_slot(self, throttled: bool):
+        async with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+            else:
+                self.successes += 1
+                if self.limit < self.max_concurrency and self.successes >= self.limit:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+    async def submit(self, call: Callable[[], Awaitable[Any]], tokens: int = 1) -> Any:
+        """Run `call()` under the budgets, retrying retryable failures"""
+        attempt = 0
+        while True:
+            wait_start = time.monotonic()
+            await self._acquire_slot()
+            throttled = False
+            # the slot is given back however this attempt ends, including a cancelled budget wait or call
+            try:
+                await self.request_limiter.acquire(1)
+                await self.token_limiter.acquire(tokens)
+                waited = time.monotonic() - wait_start
+                self.stats["queue_wait"] += waited
+                increment(self.name, "queue_wait_seconds", waited)
+                self.stats["calls"] += 1
+                try:
+                    if self.timeout:
+                        return await asyncio.wait_for(call(), self.timeout)
+                    return await call()
+                except Exception as e:
+                    throttled = is_retryable_error(e)
+                    if not throttled or attempt >= self.max_retries:
+                        raise
+                    error = e
+            finally:
+                await self._release_slot(throttled=throttled)
+            self.stats["retries"] += 1
+            self.stats["throttled"] += 1
+            increment(self.name, "retries")
+            delay = retry_after_seconds(error) or min(self.max_delay, self.base_delay * (2 ** attempt))
+            delay += random.uniform(0, delay / 2)
+            print(f"LLM call throttled ({type(error).__name__}), retrying in {delay:.1f}s with concurrency {self.limit}")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def map(self, items: List[Any], fn: Callable[[Any], Awaitable[Any]], tokens_fn: Callable[[Any], int] = None) -> List[Any]:
+        """Apply async `fn` to every item concurrently; results keep the order of `items`"""
+        return await asyncio.gather(*[
+            self.submit(lambda item=item: fn(item), tokens_fn(item) if tokens_fn else 1)
+            for item in items
+        ])
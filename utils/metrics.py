@@ -0,0 +1,219 @@
+# metrics.py
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# upper bounds (seconds) of the latency histogram buckets, Prometheus style
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_run: ContextVar[Optional["RunMetrics"]] = ContextVar("review_analysis_run_metrics", default=None)
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "buckets": {str(bound): n for bound, n in zip(LATENCY_BUCKETS, self.buckets)},
+        }
+
+class RunMetrics:
+    """
+    Measurements of one analysis run: node wall times, LLM calls per stage (latency, prompt /
+    completion tokens, queue wait, retries, response repairs, cache hits) and scraper page fetches.
+    Code anywhere in the run records into it through the module-level helpers, which are no-ops
+    outside track_run().
+    """
+
+    def __init__(self, analysis_id, app: str, target_date: str):
+        self.analysis_id = str(analysis_id)
+        self.app = app
+        self.target_date = target_date
+        self.started = time.time()
+        self.finished = None
+        self.status = "running"
+        self.nodes: Dict[str, Dict] = {}
+        self.llm: Dict[str, Dict] = {}
+        self.llm_latency: Dict[str, LatencyHistogram] = {}
+        self.scraper = {"calls": 0, "reviews": 0}
+        self.scraper_latency = LatencyHistogram()
+
+    def _stage(self, stage: str) -> Dict:
+        if stage not in self.llm:
+            self.llm[stage] = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "retries": 0, "repairs": 0,
+                               "reasks": 0, "cache_hits": 0, "cache_misses": 0, "queue_wait_seconds": 0.0}
+            self.llm_latency[stage] = LatencyHistogram()
+        return self.llm[stage]
+
+    def record_node(self, node: str, seconds: float, status: str):
+        entry = self.nodes.setdefault(node, {"seconds": 0.0, "runs": 0, "status": status})
+        entry["seconds"] += seconds
+        entry["runs"] += 1
+        entry["status"] = status
+
+    def record_llm_call(self, stage: str, seconds: float, prompt_tokens: int, completion_tokens: int):
+        entry = self._stage(stage)
+        entry["calls"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["completion_tokens"] += completion_tokens
+        self.llm_latency[stage].observe(seconds)
+
+    def increment(self, stage: str, counter: str, amount: float = 1):
+        self._stage(stage)[counter] += amount
+
+    def record_scrape(self, seconds: float, reviews: int):
+        self.scraper["calls"] += 1
+        self.scraper["reviews"] += reviews
+        self.scraper_latency.observe(seconds)
+
+    def finish(self, status: str):
+        self.finished = time.time()
+        self.status = status
+
+    def report(self) -> Dict:
+        finished = self.finished or time.time()
+        return {
+            "analysis_id": self.analysis_id,
+            "app": self.app,
+            "target_date": self.target_date,
+            "status": self.status,
+            "started": self.started,
+            "seconds": round(finished - self.started, 4),
+            "nodes": {node: {**entry, "seconds": round(entry["seconds"], 4)} for node, entry in self.nodes.items()},
+            "llm": {
+                stage: {**entry, "queue_wait_seconds": round(entry["queue_wait_seconds"], 4),
+                        "latency": self.llm_latency[stage].to_dict()}
+                for stage, entry in self.llm.items()
+            },
+            "scraper": {**self.scraper, "latency": self.scraper_latency.to_dict()},
+        }
+
+    def write_json(self, report_dir: str) -> str:
+        if not os.path.exists(report_dir):
+            os.makedirs(report_dir)
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.started)) + f"_{int(self.started * 1000) % 1000:03d}"
+        path = os.path.join(report_dir, f"run_{self.analysis_id}_{timestamp}.json")
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def prometheus_text(self) -> str:
+        """The run in the Prometheus text exposition format (values describe this run)"""
+        lines = []
+        app = self.app
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP review_analysis_{name} {help_text}")
+            lines.append(f"# TYPE review_analysis_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_label_value(val)}"' for key, val in [("app", app)] + labels)
+                lines.append(f"review_analysis_{name}{{{label_text}}} {value}")
+
+        def histogram(name, help_text, histograms):
+            lines.append(f"# HELP review_analysis_{name} {help_text}")
+            lines.append(f"# TYPE review_analysis_{name} histogram")
+            for labels, hist in histograms:
+                label_text = ",".join(f'{key}="{_label_value(val)}"' for key, val in [("app", app)] + labels)
+                for bound, n in zip(LATENCY_BUCKETS, hist.buckets):
+                    lines.append(f'review_analysis_{name}_bucket{{{label_text},le="{bound}"}} {n}')
+                lines.append(f'review_analysis_{name}_bucket{{{label_text},le="+Inf"}} {hist.count}')
+                lines.append(f"review_analysis_{name}_sum{{{label_text}}} {hist.sum:.6f}")
+                lines.append(f"review_analysis_{name}_count{{{label_text}}} {hist.count}")
+
+        report = self.report()
+        metric("last_run_timestamp_seconds", "gauge", "Start time of the last run", [([], f"{self.started:.3f}")])
+        metric("last_run_duration_seconds", "gauge", "Wall time of the last run", [([], report["seconds"])])
+        metric("last_run_success", "gauge", "1 if the last run completed", [([], int(self.status == "completed"))])
+        metric("node_duration_seconds", "gauge", "Wall time per workflow node in the last run",
+               [([("node", node)], entry["seconds"]) for node, entry in report["nodes"].items()])
+        for counter, help_text in (("calls", "LLM calls"), ("prompt_tokens", "LLM prompt tokens"),
+                                   ("completion_tokens", "LLM completion tokens"), ("retries", "LLM call retries"),
+                                   ("repairs", "Malformed LLM responses sent for repair"), ("reasks", "LLM prompts asked again"),
+                                   ("cache_hits", "LLM response cache hits"), ("cache_misses", "LLM response cache misses"),
+                                   ("queue_wait_seconds", "Time LLM calls waited for the scheduler")):
+            metric(f"llm_{counter}", "gauge", f"{help_text} per stage in the last run",
+                   [([("stage", stage)], entry[counter]) for stage, entry in report["llm"].items()])
+        histogram("llm_latency_seconds", "LLM call latency per stage in the last run",
+                  [([("stage", stage)], hist) for stage, hist in self.llm_latency.items()])
+        metric("scraper_calls", "gauge", "Scraper page fetches in the last run", [([], self.scraper["calls"])])
+        metric("scraper_reviews", "gauge", "Reviews returned by the scraper in the last run", [([], self.scraper["reviews"])])
+        histogram("scraper_latency_seconds", "Scraper page fetch latency in the last run", [([], self.scraper_latency)])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, textfile_dir: str) -> str:
+        """
+        Write the run to <textfile_dir>/review_analysis_<app>.prom for the node_exporter textfile collector.
+        The file is replaced atomically, so the collector never reads a partial file.
+        """
+        if not os.path.exists(textfile_dir):
+            os.makedirs(textfile_dir)
+        safe_app = "".join(ch if ch.isalnum() or ch in "._-" else "_" for ch in self.app)
+        path = os.path.join(textfile_dir, f"review_analysis_{safe_app}.prom")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def current_run() -> Optional[RunMetrics]:
+    return _current_run.get()
+
+
+@contextmanager
+def track_run(metrics: RunMetrics):
+    """Make `metrics` the current run for this context (and the asyncio tasks it starts)"""
+    token = _current_run.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_run.reset(token)
+
+
+def record_node(node: str, seconds: float, status: str):
+    metrics = _current_run.get()
+    if metrics is not None:
+        metrics.record_node(node, seconds, status)
+
+
+def record_llm_response(stage: str, seconds: float, response):
+    """Record one LLM call; token counts come from the response's usage metadata when the provider returns it"""
+    metrics = _current_run.get()
+    if metrics is None:
+        return
+    usage = getattr(response, "usage_metadata", None) or {}
+    if not usage:
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        usage = {"input_tokens": token_usage.get("prompt_tokens", 0), "output_tokens": token_usage.get("completion_tokens", 0)}
+    metrics.record_llm_call(stage, seconds, usage.get("input_tokens", 0) or 0, usage.get("output_tokens", 0) or 0)
+
+
+def increment(stage: str, counter: str, amount: float = 1):
+    metrics = _current_run.get()
+    if metrics is not None:
+        metrics.increment(stage, counter, amount)
+
+
+def record_scrape(seconds: float, reviews: int):
+    metrics = _current_run.get()
+    if metrics is not None:
+        metrics.record_scrape(seconds, reviews)
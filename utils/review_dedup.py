@@ -0,0 +1,82 @@
+# review_dedup.py
+import random
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 4
+MERSENNE_PRIME = (1 << 61) - 1
+
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial variants hash the same"""
+    return " ".join(re.sub(r"[^\w\s]", " ", (text or "").lower()).split())
+
+def shingles(text: str) -> set:
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """MinHash signature over character shingles; crc32 keeps signatures stable across runs"""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+    return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+def signature_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+def collapse_reviews(reviews: List[Dict], threshold: float = 0.8) -> List[Tuple[Dict, int]]:
+    """(representative, weight) pairs of group_reviews, weight being the number of reviews in the group"""
+    return [(group[0], len(group)) for group in group_reviews(reviews, threshold)]
+
+def group_reviews(reviews: List[Dict], threshold: float = 0.8) -> List[List[Dict]]:
+    """
+    Group identical and near-identical reviews, each group led by its representative.
+    Exact duplicates are grouped by normalized text first; the remaining distinct texts are
+    bucketed with MinHash LSH and merged into a cluster when their estimated Jaccard
+    similarity to its representative reaches `threshold`. Reviews are only merged within
+    the same rating, and groups keep the order of first appearance.
+    """
+    exact: Dict[Tuple, List] = {}
+    for review in reviews:
+        key = (review.get("rating"), normalize_text(review.get("content", "")))
+        exact.setdefault(key, []).append(review)
+
+    keys = list(exact)
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = NUM_PERM // BANDS
+    signatures = [minhash(text) if text else None for _, text in keys]
+    buckets = defaultdict(list)
+    for i, ((rating, _), signature) in enumerate(zip(keys, signatures)):
+        if signature is None:
+            continue
+        for band in range(BANDS):
+            buckets[(rating, band, signature[band * rows:(band + 1) * rows])].append(i)
+
+    for members in buckets.values():
+        for i in members[1:]:
+            root, other = find(members[0]), find(i)
+            if root != other and signature_similarity(signatures[root], signatures[i]) >= threshold:
+                parent[max(root, other)] = min(root, other)
+
+    clusters: Dict[int, List[Dict]] = {}
+    for i, key in enumerate(keys):
+        root = find(i)
+        if root not in clusters:
+            clusters[root] = list(exact[keys[root]])
+        if root != i:
+            clusters[root] += exact[key]
+    return list(clusters.values())
@@ -0,0 +1,84 @@
+# review_spill.py
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+class ReviewSpill:
+    """
+    Review window spilled to an append-only JSONL file, one [review_id, rating, content] line per review,
+    written one day at a time. Only the file path and each day's byte range and review count are kept
+    (and checkpointed with the state), so holding the window costs the same at any size; iter_days
+    reads one day back at a time. Same read interface as ReviewColumns.
+    """
+
+    def __init__(self, path: str, days: List[str] = None, create: bool = True):
+        """create: start a new, empty file at path (False when reattaching to one, see from_checkpoint)"""
+        self.path = path
+        self.days: List[str] = list(days or [])
+        # day -> (start offset, end offset, number of reviews)
+        self.ranges: Dict[str, Tuple[int, int, int]] = {}
+        if create:
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            # a window that is ingested again starts a new file
+            open(path, "wb").close()
+
+    def __len__(self):
+        return sum(count for _, _, count in self.ranges.values())
+
+    def append_day(self, date_str: str, rows: Iterable[Tuple[str, Optional[int], Optional[str]]]):
+        """Append one day's (review_id, rating, content) rows; a day appended again replaces the earlier range"""
+        with open(self.path, "ab") as f:
+            start = f.tell()
+            count = 0
+            for review_id, rating, content in rows:
+                f.write(json.dumps([review_id, rating, content or ""], ensure_ascii=False).encode("utf-8") + b"\n")
+                count += 1
+            self.ranges[date_str] = (start, f.tell(), count)
+        if date_str not in self.days:
+            self.days.append(date_str)
+
+    def freeze(self) -> "ReviewSpill":
+        """Call once after the last append"""
+        self.days.sort()
+        return self
+
+    def available(self) -> bool:
+        return os.path.exists(self.path)
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def read_day(self, date_str: str) -> List[Dict]:
+        """One day's reviews as review dicts (review_id, date, rating, content), like ReviewColumns.review"""
+        start, end, _ = self.ranges.get(date_str, (0, 0, 0))
+        if end == start:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            lines = f.read(end - start).splitlines()
+        return [
+            {"review_id": review_id, "date": date_str, "rating": rating or None, "content": content}
+            for review_id, rating, content in map(json.loads, lines)
+        ]
+
+    def day_counts(self) -> Dict[str, int]:
+        """{day: number of reviews} for every day in the window"""
+        return {day: self.ranges.get(day, (0, 0, 0))[2] for day in self.days}
+
+    def iter_days(self) -> Iterator[Tuple[str, List[Dict]]]:
+        """Yield (day, [review dict, ...]) reading one day from disk at a time"""
+        for day in self.days:
+            yield day, self.read_day(day)
+
+    def to_checkpoint(self) -> Dict:
+        """Plain data for the checkpoint serializer (see utils.state_serde): the path and day ranges, not the reviews"""
+        return {"path": self.path, "days": self.days, "ranges": [[day, *span] for day, span in self.ranges.items()]}
+
+    @classmethod
+    def from_checkpoint(cls, data: Dict) -> "ReviewSpill":
+        spill = cls(data["path"], data["days"], create=False)
+        spill.ranges = {day: (start, end, count) for day, start, end, count in data["ranges"]}
+        return spill
@@ -0,0 +1,252 @@
+# review_store.py
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from utils.compact_state import ReviewColumns
+from utils.ingestion_engine import review_key
+from utils.review_spill import ReviewSpill
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    app TEXT NOT NULL,
+    review_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    user TEXT,
+    rating INTEGER,
+    content TEXT,
+    reply TEXT,
+    country TEXT,
+    lang TEXT,
+    PRIMARY KEY (app, review_id)
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_app_date ON reviews (app, date);
+CREATE INDEX IF NOT EXISTS idx_reviews_app_rating ON reviews (app, rating, date);
+CREATE TABLE IF NOT EXISTS watermarks (
+    app TEXT PRIMARY KEY,
+    first_date TEXT NOT NULL,
+    last_date TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS review_topics (
+    app TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    date TEXT NOT NULL,
+    review_id TEXT NOT NULL,
+    PRIMARY KEY (app, topic, date, review_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_review_topics_date ON review_topics (app, date, review_id);
+"""
+
+REVIEW_COLUMNS = ["review_id", "user", "rating", "content", "at", "reply", "country", "lang"]
+
+# review columns topic counts can be broken down by
+BREAKDOWNS = ("date", "rating", "country", "lang")
+
+def next_day(date_str: str) -> str:
+    return (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+class ReviewStore:
+    """
+    SQLite-backed store of scraped reviews, keyed by (app, review_id) and indexed by (app, date).
+    The watermark table records the date range each app has been scraped for,
+    so ingestion only has to fetch days outside of it.
+    review_topics is the inverted index of the analyzed reviews: canonical topic -> review ids, clustered
+    on (app, topic, date) so the reviews behind a topic in a date range are one contiguous read; date ->
+    and rating -> review ids are the (app, date) and (app, rating, date) indexes on reviews. Drilldown and
+    breakdowns by any review column are answered from these without another LLM pass.
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get_watermark(self, app: str) -> Optional[Tuple[str, str]]:
+        """Returns (first_date, last_date) scraped for the app, or None if never scraped"""
+        row = self.conn.execute(
+            "SELECT first_date, last_date FROM watermarks WHERE app = ?", (app,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def missing_range(self, app: str, start_date: str, end_date: str) -> Optional[Tuple[str, str]]:
+        """
+        Date range that still has to be scraped to cover [start_date, end_date], or None.
+        The last watermarked day is re-fetched because it may have been scraped while still in progress.
+        The range always touches the watermark, so saving it keeps the watermark one gap-free interval
+        (the scraper walks newest first, so reaching up to the watermark costs no extra pages).
+        """
+        watermark = self.get_watermark(app)
+        if watermark is None:
+            return (start_date, end_date)
+        first_date, last_date = watermark
+        if start_date < first_date:
+            return (start_date, max(end_date, first_date))
+        if end_date < last_date:
+            return None
+        return (last_date, end_date)
+
+    def _upsert(self, app: str, daily_reviews: Dict[str, List[Dict]]):
+        rows = [
+            (app, review_key(r), date_str, r.get("user"), r.get("rating"), r.get("content"),
+             r.get("reply"), r.get("country"), r.get("lang"))
+            for date_str, day in daily_reviews.items()
+            for r in day
+        ]
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO reviews (app, review_id, date, user, rating, content, reply, country, lang) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def upsert_reviews(self, app: str, daily_reviews: Dict[str, List[Dict]]):
+        """Upsert scraped reviews without touching the watermark (e.g. single days of a scrape still in progress)"""
+        with self.conn:
+            self._upsert(app, daily_reviews)
+
+    def save_reviews(self, app: str, daily_reviews: Dict[str, List[Dict]], start_date: str, end_date: str):
+        """
+        Upsert scraped reviews and extend the app's watermark to cover [start_date, end_date].
+        A range that does not overlap or touch the watermark replaces it instead, so the days between
+        the two are never counted as scraped.
+        """
+        with self.conn:
+            self._upsert(app, daily_reviews)
+            watermark = self.get_watermark(app)
+            if watermark is not None and next_day(end_date) >= watermark[0] and start_date <= next_day(watermark[1]):
+                start_date = min(start_date, watermark[0])
+                end_date = max(end_date, watermark[1])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO watermarks (app, first_date, last_date) VALUES (?, ?, ?)",
+                (app, start_date, end_date),
+            )
+
+    def load_reviews(self, app: str, start_date: str, end_date: str, dates: List[str] = None) -> Dict[str, List[Dict]]:
+        """
+        Load reviews for [start_date, end_date] as {"YYYY-MM-DD": [review, ...]}.
+        dates: optional full list of days so empty days still get a bucket
+        """
+        daily_reviews = {date_str: [] for date_str in (dates or [])}
+        cursor = self.conn.execute(
+            "SELECT review_id, user, rating, content, date, reply, country, lang FROM reviews "
+            "WHERE app = ? AND date BETWEEN ? AND ? ORDER BY date, rowid",
+            (app, start_date, end_date),
+        )
+        for row in cursor:
+            daily_reviews.setdefault(row[4], []).append(dict(zip(REVIEW_COLUMNS, row)))
+        return dict(sorted(daily_reviews.items()))
+
+    def iter_rows(self, app: str, start_date: str, end_date: str, only_days: List[str] = None) -> Iterator[Tuple]:
+        """(review_id, date, rating, content) rows for [start_date, end_date] in date order, streamed from the cursor"""
+        query = "SELECT review_id, date, rating, content FROM reviews WHERE app = ? AND date BETWEEN ? AND ?"
+        params = [app, start_date, end_date]
+        if only_days is not None:
+            if not only_days:
+                return iter(())
+            query += f" AND date IN ({','.join('?' * len(only_days))})"
+            params += list(only_days)
+        return self.conn.execute(query + " ORDER BY date, rowid", params)
+
+    def load_columns(self, app: str, start_date: str, end_date: str, dates: List[str] = None,
+                     only_days: List[str] = None) -> ReviewColumns:
+        """
+        Load reviews for [start_date, end_date] straight into a columnar ReviewColumns,
+        without building a dict per review.
+        dates: optional full list of days so empty days are still part of the window
+        only_days: optional subset of days to load; the other days stay empty
+        """
+        columns = ReviewColumns(dates)
+        for review_id, date_str, rating, content in self.iter_rows(app, start_date, end_date, only_days):
+            columns.append(review_id, date_str, rating, content)
+        return columns.freeze()
+
+    def spill_window(self, app: str, path: str, start_date: str, end_date: str, dates: List[str] = None,
+                     only_days: List[str] = None) -> ReviewSpill:
+        """
+        Like load_columns, but the reviews are streamed day by day into a ReviewSpill file at `path`,
+        so no more than one row is in memory at a time
+        """
+        spill = ReviewSpill(path, dates)
+        for date_str, rows in groupby(self.iter_rows(app, start_date, end_date, only_days), key=lambda row: row[1]):
+            spill.append_day(date_str, ((review_id, rating, content) for review_id, _, rating, content in rows))
+        return spill.freeze()
+
+    def save_topics(self, app: str, assignments: Iterable[Tuple[str, Dict[str, List[str]]]]) -> int:
+        """
+        Replace the indexed topics of each (date, {topic: [review_id, ...]}) day in one transaction,
+        a day at a time and writing only the rows that changed. Returns the number of days that changed.
+        """
+        changed = 0
+        with self.conn:
+            for day, topics in assignments:
+                new = {(topic, review_id) for topic, review_ids in topics.items() for review_id in review_ids}
+                old = set(self.conn.execute("SELECT topic, review_id FROM review_topics WHERE app = ? AND date = ?", (app, day)))
+                if old == new:
+                    continue
+                changed += 1
+                self.conn.executemany(
+                    "DELETE FROM review_topics WHERE app = ? AND topic = ? AND date = ? AND review_id = ?",
+                    [(app, topic, day, review_id) for topic, review_id in old - new]
+                )
+                self.conn.executemany(
+                    "INSERT INTO review_topics (app, topic, date, review_id) VALUES (?, ?, ?, ?)",
+                    [(app, topic, day, review_id) for topic, review_id in new - old]
+                )
+        return changed
+
+    def _filters(self, app: str, start_date: str, end_date: str, topics: List[str] = None, ratings: List[int] = None,
+                 with_topics: bool = False):
+        """FROM / WHERE clause and parameters selecting the reviews, joined with their topics when filtering or grouping by topic"""
+        if topics or with_topics:
+            clause = ("FROM review_topics t JOIN reviews r ON r.app = t.app AND r.review_id = t.review_id "
+                      "WHERE t.app = ? AND t.date BETWEEN ? AND ?")
+            params = [app, start_date, end_date]
+            if topics:
+                clause += f" AND t.topic IN ({','.join('?' * len(topics))})"
+                params += list(topics)
+        else:
+            clause = "FROM reviews r WHERE r.app = ? AND r.date BETWEEN ? AND ?"
+            params = [app, start_date, end_date]
+        if ratings:
+            clause += f" AND r.rating IN ({','.join('?' * len(ratings))})"
+            params += list(ratings)
+        return clause, params
+
+    def find_reviews(self, app: str, start_date: str, end_date: str, topics: List[str] = None,
+                     ratings: List[int] = None, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """
+        Reviews in [start_date, end_date] mentioning any of `topics` and with one of `ratings`
+        (either filter may be left out), newest first, each with the topics indexed for it
+        """
+        clause, params = self._filters(app, start_date, end_date, topics, ratings)
+        rows = self.conn.execute(
+            "SELECT DISTINCT r.review_id, r.user, r.rating, r.content, r.date, r.reply, r.country, r.lang "
+            f"{clause} ORDER BY r.date DESC, r.review_id LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        reviews = [dict(zip(REVIEW_COLUMNS, row)) for row in rows]
+        for review in reviews:
+            review["topics"] = [topic for topic, in self.conn.execute(
+                "SELECT topic FROM review_topics WHERE app = ? AND date = ? AND review_id = ? ORDER BY topic",
+                (app, review["at"], review["review_id"])
+            )]
+        return reviews
+
+    def topic_breakdown(self, app: str, start_date: str, end_date: str, by: str = "rating",
+                        topics: List[str] = None, ratings: List[int] = None) -> Dict[str, Dict]:
+        """{topic: {value of `by`: number of reviews}} over the indexed reviews in [start_date, end_date]"""
+        if by not in BREAKDOWNS:
+            raise ValueError(f"Unknown breakdown: {by}")
+        clause, params = self._filters(app, start_date, end_date, topics, ratings, with_topics=True)
+        breakdown: Dict[str, Dict] = {}
+        for topic, value, count in self.conn.execute(
+            f"SELECT t.topic, r.{by}, COUNT(*) {clause} GROUP BY t.topic, r.{by} ORDER BY t.topic, r.{by}", params
+        ):
+            breakdown.setdefault(topic, {})[value] = count
+        return breakdown
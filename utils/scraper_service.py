@@ -1,35 +1,144 @@
 # scraper_service.py
+import asyncio
+import time
+from concurrent.futures import Executor
+from functools import partial
 from google_play_scraper import reviews, Sort
 from datetime import datetime, timedelta
+from utils.metrics import record_scrape
+
+PAGE_SIZE = 200
+MAX_PAGES = 500
+
+def package_name_from_url(app_url: str) -> str:
+    return app_url.split("id=")[-1] if "id=" in app_url else app_url
 
 class ScraperService:
-    async def scrape_reviews_for_date(self, app_url: str, date: datetime):
+    def __init__(self, lang: str = "en", country: str = "in", backend=None, executor: Executor = None,
+                 max_pages: int = MAX_PAGES):
         """
-        Scrape reviews for a given date from Google Play Store.
-        app_url: e.g. "com.whatsapp"
-        date: datetime object (we'll filter manually)
+        lang/country: Play Store locale to scrape
+        backend: callable with the google_play_scraper.reviews signature (swap in a fake for offline runs)
+        executor: pool the blocking backend calls run on (None uses the loop's default executor)
+        max_pages: pages walked per scrape at most; see `truncated`
         """
-        package_name = app_url.split("id=")[-1] if "id=" in app_url else app_url
-
-        result, _ = reviews(
-            package_name,
-            lang="en",
-            country="in",
-            sort=Sort.NEWEST,
-            count=200,
+        self.lang = lang
+        self.country = country
+        self.backend = backend or reviews
+        self.executor = executor
+        self.max_pages = max_pages
+        # whether the last scrape stopped at max_pages before reaching its start date, leaving
+        # its oldest days missing or partial
+        self.truncated = False
+
+    async def _fetch_page(self, package_name: str, token):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        result, token = await loop.run_in_executor(
+            self.executor,
+            partial(
+                self.backend,
+                package_name,
+                lang=self.lang,
+                country=self.country,
+                sort=Sort.NEWEST,
+                count=PAGE_SIZE,
+                continuation_token=token,
+            ),
         )
+        record_scrape(time.perf_counter() - started, len(result or []))
+        return result, token
+
+    async def scrape_reviews_for_range(self, app_url: str, start_date: datetime, end_date: datetime, on_day=None,
+                                       retain: bool = True):
+        """
+        Scrape every review between start_date and end_date (inclusive) in a single pass.
+        Pages are walked newest -> oldest with the continuation token and the walk
+        stops as soon as a page reaches past start_date.
+        on_day: optional async callback(date_str, reviews), awaited newest day first as soon as a
+        page reaches past that day, so downstream work can start before the walk finishes
+        retain: with on_day, False drops each day's reviews once on_day has handled it, so only the days
+        still being walked are held and the returned buckets are empty
+        Returns {"YYYY-MM-DD": [review, ...]} with a bucket for every day in the range.
+        If the walk stops at max_pages first, the days it did not finish are still returned (and handed
+        to on_day) with what was scraped of them, and `truncated` is set so the range is not taken as covered.
+        """
+        package_name = package_name_from_url(app_url)
+
+        start_str = start_date.strftime("%Y-%m-%d")
+        end_str = end_date.strftime("%Y-%m-%d")
+
+        daily_reviews = {}
+        current_date = start_date
+        while current_date.strftime("%Y-%m-%d") <= end_str:
+            daily_reviews[current_date.strftime("%Y-%m-%d")] = []
+            current_date += timedelta(days=1)
+
+        # days still open, newest first
+        pending_days = sorted(daily_reviews, reverse=True)
 
-        date_str = date.strftime("%Y-%m-%d")
-        daily_reviews = [
-            {
-                "user": r["userName"],
-                "rating": r["score"],
-                "content": r["content"],
-                "at": r["at"].strftime("%Y-%m-%d"),
-                "reply": r.get("replyContent"),
-            }
-            for r in result
-            if r["at"].strftime("%Y-%m-%d") == date_str
-        ]
+        scraped = 0
 
+        async def complete_days_after(date_str):
+            while pending_days and pending_days[0] > date_str:
+                day = pending_days.pop(0)
+                if on_day is not None:
+                    await on_day(day, daily_reviews[day])
+                    if not retain:
+                        daily_reviews[day] = []
+
+        token = None
+        pages = 0
+        self.truncated = False
+        while pages < self.max_pages:
+            result, token = await self._fetch_page(package_name, token)
+            pages += 1
+
+            if not result:
+                break
+
+            for r in result:
+                date_str = r["at"].strftime("%Y-%m-%d")
+                if date_str in daily_reviews:
+                    daily_reviews[date_str].append(self._to_review(r, self.country, self.lang))
+                    scraped += 1
+
+            # results are sorted newest first, so every day newer than the oldest review
+            # on the page is complete, and once that review is before the window there
+            # is nothing left to fetch
+            oldest_str = result[-1]["at"].strftime("%Y-%m-%d")
+            await complete_days_after(oldest_str)
+            if oldest_str < start_str:
+                break
+            if token is None or token.token is None:
+                break
+        else:
+            self.truncated = True
+            print(f"Scrape of {package_name} ({self.country}/{self.lang}) stopped at {self.max_pages} page(s) "
+                  f"before reaching {start_str}")
+
+        await complete_days_after("")
+        print(f"Scraped {scraped} reviews for {package_name} ({self.country}/{self.lang}) in {pages} page(s)")
         return daily_reviews
+
+    async def scrape_reviews_for_date(self, app_url: str, date: datetime):
+        """
+        Scrape reviews for a given date from Google Play Store.
+        app_url: e.g. "com.whatsapp"
+        date: datetime object
+        """
+        daily_reviews = await self.scrape_reviews_for_range(app_url, date, date)
+        return daily_reviews[date.strftime("%Y-%m-%d")]
+
+    @staticmethod
+    def _to_review(r: dict, country: str, lang: str) -> dict:
+        return {
+            "review_id": r.get("reviewId"),
+            "user": r["userName"],
+            "rating": r["score"],
+            "content": r["content"],
+            "at": r["at"].strftime("%Y-%m-%d"),
+            "reply": r.get("replyContent"),
+            "country": country,
+            "lang": lang,
+        }
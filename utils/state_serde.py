@@ -0,0 +1,50 @@
+# state_serde.py
+from typing import Any, Tuple
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from utils.compact_state import ReviewColumns, TopicCounts
+from utils.review_spill import ReviewSpill
+
+# key marking a state object written as plain data
+STATE_TYPE_KEY = "__state_type__"
+
+# state types written to checkpoints through their to_checkpoint / from_checkpoint methods
+STATE_TYPES = {cls.__name__: cls for cls in (ReviewColumns, TopicCounts, ReviewSpill)}
+
+class StateSerializer:
+    """
+    LangGraph checkpoint serializer for the workflow state: JsonPlusSerializer without the pickle
+    fallback, with the compact state types (STATE_TYPES) written as tagged plain data.
+    Checkpoints hold no pickles, so refactoring a state class never makes them unloadable or runs
+    code on resume; anything else that msgpack cannot encode fails the checkpoint write instead.
+    """
+
+    def __init__(self):
+        self.serde = JsonPlusSerializer()
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        return self.serde.dumps_typed(self._encode(obj))
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        return self._decode(self.serde.loads_typed(data))
+
+    def _encode(self, obj: Any) -> Any:
+        if STATE_TYPES.get(type(obj).__name__) is type(obj):
+            return {STATE_TYPE_KEY: type(obj).__name__, "data": obj.to_checkpoint()}
+        if isinstance(obj, dict):
+            return {key: self._encode(value) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [self._encode(value) for value in obj]
+        if type(obj) is tuple:
+            return tuple(self._encode(value) for value in obj)
+        return obj
+
+    def _decode(self, obj: Any) -> Any:
+        if isinstance(obj, dict):
+            if STATE_TYPE_KEY in obj and obj[STATE_TYPE_KEY] in STATE_TYPES:
+                return STATE_TYPES[obj[STATE_TYPE_KEY]].from_checkpoint(obj["data"])
+            return {key: self._decode(value) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [self._decode(value) for value in obj]
+        if type(obj) is tuple:
+            return tuple(self._decode(value) for value in obj)
+        return obj
@@ -0,0 +1,135 @@
+# topic_classifier.py
+import math
+import os
+import re
+import sqlite3
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+from utils.review_dedup import normalize_text
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    text TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    PRIMARY KEY (text, topic)
+);
+"""
+
+class LabelStore:
+    """SQLite table of (review text, topic) pairs labelled by the LLM, used to train TopicClassifier"""
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, examples: List[Tuple[str, str]]):
+        rows = [(normalize_text(text), topic) for text, topic in examples if normalize_text(text)]
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO labels (text, topic) VALUES (?, ?)", rows)
+
+    def load(self) -> List[Tuple[str, str]]:
+        return self.conn.execute("SELECT text, topic FROM labels").fetchall()
+
+# part of the extraction version, so day results labelled by an older classifier are extracted again
+CLASSIFIER_VERSION = "2"
+
+# words that flip a keyword that follows them within NEGATION_WINDOW tokens ("never late", "no bugs", "didn't crash")
+NEGATIONS = {"no", "not", "never", "without", "zero", "nothing", "none", "hardly", "t"}
+NEGATION_WINDOW = 3
+# praise markers: a review using any of them is left for the LLM, which can tell praise from a complaint
+POSITIVE_WORDS = {
+    "great", "good", "love", "loved", "awesome", "excellent", "amazing", "perfect", "smooth", "nice", "best",
+    "instantly", "quick", "fast", "happy", "thanks", "thank", "superb", "fantastic", "helpful", "easy"
+}
+
+class TopicClassifier:
+    """
+    Offline seed-topic classifier: keyword rules plus a TF-IDF nearest-centroid model trained
+    on LLM labels. A review is only labelled locally when the evidence is unambiguous: a rule
+    matches without a negation in front of it, the trained model agrees with the rule, and the
+    review reads as a complaint (no praise words, rating below 4). Everything else is left for the LLM.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]], max_words: int = 25,
+                 min_similarity: float = 0.35, min_examples: int = 5):
+        """
+        keywords: {topic: [regex, ...]} rules; a topic matches when any of its patterns does
+        max_words: longer reviews tend to mix several concerns and always go to the LLM
+        min_similarity: centroid similarity the model needs to confirm a rule
+        min_examples: topics with fewer LLM labels than this get no centroid
+        """
+        self.rules = {topic: re.compile(r"\b(" + "|".join(patterns) + r")\b") for topic, patterns in keywords.items()}
+        self.max_words = max_words
+        self.min_similarity = min_similarity
+        self.min_examples = min_examples
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+
+    def _vector(self, tokens: List[str]) -> Dict[str, float]:
+        counts = Counter(t for t in tokens if t in self.idf)
+        vector = {t: c * self.idf[t] for t, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {t: v / norm for t, v in vector.items()}
+
+    def fit(self, examples: List[Tuple[str, str]]) -> "TopicClassifier":
+        """Build TF-IDF centroids from (text, topic) pairs; topics outside the rule set are ignored"""
+        examples = [(normalize_text(text).split(), topic) for text, topic in examples if topic in self.rules]
+        by_topic = defaultdict(list)
+        for tokens, topic in examples:
+            by_topic[topic].append(tokens)
+        document_frequency = Counter(t for tokens, _ in examples for t in set(tokens))
+        self.idf = {t: math.log((1 + len(examples)) / (1 + df)) + 1 for t, df in document_frequency.items()}
+        self.centroids = {}
+        for topic, documents in by_topic.items():
+            if len(documents) < self.min_examples:
+                continue
+            centroid = defaultdict(float)
+            for tokens in documents:
+                for t, v in self._vector(tokens).items():
+                    centroid[t] += v
+            norm = math.sqrt(sum(v * v for v in centroid.values())) or 1.0
+            self.centroids[topic] = {t: v / norm for t, v in centroid.items()}
+        return self
+
+    def _predict(self, tokens: List[str]) -> Tuple[str, float]:
+        vector = self._vector(tokens)
+        best, best_score = None, 0.0
+        for topic, centroid in self.centroids.items():
+            score = sum(v * centroid.get(t, 0.0) for t, v in vector.items())
+            if score > best_score:
+                best, best_score = topic, score
+        return best, best_score
+
+    def _rule_matches(self, normalized: str) -> Tuple[List[str], bool]:
+        """(topics with a plain rule match, whether any match was negated)"""
+        topics, negated = set(), False
+        for topic, pattern in self.rules.items():
+            for match in pattern.finditer(normalized):
+                if NEGATIONS.intersection(normalized[:match.start()].split()[-NEGATION_WINDOW:]):
+                    negated = True
+                else:
+                    topics.add(topic)
+        return sorted(topics), negated
+
+    def classify(self, text: str, rating: Optional[int] = None) -> Tuple[List[str], bool]:
+        """Returns (topics, confident); only confident labels should be used without the LLM"""
+        normalized = normalize_text(text)
+        tokens = normalized.split()
+        if not tokens or len(tokens) > self.max_words:
+            return [], False
+        rule_topics, negated = self._rule_matches(normalized)
+        if not rule_topics:
+            return [], False
+        praise = POSITIVE_WORDS.intersection(tokens) or (rating is not None and rating >= 4)
+        if negated or praise or not self.centroids:
+            return rule_topics, False
+        # the trained model has to point at one of the rule's topics, staying silent is not enough
+        model_topic, score = self._predict(tokens)
+        return rule_topics, model_topic in rule_topics and score >= self.min_similarity
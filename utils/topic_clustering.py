@@ -0,0 +1,77 @@
+# topic_clustering.py
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+def topic_words(topic: str) -> List[str]:
+    return [w for w in re.split(r"[^a-z0-9]+", topic.lower()) if w]
+
+def char_ngrams(topic: str, n: int = 3) -> set:
+    text = " ".join(topic_words(topic))
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+def cluster_topics(topics: Iterable[str], threshold: float = 0.3, max_block_share: float = 0.2) -> List[List[str]]:
+    """
+    Group topic names that plausibly mean the same thing, without an LLM.
+    Topics are blocked on shared words (words carried by more than `max_block_share` of all
+    topics, like "app" or "issue", do not block) and a pair inside a block is joined when the
+    Jaccard similarity of their character trigrams reaches `threshold`.
+    Returns clusters in first-appearance order, each cluster in input order.
+    """
+    topics = list(dict.fromkeys(topics))
+    parent = list(range(len(topics)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    blocks = defaultdict(list)
+    for i, topic in enumerate(topics):
+        for word in set(topic_words(topic)):
+            blocks[word].append(i)
+    max_block = max(2, int(len(topics) * max_block_share))
+    grams = [char_ngrams(topic) for topic in topics]
+
+    for members in blocks.values():
+        if len(members) > max_block:
+            continue
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j and jaccard(grams[i], grams[j]) >= threshold:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters: Dict[int, List[str]] = {}
+    for i, topic in enumerate(topics):
+        clusters.setdefault(find(i), []).append(topic)
+    return list(clusters.values())
+
+def shard_clusters(clusters: List[List[str]], max_topics: int) -> List[List[str]]:
+    """
+    Pack clusters, in order, into shards of at most `max_topics` topics so each shard fits one
+    consolidation prompt. Clusters larger than a shard are split across shards.
+    """
+    shards, current = [], []
+    for cluster in clusters:
+        for start in range(0, len(cluster), max_topics):
+            part = cluster[start:start + max_topics]
+            if current and len(current) + len(part) > max_topics:
+                shards.append(current)
+                current = []
+            current = current + part
+    if current:
+        shards.append(current)
+    return shards
+
+def related_topics(topics: Iterable[str], candidates: Iterable[str], limit: int) -> List[str]:
+    """Up to `limit` candidates sharing a word with any of `topics`, most overlapping first"""
+    words = set(w for topic in topics for w in topic_words(topic))
+    scored = [(len(words & set(topic_words(c))), c) for c in candidates]
+    return [c for score, c in sorted(scored, key=lambda x: (-x[0], x[1])) if score][:limit]
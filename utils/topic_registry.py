@@ -0,0 +1,85 @@
+# topic_registry.py
+import difflib
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topic_mappings (
+    app TEXT NOT NULL,
+    raw_topic TEXT NOT NULL,
+    canonical_topic TEXT NOT NULL,
+    PRIMARY KEY (app, raw_topic)
+);
+"""
+
+def normalize_topic(topic: str) -> str:
+    """snake_case with the word order ignored, so "Late Delivery" and "delivery_late" compare equal"""
+    words = [w for w in re.split(r"[^a-z0-9]+", topic.lower()) if w]
+    return "_".join(sorted(words))
+
+class TopicRegistry:
+    """
+    Persistent raw topic -> canonical topic mapping per app.
+    Known topics are resolved locally (exact, then normalized match) so only genuinely new topics
+    need an LLM consolidation call, and canonical names stay stable across runs.
+    A fuzzy match is only a suggestion: short snake_case names one letter apart can mean different
+    things (app_crash / app_cash), so it is offered to the LLM and never recorded without it.
+    """
+
+    def __init__(self, db_path: str, app: str, fuzzy_cutoff: float = 0.9):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.db_path = db_path
+        self.app = app
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+        self.mappings: Dict[str, str] = dict(self.conn.execute(
+            "SELECT raw_topic, canonical_topic FROM topic_mappings WHERE app = ?", (app,)
+        ).fetchall())
+        self._reindex()
+
+    def _reindex(self):
+        self.normalized: Dict[str, str] = {}
+        for canonical in sorted(set(self.mappings.values())):
+            self.normalized.setdefault(normalize_topic(canonical), canonical)
+        for raw, canonical in sorted(self.mappings.items()):
+            self.normalized.setdefault(normalize_topic(raw), canonical)
+
+    def close(self):
+        self.conn.close()
+
+    def canonical_topics(self) -> List[str]:
+        return sorted(set(self.mappings.values()))
+
+    def resolve(self, topic: str) -> Optional[str]:
+        """Canonical topic for `topic`, or None when it is new to the registry"""
+        if topic in self.mappings:
+            return self.mappings[topic]
+        return self.normalized.get(normalize_topic(topic))
+
+    def suggest(self, topic: str) -> Optional[str]:
+        """
+        Canonical topic whose normalized name is close to `topic`'s and has as many words, or None.
+        Meant as a candidate for the LLM to confirm, not as a mapping.
+        """
+        normalized = normalize_topic(topic)
+        words = normalized.count("_")
+        candidates = [known for known in self.normalized if known.count("_") == words]
+        close = difflib.get_close_matches(normalized, candidates, n=1, cutoff=self.fuzzy_cutoff)
+        return self.normalized[close[0]] if close else None
+
+    def update(self, mappings: Dict[str, str]):
+        """Record raw -> canonical mappings (e.g. from an LLM consolidation call)"""
+        if not mappings:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO topic_mappings (app, raw_topic, canonical_topic) VALUES (?, ?, ?)",
+                [(self.app, raw, canonical) for raw, canonical in mappings.items()],
+            )
+        self.mappings.update(mappings)
+        self._reindex()
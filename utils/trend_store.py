@@ -0,0 +1,205 @@
+# trend_store.py
+import os
+import sqlite3
+from datetime import date as date_cls, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+GRANULARITIES = ("day", "week", "month")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topics (
+    topic_id INTEGER PRIMARY KEY,
+    app TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (app, name)
+);
+CREATE TABLE IF NOT EXISTS daily_reviews (
+    app TEXT NOT NULL,
+    period TEXT NOT NULL,
+    reviews INTEGER NOT NULL,
+    PRIMARY KEY (app, period)
+) WITHOUT ROWID;
+""" + "".join(f"""
+CREATE TABLE IF NOT EXISTS {granularity}_counts (
+    app TEXT NOT NULL,
+    period TEXT NOT NULL,
+    topic_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (app, period, topic_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_{granularity}_counts_topic ON {granularity}_counts (app, topic_id, period);
+""" for granularity in GRANULARITIES)
+
+def period_of(day: str, granularity: str) -> str:
+    """Key of the day / week (its Monday) / month (YYYY-MM) that an ISO date falls in"""
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        parsed = date_cls.fromisoformat(day)
+        return (parsed - timedelta(days=parsed.weekday())).isoformat()
+    if granularity == "month":
+        return day[:7]
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+class TrendStore:
+    """
+    Historical daily topic counts per (app, date, canonical topic), kept in narrow tables clustered on
+    (app, period, topic) so a date range of one app is a contiguous read, with a second index on
+    (app, topic, period) for single-topic series. Weekly and monthly rollups are maintained
+    incrementally: re-storing a day applies only the difference to its old counts.
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.db_path = db_path
+        # batch workers write different apps to the same file, so wait for each other's transactions
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _topic_ids(self, app: str, names: List[str]) -> Dict[str, int]:
+        self.conn.executemany("INSERT OR IGNORE INTO topics (app, name) VALUES (?, ?)", [(app, name) for name in names])
+        ids = {}
+        for start in range(0, len(names), 500):
+            batch = names[start:start + 500]
+            ids.update(self.conn.execute(
+                f"SELECT name, topic_id FROM topics WHERE app = ? AND name IN ({','.join('?' * len(batch))})", [app] + batch
+            ).fetchall())
+        return ids
+
+    def upsert_days(self, app: str, matrix: pd.DataFrame, reviews_per_day: Dict[str, int] = None) -> int:
+        """
+        Store the days of a dates x topics count matrix for `app`, replacing what was stored for those
+        days, and update the weekly / monthly rollups by the change. Returns the number of days that changed.
+        """
+        days = [str(day) for day in matrix.index]
+        if not days:
+            return 0
+        reviews_per_day = reviews_per_day or {}
+        with self.conn:
+            topic_ids = self._topic_ids(app, [str(topic) for topic in matrix.columns])
+            column_ids = np.array([topic_ids[str(topic)] for topic in matrix.columns], dtype=np.int64)
+            counts = matrix.to_numpy()
+            rows, columns = np.nonzero(counts)
+            new = {(days[row], int(column_ids[column])): int(counts[row, column]) for row, column in zip(rows.tolist(), columns.tolist())}
+
+            day_set = set(days)
+            old = {
+                (day, topic_id): count
+                for day, topic_id, count in self.conn.execute(
+                    "SELECT period, topic_id, count FROM day_counts WHERE app = ? AND period BETWEEN ? AND ?",
+                    (app, min(days), max(days))
+                )
+                if day in day_set
+            }
+            delta = {key: new.get(key, 0) - old.get(key, 0) for key in new.keys() | old.keys()}
+            delta = {key: change for key, change in delta.items() if change}
+
+            # only days whose counts or review volume changed are rewritten
+            old_reviews = dict(self.conn.execute(
+                "SELECT period, reviews FROM daily_reviews WHERE app = ? AND period BETWEEN ? AND ?", (app, min(days), max(days))
+            ).fetchall())
+            changed = {day for day, _ in delta} | {day for day in days if old_reviews.get(day) != int(reviews_per_day.get(day, 0))}
+            self.conn.executemany("DELETE FROM day_counts WHERE app = ? AND period = ?", [(app, day) for day in changed])
+            self.conn.executemany(
+                "INSERT INTO day_counts (app, period, topic_id, count) VALUES (?, ?, ?, ?)",
+                [(app, day, topic_id, count) for (day, topic_id), count in new.items() if day in changed]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO daily_reviews (app, period, reviews) VALUES (?, ?, ?)",
+                [(app, day, int(reviews_per_day.get(day, 0))) for day in days if day in changed]
+            )
+            for granularity in ("week", "month"):
+                rollup = {}
+                for (day, topic_id), change in delta.items():
+                    key = (period_of(day, granularity), topic_id)
+                    rollup[key] = rollup.get(key, 0) + change
+                self.conn.executemany(
+                    f"INSERT INTO {granularity}_counts (app, period, topic_id, count) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (app, period, topic_id) DO UPDATE SET count = count + excluded.count",
+                    [(app, period, topic_id, change) for (period, topic_id), change in rollup.items() if change]
+                )
+                self.conn.executemany(
+                    f"DELETE FROM {granularity}_counts WHERE app = ? AND period = ? AND count = 0",
+                    [(app, period) for period in {period for period, _ in rollup}]
+                )
+        return len(changed)
+
+    def coverage(self, app: str) -> Optional[Tuple[str, str, int]]:
+        """(first_day, last_day, stored_days) for the app, or None if nothing is stored"""
+        row = self.conn.execute(
+            "SELECT MIN(period), MAX(period), COUNT(*) FROM daily_reviews WHERE app = ?", (app,)
+        ).fetchone()
+        return tuple(row) if row and row[2] else None
+
+    def apps(self) -> List[Dict]:
+        return [
+            {"app": app, "first_day": first, "last_day": last, "days": days}
+            for app, first, last, days in self.conn.execute(
+                "SELECT app, MIN(period), MAX(period), COUNT(*) FROM daily_reviews GROUP BY app ORDER BY app"
+            )
+        ]
+
+    def _covered_days(self, app: str, start_date: str, end_date: str, granularity: str) -> List[Tuple[str, int]]:
+        first_day, _ = period_bounds(start_date, granularity)
+        _, last_day = period_bounds(end_date, granularity)
+        return self.conn.execute(
+            "SELECT period, reviews FROM daily_reviews WHERE app = ? AND period BETWEEN ? AND ? ORDER BY period",
+            (app, first_day, last_day)
+        ).fetchall()
+
+    def load(self, app: str, start_date: str, end_date: str, granularity: str = "day", topics: List[str] = None) -> pd.DataFrame:
+        """
+        Periods x topics counts for [start_date, end_date], widened to whole weeks / months for the rollups.
+        Rows are the periods with at least one stored day (so analyzed days without mentions show as 0),
+        columns are ordered by total count. `topics` restricts the columns.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        periods = sorted({period_of(day, granularity) for day, _ in self._covered_days(app, start_date, end_date, granularity)})
+        query = (f"SELECT c.period, t.name, c.count FROM {granularity}_counts c JOIN topics t ON t.topic_id = c.topic_id "
+                 "WHERE c.app = ? AND c.period BETWEEN ? AND ?")
+        params = [app, period_of(start_date, granularity), period_of(end_date, granularity)]
+        if topics:
+            query += f" AND t.name IN ({','.join('?' * len(topics))})"
+            params += list(topics)
+        rows = self.conn.execute(query, params).fetchall()
+
+        names = sorted({name for _, name, _ in rows} | set(topics or []))
+        row_index = {period: i for i, period in enumerate(periods)}
+        column_index = {name: i for i, name in enumerate(names)}
+        counts = np.zeros((len(periods), len(names)), dtype=np.int64)
+        for period, name, count in rows:
+            if period in row_index:
+                counts[row_index[period], column_index[name]] = count
+        matrix = pd.DataFrame(counts, index=pd.Index(periods, name=granularity), columns=names)
+        order = np.argsort(-counts.sum(axis=0), kind="stable")
+        return matrix.iloc[:, order]
+
+    def review_volume(self, app: str, start_date: str, end_date: str, granularity: str = "day") -> pd.Series:
+        """Reviews per period over the stored days, aligned with load()"""
+        volume: Dict[str, int] = {}
+        for day, reviews in self._covered_days(app, start_date, end_date, granularity):
+            period = period_of(day, granularity)
+            volume[period] = volume.get(period, 0) + reviews
+        return pd.Series(volume, dtype=np.int64, name="reviews").rename_axis(granularity)
+
+
+def period_bounds(day: str, granularity: str) -> Tuple[str, str]:
+    """First and last ISO date of the period that `day` falls in"""
+    if granularity == "day":
+        return day, day
+    if granularity == "week":
+        first = date_cls.fromisoformat(period_of(day, "week"))
+        return first.isoformat(), (first + timedelta(days=6)).isoformat()
+    if granularity == "month":
+        first = date_cls.fromisoformat(day[:7] + "-01")
+        following = (first + timedelta(days=32)).replace(day=1)
+        return first.isoformat(), (following - timedelta(days=1)).isoformat()
+    raise ValueError(f"Unknown granularity: {granularity}")
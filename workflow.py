@@ -1,27 +1,325 @@
+import asyncio
+import os
+import time
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import StateGraph, END
 from datetime import datetime
-from agents.data_ingestion import data_ingestion_node
-from agents.topic_extraction import topic_extraction_node
+from agents.data_ingestion import data_ingestion_node, ingest_window, spill_path, window_dates
+from agents.topic_extraction import topic_extraction_node, TopicExtractor, extract_or_reuse, extraction_version
 from agents.topic_consolidation import topic_consolidation_node
 from agents.review_report import review_report_node
+from agents.trend_analytics import trend_analytics_node, trend_frames
 from agents.state_types import ReviewAnalysisState
+from config import instrumentation_config, storage_config, streaming_config, window_config
+from utils.checkpoints import DayResults
+from utils.compact_state import ReviewColumns, TopicCounts
+from utils.llm_gateway import chat_model_session
+from utils.metrics import RunMetrics, record_node, track_run
+from utils.review_spill import ReviewSpill
+from utils.scraper_service import package_name_from_url
+from utils.state_serde import StateSerializer
+from utils.topic_registry import TopicRegistry
 
-def create_review_analysis_workflow():
+def create_review_analysis_workflow(checkpointer=None):
     """
     SEQUENTIAL WORKFLOW (Not Supervisor Pattern)
-    Each step feeds into the next step linearly
+    Each step feeds into the next step linearly; a failed step ends the run so it can be resumed
+    checkpointer: optional LangGraph checkpointer (see run_review_analysis)
     """
     workflow = StateGraph(ReviewAnalysisState)
         
-    workflow.add_node("ingest_data", data_ingestion_node)           
-    workflow.add_node("extract_topics", topic_extraction_node)    
-    workflow.add_node("consolidate_topics", topic_consolidation_node)  
-    workflow.add_node("generate_report", review_report_node)
+    workflow.add_node("ingest_data", instrumented("ingest_data", data_ingestion_node))
+    workflow.add_node("extract_topics", instrumented("extract_topics", topic_extraction_node))
+    workflow.add_node("consolidate_topics", instrumented("consolidate_topics", topic_consolidation_node))
+    workflow.add_node("generate_report", instrumented("generate_report", review_report_node))
+    workflow.add_node("analyze_trends", instrumented("analyze_trends", trend_analytics_node))
 
     workflow.set_entry_point("ingest_data")
-    workflow.add_edge("ingest_data", "extract_topics")
-    workflow.add_edge("extract_topics", "consolidate_topics")
-    workflow.add_edge("consolidate_topics", "generate_report")
-    workflow.add_edge("generate_report", END)
+    workflow.add_conditional_edges("ingest_data", stop_on_failure("extract_topics"), ["extract_topics", END])
+    workflow.add_conditional_edges("extract_topics", stop_on_failure("consolidate_topics"), ["consolidate_topics", END])
+    workflow.add_conditional_edges("consolidate_topics", stop_on_failure("generate_report"), ["generate_report", END])
+    workflow.add_conditional_edges("generate_report", stop_on_failure("analyze_trends"), ["analyze_trends", END])
+    workflow.add_edge("analyze_trends", END)
 
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def instrumented(name: str, node):
+    """Wrap a node so its wall time and resulting status are recorded in the current run's metrics"""
+    async def run(state: ReviewAnalysisState):
+        started = time.perf_counter()
+        update = await node(state)
+        record_node(name, time.perf_counter() - started, update.get('processing_status', ''))
+        return update
+    return run
+
+
+def new_run_metrics(state: ReviewAnalysisState) -> RunMetrics:
+    return RunMetrics(state['analysis_id'], package_name_from_url(state['app_url']), state['target_date'])
+
+
+def publish_run_metrics(metrics: RunMetrics, result: ReviewAnalysisState):
+    """Write the run's JSON report and Prometheus textfile; a failure here never fails the run"""
+    metrics.finish(result.get('processing_status', ''))
+    try:
+        if instrumentation_config.report_dir:
+            print(f"Run report written to {metrics.write_json(instrumentation_config.report_dir)}")
+        if instrumentation_config.textfile_dir:
+            metrics.write_prometheus(instrumentation_config.textfile_dir)
+    except OSError as e:
+        print(f"Could not write run metrics: {str(e)}")
+    llm = metrics.report()["llm"]
+    print(f"Run {metrics.analysis_id} {metrics.status} in {metrics.report()['seconds']:.2f}s: "
+          f"{sum(stage['calls'] for stage in llm.values())} LLM calls, "
+          f"{sum(stage['prompt_tokens'] + stage['completion_tokens'] for stage in llm.values())} tokens, "
+          f"{sum(stage['cache_hits'] for stage in llm.values())} cache hits, "
+          f"{metrics.scraper['calls']} scraper calls")
+
+
+def new_analysis_state(analysis_id, app_url: str, target_date: str, drilldown: bool = False,
+                       window_days: int = None, incremental: bool = None, spill: bool = None) -> ReviewAnalysisState:
+    """Initial workflow state for one analysis; window_days / incremental / spill default to window_config"""
+    return {
+        "analysis_id": analysis_id,
+        "app_url": app_url,
+        "target_date": target_date,
+        "drilldown": drilldown,
+        "window_days": window_config.window_days if window_days is None else window_days,
+        "incremental": window_config.incremental if incremental is None else incremental,
+        "spill": window_config.spill if spill is None else spill,
+        "raw_reviews": ReviewColumns(),
+        "reused_days": [],
+        "review_volume": {},
+        "extracted_topics": TopicCounts(),
+        "topic_details": {},
+        "consolidated_topics": {},
+        "topic_mapping": {},
+        "daily_frequencies": TopicCounts(),
+        "trend_analysis": {},
+        "alerts": [],
+        "processing_status": "started",
+        "errors": [],
+        "current_step": "init"
+    }
+
+
+def stop_on_failure(next_step: str):
+    def route(state: ReviewAnalysisState):
+        return END if state.get('processing_status', '').endswith('_failed') else next_step
+    return route
+
+
+async def run_review_analysis(state: ReviewAnalysisState) -> ReviewAnalysisState:
+    """
+    Run the sequential workflow with a SQLite-backed LangGraph checkpointer, one thread per analysis_id.
+    If the previous run of this analysis_id (same app and date) did not complete, it is resumed from its
+    last successful step instead of starting over; within extraction, days that already finished are
+    reused from the day result store.
+    The run's LLM HTTP connections are pooled for its duration and closed when it returns.
+    """
+    directory = os.path.dirname(storage_config.checkpoint_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    config = {"configurable": {"thread_id": str(state['analysis_id'])}}
+
+    metrics = new_run_metrics(state)
+    with track_run(metrics):
+        async with chat_model_session(), AsyncSqliteSaver.from_conn_string(storage_config.checkpoint_path) as checkpointer:
+            checkpointer.serde = StateSerializer()
+            graph = create_review_analysis_workflow(checkpointer=checkpointer)
+
+            resume_config = await find_resume_point(graph, config, state, checkpointer)
+            if resume_config is not None:
+                print(f"Resuming analysis {state['analysis_id']} from its last checkpoint")
+                result = await graph.ainvoke(None, resume_config)
+            else:
+                result = await graph.ainvoke(state, config)
+    publish_run_metrics(metrics, result)
+    discard_spill(result)
+    return with_trend_frames(result)
+
+
+def with_trend_frames(result: ReviewAnalysisState) -> ReviewAnalysisState:
+    """
+    Finished run's result with trend_matrix (once the report ran) and trend_statistics (once the run
+    completed) added; they are DataFrames and not part of the checkpointed state
+    """
+    status = result.get('processing_status')
+    if status in ('completed', 'analytics_failed'):
+        result['trend_matrix'], statistics = trend_frames(result)
+        if status == 'completed':
+            result['trend_statistics'] = statistics
+    return result
+
+
+def discard_spill(result: ReviewAnalysisState):
+    """Remove a completed run's spilled review window; an unfinished run keeps it so it can be resumed"""
+    if result.get('processing_status') == 'completed' and isinstance(result.get('raw_reviews'), ReviewSpill):
+        result['raw_reviews'].discard()
+
+
+async def find_resume_point(graph, config: dict, state: ReviewAnalysisState, checkpointer=None):
+    """
+    Config of the latest successful, unfinished checkpoint of a matching earlier run, or None.
+    Checkpoints this version cannot read (e.g. pickled by an older one) are deleted so the run starts over.
+    """
+    try:
+        snapshot = await graph.aget_state(config)
+    except NotImplementedError as e:
+        print(f"Checkpoints of analysis {state['analysis_id']} cannot be read ({str(e)}), starting over")
+        if checkpointer is not None:
+            await checkpointer.adelete_thread(config["configurable"]["thread_id"])
+        return None
+    previous = snapshot.values
+    if not previous or previous.get('processing_status') == 'completed':
+        return None
+    # incremental and spill change what the checkpointed state holds (reused days, a spill file instead of reviews)
+    if (previous.get('app_url'), previous.get('target_date'), previous.get('drilldown'), previous.get('window_days'),
+            previous.get('incremental'), previous.get('spill')) != \
+            (state['app_url'], state['target_date'], state.get('drilldown'), state.get('window_days'),
+             state.get('incremental'), state.get('spill')):
+        return None
+    raw_reviews = previous.get('raw_reviews')
+    if isinstance(raw_reviews, ReviewSpill) and not raw_reviews.available():
+        print(f"Spilled reviews of analysis {state['analysis_id']} are gone, starting over")
+        return None
+    async for checkpoint in graph.aget_state_history(config):
+        if checkpoint.next and not checkpoint.values.get('processing_status', '').endswith('_failed'):
+            return checkpoint.config
+    return None
+
+
+async def run_streaming_workflow(state: ReviewAnalysisState, on_day=None) -> ReviewAnalysisState:
+    """
+    STREAMING WORKFLOW, see stream_analysis; records run metrics and pools the LLM connections like run_review_analysis
+    """
+    metrics = new_run_metrics(state)
+    with track_run(metrics):
+        async with chat_model_session():
+            result = await stream_analysis(state, on_day=on_day)
+    publish_run_metrics(metrics, result)
+    discard_spill(result)
+    return with_trend_frames(result)
+
+
+async def stream_analysis(state: ReviewAnalysisState, on_day=None) -> ReviewAnalysisState:
+    """
+    STREAMING WORKFLOW
+    Days flow from ingestion to extraction through a bounded queue, so extraction starts as soon as
+    the first day is available and a slow extraction stage holds back the scraper (backpressure).
+    Extracted days are mapped onto the app's known canonical topics as they arrive; once every day
+    is in, consolidation, the report and trend analytics run exactly as in the sequential workflow, so the final
+    state matches it.
+    on_day: optional callback(date, {canonical_topic: frequency}) for each extracted day
+    """
+    state = dict(state)
+    print(f"Starting streaming analysis {state['analysis_id']}")
+    started = time.perf_counter()
+
+    try:
+        extractor = TopicExtractor(drilldown=state.get('drilldown', False))
+    except Exception as e:
+        state["errors"] = state.get("errors", []) + [f"Extraction error: {str(e)}"]
+        state["processing_status"] = "extraction_failed"
+        return state
+
+    registry = TopicRegistry(storage_config.topic_registry_path, package_name_from_url(state['app_url']))
+    stored_days = DayResults(storage_config.day_results_path, package_name_from_url(state['app_url']),
+                             extraction_version(state.get('drilldown', False)))
+    reused = []
+    live_mapping = {}
+    live_frequencies = TopicCounts(window_dates(state['target_date'], state.get('window_days')))
+    day_results = {}
+    day_queue = asyncio.Queue(maxsize=streaming_config.queue_days)
+    workers = max(1, streaming_config.extraction_workers)
+    first_result = []
+
+    async def produce():
+        try:
+            return await ingest_window(state['app_url'], state['target_date'], state.get('window_days'),
+                                       on_day=lambda date, reviews: day_queue.put((date, reviews)), spill_path=spill_path(state))
+        except Exception as e:
+            raise StageError("Ingestion", "ingestion_failed", e)
+        finally:
+            for _ in range(workers):
+                await day_queue.put(None)
+
+    async def extract():
+        while True:
+            item = await day_queue.get()
+            if item is None:
+                return
+            date, reviews = item
+            try:
+                daily_topics, details = await extract_or_reuse(extractor, stored_days, date, reviews, reused)
+            except Exception as e:
+                raise StageError("Extraction", "extraction_failed", e)
+            day_results[date] = (daily_topics, details)
+            canonical = {}
+            for topic, frequency in daily_topics.items():
+                if topic not in live_mapping:
+                    live_mapping[topic] = registry.resolve(topic) or topic
+                canonical[live_mapping[topic]] = canonical.get(live_mapping[topic], 0) + frequency
+            live_frequencies.set_row(date, canonical)
+            if not first_result and daily_topics:
+                first_result.append(time.perf_counter() - started)
+                print(f"First day extracted after {first_result[0]:.2f}s ({date})")
+            if on_day is not None:
+                on_day(date, canonical)
+
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(extract()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*tasks)
+    except StageError as e:
+        record_node("ingest_and_extract", time.perf_counter() - started, e.status)
+        state["errors"] = state.get("errors", []) + [f"{e.stage} error: {str(e.error)}"]
+        state["processing_status"] = e.status
+        return state
+    finally:
+        # stop and wait for the other stage's tasks first, so none of them uses a closed store
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        registry.close()
+        stored_days.close()
+        extractor.close()
+    if reused:
+        print(f"Reused {len(reused)} already extracted day(s) from the day result store")
+
+    raw_reviews, _ = tasks[0].result()
+    # rebuilt in date order so topic ids are interned exactly as topic_extraction_node does
+    extracted_topics = TopicCounts(raw_reviews.days)
+    topic_details = {}
+    for date in raw_reviews.days:
+        daily_topics, details = day_results.get(date, ({}, {}))
+        extracted_topics.set_row(date, daily_topics)
+        if details:
+            topic_details[date] = details
+    print(f"Ingestion and extraction finished after {time.perf_counter() - started:.2f}s")
+    record_node("ingest_and_extract", time.perf_counter() - started, "extraction_complete")
+
+    state.update({
+        "raw_reviews": raw_reviews,
+        "review_volume": raw_reviews.day_counts(),
+        "extracted_topics": extracted_topics,
+        "topic_details": topic_details,
+        "current_step": "topic_extraction_completed",
+        "processing_status": "extraction_complete"
+    })
+    state.update(await instrumented("consolidate_topics", topic_consolidation_node)(state))
+    for name, node in (("generate_report", review_report_node), ("analyze_trends", trend_analytics_node)):
+        if state["processing_status"].endswith("_failed"):
+            break
+        state.update(await instrumented(name, node)(state))
+    print(f"Streaming analysis finished after {time.perf_counter() - started:.2f}s")
+    return state
+
+
+class StageError(Exception):
+    """Failure inside one stage of the streaming workflow, reported like the matching node would"""
+
+    def __init__(self, stage: str, status: str, error: Exception):
+        super().__init__(str(error))
+        self.stage = stage
+        self.status = status
+        self.error = error